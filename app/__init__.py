@@ -1,9 +1,58 @@
-from config import Settings
-import boto3
+import math
+import threading
+from typing import Dict, Optional, Tuple
+from config import get_settings
 
 
-settings = Settings()
+settings = get_settings()
 
+_socket_clients: Dict[float, object] = {}
+_socket_client_lock = threading.Lock()
 
-def get_socket_client():
-    return boto3.client('apigatewaymanagementapi', endpoint_url=settings.WEB_SOCKET_API)
+
+def socket_timeout_step(timeout: Optional[float]) -> float:
+    """
+    The timeout rounded down to a step of SOCKET_TIMEOUT_STEP_SECONDS, at least one step and at most
+    SOCKET_PUSH_TIMEOUT_SECONDS. Rounding down keeps the client of a step within the timeout it was given
+    """
+    step = settings.SOCKET_TIMEOUT_STEP_SECONDS
+    if timeout is None or timeout >= settings.SOCKET_PUSH_TIMEOUT_SECONDS:
+        return settings.SOCKET_PUSH_TIMEOUT_SECONDS
+    return max(step, math.floor(timeout / step) * step)
+
+
+def socket_client_timeouts(timeout: float) -> Tuple[float, float]:
+    """
+    Connect and read timeouts which add up to `timeout`. botocore bounds the connect and every read of the answer
+    on their own, so one attempt connects within the first and waits the second at most for each read. A slow
+    answer which keeps sending can still take longer, the deadline reserve covers that
+    """
+    connect_timeout = timeout * settings.SOCKET_CONNECT_TIMEOUT_SHARE
+    return connect_timeout, timeout - connect_timeout
+
+
+def get_socket_client(timeout: Optional[float] = None):
+    """
+    Returns a process wide api gateway management client so warm invocations reuse it.
+    post_to_connection can not take a per call timeout, the client bounds every post instead. So there is one
+    client per timeout step, see socket_timeout_step. botocore does not retry, a retry would start after the
+    timeout was spent.
+    """
+    timeout = socket_timeout_step(timeout)
+    if timeout not in _socket_clients:
+        with _socket_client_lock:
+            if timeout not in _socket_clients:
+                # boto3 takes long to import and only the socket push needs it, so it is imported on first use
+                import boto3
+                from botocore.config import Config
+                connect_timeout, read_timeout = socket_client_timeouts(timeout)
+                _socket_clients[timeout] = boto3.client('apigatewaymanagementapi',
+                                                        endpoint_url=settings.WEB_SOCKET_API,
+                                                        config=Config(connect_timeout=connect_timeout,
+                                                                      read_timeout=read_timeout,
+                                                                      retries={"total_max_attempts": 1}))
+    return _socket_clients[timeout]
+
+
+def is_process_socket_client(socket_client) -> bool:
+    return any(socket_client is client for client in list(_socket_clients.values()))
@@ -1,18 +1,39 @@
-import requests
 from simplejson import JSONDecodeError
-from config import Settings
+from config import get_settings
 from logger_init import get_logger
+from app.deadline import CallBudget
+from app.http_client import get_http_session
+from app.resilience import call_with_retry, is_transient_http_error, raise_for_transient_status, \
+    TransientResponseError
+from exceptions.exception import CircuitOpenException
 
 logger = get_logger(__name__)
-settings = Settings()
+settings = get_settings()
+
+
+def call_api(url, params=None, body=None, timeout=None, deadline=None, circuit=None, acquire_token=None):
+    """
+    Returns the parsed answer, {} when the call failed. `acquire_token` is asked before every attempt, see
+    call_with_retry. VendorSaturatedException is raised when it has no token, so the caller can defer the call
+    """
+    # requests is already imported by get_http_session, this only looks the exceptions up
+    from requests.exceptions import ConnectionError, Timeout
+    budget = CallBudget(timeout or settings.REQUEST_TIMEOUT_SECONDS, deadline)
+
+    def post_to_status_api():
+        return raise_for_transient_status(get_http_session().post(url, params=params, json=body,
+                                                                  timeout=budget.attempt_timeout()))
 
-def call_api(url, params=None, body=None):
     try:
-        response = requests.post(url, params=params, json=body)
+        response = call_with_retry(url, post_to_status_api, is_transient_http_error, deadline=deadline,
+                                   circuit=circuit, budget=budget, acquire_token=acquire_token)
         parsed_response = response.json()
     except JSONDecodeError:
         logger.warning("Latest status collection failed")
         return {}
+    except (Timeout, ConnectionError, TransientResponseError, CircuitOpenException) as e:
+        logger.warning("Latest status collection failed with %r. Continuing with last known session data", e)
+        return {}
     else:
-        logger.info(f"Returning current status {parsed_response}")
+        logger.debug("Returning current status %s", parsed_response)
         return parsed_response
\ No newline at end of file
@@ -0,0 +1,108 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from logger_init import get_logger, booking_log_context
+from config import get_settings
+from app.batch import new_item_result, kept_status_result, failed_result
+from app.deadline import Deadline
+from app.status_batch import event_key
+from app.status_manager import StatusManager, DEPENDENCY_UNAVAILABLE_ERRORS
+from data_store.data_schemas import BatchSessionResult, FinalStageReport
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+_io_executor: Optional[ThreadPoolExecutor] = None
+_io_executor_lock = threading.Lock()
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """Executor for the blocking http and boto3 calls awaited by the async pipeline. Created once per process"""
+    global _io_executor
+    if _io_executor is None:
+        with _io_executor_lock:
+            if _io_executor is None:
+                _io_executor = ThreadPoolExecutor(max_workers=settings.ASYNC_IO_MAX_WORKERS,
+                                                  thread_name_prefix="session-io")
+    return _io_executor
+
+
+async def run_blocking(function, *args):
+    """Awaits a blocking call on the io executor, with the log context of the awaiting session"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_executor(),
+                                      functools.partial(contextvars.copy_context().run, function, *args))
+
+
+class AsyncStatusManager(StatusManager):
+    """
+    Async version of StatusManager. The constructor does no I/O, use `await AsyncStatusManager.create(event)`
+    to call the status api and read the session data without blocking the event loop. Its writes may go through
+    the write behind buffer, like the other checks of a batch.
+    """
+    def __init__(self, event, deadline: Optional[Deadline] = None):
+        self.set_up(event, deadline)
+        self.write_behind = True
+
+    @classmethod
+    async def create(cls, event, deadline: Optional[Deadline] = None, status_response=None):
+        """`status_response` is the answer of a status call already made for the booking, see refresh_statuses"""
+        status_manager = cls(event, deadline)
+        # Call status api before fetching the current booking session details
+        if status_response is None:
+            status_response = await run_blocking(status_manager.call_status_api)
+        status_manager.session_data = status_manager.session_data_from_status_response(status_response)
+        if status_manager.session_data is None:
+            status_manager.session_data = await run_blocking(status_manager.read_session_data)
+        status_manager.prepare_current_state()
+        return status_manager
+
+    async def check_current_session_data_and_push_async(self, socket_client) -> FinalStageReport:
+        """
+        Async counterpart of StatusManager.check_current_session_data_and_push. The final stage is awaited as one
+        blocking step, it already runs the session table write and the socket push side by side within their
+        timeouts and reports their errors
+        """
+        return await run_blocking(self.check_current_session_data_and_push, socket_client)
+
+
+async def monitor_session_async(event, socket_client, deadline: Optional[Deadline] = None,
+                                status_response=None) -> BatchSessionResult:
+    """Async counterpart of app.batch.monitor_batch_item"""
+    item_result = new_item_result(event)
+    try:
+        with booking_log_context(item_result.booking_id):
+            status_manager = await AsyncStatusManager.create(event, deadline, status_response)
+            final_stage_report = await status_manager.check_current_session_data_and_push_async(socket_client)
+    except DEPENDENCY_UNAVAILABLE_ERRORS as e:
+        return kept_status_result(item_result, event, e)
+    except Exception as e:
+        return failed_result(item_result, e)
+    return item_result.copy(update=final_stage_report.batch_result_fields())
+
+
+async def monitor_sessions_async(events: List, socket_client, max_concurrency=None,
+                                 deadline: Optional[Deadline] = None,
+                                 status_responses: Optional[Dict] = None) -> List[BatchSessionResult]:
+    """
+    Runs all sessions on the running event loop, at most max_concurrency of them at a time. A session holds one
+    io worker while it waits for a call, so more sessions than ASYNC_IO_MAX_WORKERS would only queue for them
+    """
+    status_responses = status_responses or {}
+    semaphore = asyncio.Semaphore(min(max_concurrency or settings.ASYNC_MAX_CONCURRENT_SESSIONS,
+                                      settings.ASYNC_IO_MAX_WORKERS))
+
+    async def bounded(event):
+        async with semaphore:
+            return await monitor_session_async(event, socket_client, deadline, status_responses.get(event_key(event)))
+
+    return list(await asyncio.gather(*(bounded(event) for event in events)))
+
+
+def monitor_sessions(events: List, socket_client, max_concurrency=None, deadline: Optional[Deadline] = None,
+                     status_responses: Optional[Dict] = None) -> List[BatchSessionResult]:
+    """Synchronous entry point of monitor_sessions_async"""
+    return asyncio.run(monitor_sessions_async(events, socket_client, max_concurrency, deadline, status_responses))
@@ -0,0 +1,48 @@
+from typing import Optional
+from app.deadline import Deadline
+from app.status_manager import StatusManager, DEPENDENCY_UNAVAILABLE_ERRORS, status_to_keep
+from config import get_settings
+from data_store.data_schemas import BatchSessionResult
+from data_store.data_structure import ChargingStatus
+from logger_init import get_logger, booking_log_context
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+def new_item_result(event) -> BatchSessionResult:
+    return BatchSessionResult(booking_id=event.get("booking_id"), vendor_id=event.get("vendor_id"),
+                              current_status=ChargingStatus.TERMINATED.value)
+
+
+def kept_status_result(item_result: BatchSessionResult, event, error: Exception) -> BatchSessionResult:
+    """Result of a check whose session data is not available now, the session keeps its status"""
+    logger.exception("Session data of booking id %s is not available now. Keeping its status and checking "
+                     "again later", item_result.booking_id)
+    return item_result.copy(update={"current_status": status_to_keep(event), "error": repr(error),
+                                    "next_check_delay_seconds": settings.NEXT_CHECK_DEFAULT_SECONDS})
+
+
+def failed_result(item_result: BatchSessionResult, error: Exception) -> BatchSessionResult:
+    logger.exception("Status manager is not able to check current session data for booking id %s",
+                     item_result.booking_id)
+    item_result.error = repr(error)
+    return item_result
+
+
+def monitor_batch_item(event, socket_client, deadline: Optional[Deadline] = None,
+                       status_response=None) -> BatchSessionResult:
+    """
+    Runs one booking of a batch through the status manager. Errors are kept on the item instead of raised.
+    `status_response` is the answer of a status call already made for the booking
+    """
+    item_result = new_item_result(event)
+    try:
+        with booking_log_context(item_result.booking_id):
+            status_manager = StatusManager(event, deadline, status_response, write_behind=True)
+            final_stage_report = status_manager.check_current_session_data_and_push(socket_client)
+    except DEPENDENCY_UNAVAILABLE_ERRORS as e:
+        return kept_status_result(item_result, event, e)
+    except Exception as e:
+        return failed_result(item_result, e)
+    return item_result.copy(update=final_stage_report.batch_result_fields())
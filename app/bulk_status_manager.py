@@ -0,0 +1,110 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from app.deadline import Deadline
+from app.session_table import SessionTableClient, get_session_table_client, update_key
+from app.status_batch import refresh_statuses, status_batching_enabled
+from app.status_manager import StatusManager, status_to_keep
+from config import get_settings
+from data_store.data_schemas import BatchSessionResult, DataToUpdateInSessionTable
+from data_store.data_structure import ChargingStatus
+from logger_init import get_logger, booking_log_context
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+class BulkStatusManager(StatusManager):
+    """
+    StatusManager of one session of a bulk batch. The constructor does no I/O. The session data of the whole
+    batch is read with one request per DB_BATCH_SIZE sessions and the changed data is kept in `pending_write`
+    to be written the same way, see monitor_sessions_bulk.
+    """
+    def __init__(self, event, deadline: Optional[Deadline] = None):
+        self.set_up(event, deadline)
+        self.pending_write: Optional[DataToUpdateInSessionTable] = None
+
+    def session_key(self):
+        return self.event_data["booking_id"], self.event_data["vendor_id"]
+
+    def write_current_session_data(self, data_to_update: DataToUpdateInSessionTable):
+        self.pending_write = self.data_to_write(data_to_update)
+
+
+def monitor_sessions_bulk(events: List, socket_client, deadline: Optional[Deadline] = None,
+                          client: Optional[SessionTableClient] = None) -> List[BatchSessionResult]:
+    """
+    Same contract as monitor_batch_item for every event, but the session table is read and written in batches.
+    The status calls run first, batched per vendor when STATUS_BATCH_VENDORS is set, then one batch read, then
+    the decisions and socket pushes, then one batch write.
+    A session which fails in a step keeps its error and skips the next steps.
+    """
+    client = client or get_session_table_client(deadline)
+    results = [BatchSessionResult(booking_id=event.get("booking_id"), vendor_id=event.get("vendor_id"),
+                                  current_status=ChargingStatus.TERMINATED.value) for event in events]
+    managers: Dict[int, BulkStatusManager] = {}
+
+    def for_each_session(executor: ThreadPoolExecutor, step: Callable[[int], None], indexes):
+        futures = {index: executor.submit(in_booking_log_context, step, index) for index in indexes}
+        for index, future in futures.items():
+            error = future.exception()
+            if error is not None:
+                logger.error("Status manager is not able to check current session data for booking id %s: %r",
+                             results[index].booking_id, error)
+                results[index].error = repr(error)
+                managers.pop(index, None)
+
+    def in_booking_log_context(step: Callable[[int], None], index):
+        with booking_log_context(results[index].booking_id):
+            step(index)
+
+    def call_status(index):
+        status_manager = BulkStatusManager(events[index], deadline)
+        status_response = status_responses.get(status_manager.session_key())
+        if status_response is None:
+            status_response = status_manager.call_status_api()
+        status_manager.session_data = status_manager.session_data_from_status_response(status_response)
+        managers[index] = status_manager
+
+    def decide_and_push(index):
+        status_manager = managers[index]
+        status_manager.prepare_current_state()
+        final_stage_report = status_manager.check_current_session_data_and_push(socket_client)
+        results[index] = results[index].copy(update=final_stage_report.batch_result_fields())
+
+    if not events:
+        return results
+    status_responses = refresh_statuses(events, deadline) if status_batching_enabled() else {}
+    with ThreadPoolExecutor(max_workers=min(settings.BATCH_MAX_WORKERS, len(events))) as executor:
+        for_each_session(executor, call_status, range(len(events)))
+        to_read = {index: status_manager.session_key() for index, status_manager in managers.items()
+                   if status_manager.session_data is None}
+        if to_read:
+            try:
+                items, unprocessed = client.batch_read(list(to_read.values()))
+            except Exception as e:
+                logger.exception("Unable to read a batch of %s session records", len(to_read))
+                items, unprocessed, read_error = {}, list(to_read.values()), repr(e)
+            else:
+                read_error = "Session record was not read, the session table is throttled"
+            unprocessed = set(unprocessed)
+            for index, key in to_read.items():
+                if key in items:
+                    managers[index].session_data = items[key]
+                    continue
+                del managers[index]
+                if key in unprocessed:
+                    # Like a failed read of a single session, the session keeps its status and is checked later
+                    results[index] = results[index].copy(update={
+                        "current_status": status_to_keep(events[index]), "error": read_error,
+                        "next_check_delay_seconds": settings.NEXT_CHECK_DEFAULT_SECONDS})
+                else:
+                    results[index].error = "Not able to fetch data from db"
+        for_each_session(executor, decide_and_push, list(managers))
+
+    pending_writes = {update_key(status_manager.pending_write): index
+                      for index, status_manager in managers.items() if status_manager.pending_write is not None}
+    if pending_writes:
+        failed = client.batch_write([managers[index].pending_write for index in pending_writes.values()])
+        for update in failed:
+            results[pending_writes[update_key(update)]].db_error = "Not able to update data to db"
+    return results
@@ -0,0 +1,68 @@
+import time
+from typing import Dict, Optional
+from config import get_settings
+from logger_init import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+STATUS_STAGE = "status"
+READ_STAGE = "read"
+WRITE_STAGE = "write"
+SOCKET_STAGE = "socket"
+
+
+def default_stage_shares() -> Dict[str, float]:
+    return {STATUS_STAGE: settings.DEADLINE_STATUS_SHARE,
+            READ_STAGE: settings.DEADLINE_READ_SHARE,
+            WRITE_STAGE: settings.DEADLINE_WRITE_SHARE,
+            SOCKET_STAGE: settings.DEADLINE_SOCKET_SHARE}
+
+
+class Deadline:
+    """
+    Time budget of one invocation. The remaining time minus a reserve, kept for returning the result,
+    is shared between the stages. A stage gets its share of the budget but never more than what is left.
+    """
+    def __init__(self, remaining_ms: float, shares: Optional[Dict[str, float]] = None, reserve_ms=None):
+        reserve_ms = settings.DEADLINE_RESERVE_MS if reserve_ms is None else reserve_ms
+        self.budget = max(0.0, (remaining_ms - reserve_ms) / 1000)
+        self.expires_at = time.monotonic() + self.budget
+        self.shares = shares or default_stage_shares()
+
+    @classmethod
+    def from_context(cls, context) -> Optional["Deadline"]:
+        """Deadline of a lambda invocation, None when there is no lambda context"""
+        if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+            return None
+        return cls(context.get_remaining_time_in_millis())
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def timeout_for(self, stage: str) -> float:
+        timeout = min(self.budget * self.shares[stage], self.remaining())
+        return max(timeout, settings.DEADLINE_MIN_STAGE_TIMEOUT_SECONDS)
+
+
+class CallBudget:
+    """
+    Time of one call with all its attempts: `timeout` from the start of the call, never past the deadline.
+    Every attempt gets what is left, and no retry starts once it is spent. Without deadline every attempt gets the
+    whole timeout.
+    """
+    def __init__(self, timeout: float, deadline: Optional[Deadline] = None):
+        self.timeout = timeout
+        self.deadline = deadline
+        self.expires_at = time.monotonic() + timeout
+
+    def remaining(self) -> float:
+        if self.deadline is None:
+            return self.timeout
+        return max(0.0, min(self.expires_at - time.monotonic(), self.deadline.remaining()))
+
+    def attempt_timeout(self) -> float:
+        return max(self.remaining(), settings.DEADLINE_MIN_STAGE_TIMEOUT_SECONDS)
+
+    def allows_retry_after(self, delay: float) -> bool:
+        return self.deadline is None or self.remaining() > delay
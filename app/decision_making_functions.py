@@ -1,10 +1,13 @@
 from logger_init import get_logger
 from data_store.data_structure import ChargingStatus
 from app.time_calculations import PrepareTimeDataForCurrentState, CollectiveDataForCurrentState
-from config import Settings
+from exceptions.exception import DecisionException
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from config import get_settings
+import simplejson
 
 logger = get_logger(__name__)
-settings = Settings()
+settings = get_settings()
 
 
 def check_booking_timeout(collective_data_for_current_state: CollectiveDataForCurrentState,
@@ -12,8 +15,8 @@ def check_booking_timeout(collective_data_for_current_state: CollectiveDataForCu
     """This Function will check the BOOKED state. If time is not elapsed it will not change anything in state"""
     current_status = collective_data_for_current_state.session_data["current_status"]
     if current_status == ChargingStatus.BOOKED.value:
-        logger.info(f"Current statues is  {ChargingStatus.BOOKED.value} for the booking id "
-                    f"{collective_data_for_current_state.booking_id}")
+        logger.info("Current statues is  %s for the booking id %s", ChargingStatus.BOOKED.value,
+                    collective_data_for_current_state.booking_id)
         if time_related_data.current_booking_duration.duration_delta.total_seconds() > settings.INITIAL_TIMEOUT_MINUTES.total_seconds():
             logger.info("Time has elapsed charge not started by user")
             return ChargingStatus.START_FAILED.value
@@ -30,7 +33,7 @@ def check_booking_timeout(collective_data_for_current_state: CollectiveDataForCu
 def check_start_failure(collective_data_for_current_state: CollectiveDataForCurrentState,
                         time_related_data: PrepareTimeDataForCurrentState):
     if collective_data_for_current_state.session_data["current_status"] == ChargingStatus.START_FAILED.value:
-        logger.info(f"Start attempted but failed for booking id {collective_data_for_current_state.booking_id}")
+        logger.info("Start attempted but failed for booking id %s", collective_data_for_current_state.booking_id)
         return ChargingStatus.START_FAILED.value
     else:
         return None
@@ -39,8 +42,8 @@ def check_start_failure(collective_data_for_current_state: CollectiveDataForCurr
 def check_successful_start(collective_data_for_current_state: CollectiveDataForCurrentState,
                            time_related_data: PrepareTimeDataForCurrentState):
     if collective_data_for_current_state.session_data["current_status"] == ChargingStatus.STARTED.value:
-        logger.info(f"Charging started successfully for booking id {collective_data_for_current_state.booking_id}. "
-                    f"Marking the session as IN_PROGRESS")
+        logger.info("Charging started successfully for booking id %s. Marking the session as IN_PROGRESS",
+                    collective_data_for_current_state.booking_id)
         return ChargingStatus.IN_PROGRESS.value
     else:
         return None
@@ -50,8 +53,8 @@ def check_termination(collective_data_for_current_state: CollectiveDataForCurren
                       time_related_data: PrepareTimeDataForCurrentState):
     current_status = collective_data_for_current_state.session_data["current_status"]
     if current_status == ChargingStatus.TERMINATED.value:
-        logger.info(f"Session is terminated for {collective_data_for_current_state.booking_id} "
-                    f"Keeping the state. We should got Final state now")
+        logger.info("Session is terminated for %s Keeping the state. We should got Final state now",
+                    collective_data_for_current_state.booking_id)
         return current_status
     else:
         return None
@@ -61,8 +64,8 @@ def check_unknown_error(collective_data_for_current_state: CollectiveDataForCurr
                         time_related_data: PrepareTimeDataForCurrentState):
     current_status = collective_data_for_current_state.session_data["current_status"]
     if current_status == ChargingStatus.UNKNOWN_ERROR.value or current_status == ChargingStatus.PROGRESS_UPDATE_UNKNOWN.value:
-        logger.info(f"Session is in unknown error state for {collective_data_for_current_state.booking_id} "
-                    f"Keeping the state. We should got Final state now")
+        logger.info("Session is in unknown error state for %s Keeping the state. We should got Final state now",
+                    collective_data_for_current_state.booking_id)
         return current_status
     else:
         return None
@@ -78,8 +81,8 @@ def check_user_interruption(collective_data_for_current_state: CollectiveDataFor
             f"returning completed. Go to final state")
         return ChargingStatus.COMPLETED.value
     elif user_stopped and current_status == ChargingStatus.STOP_FAILED.value:
-        logger.info(f"User tried to stop charging for booking id {collective_data_for_current_state.booking_id}. "
-                    f"but it failed. Maintaining state. Manage it in final state")
+        logger.info("User tried to stop charging for booking id %s. but it failed. Maintaining state. "
+                    "Manage it in final state", collective_data_for_current_state.booking_id)
         return current_status
     else:
         return None
@@ -89,11 +92,11 @@ def check_time_based_status(collective_data_for_current_state: CollectiveDataFor
                             time_related_data: PrepareTimeDataForCurrentState):
     total_seconds_elapsed = time_related_data.current_duration.duration_delta.total_seconds()
     if total_seconds_elapsed >= time_related_data.target_duration_delta.total_seconds():
-        logger.info(f"Charging session is completed for booking id {collective_data_for_current_state.booking_id}")
+        logger.info("Charging session is completed for booking id %s", collective_data_for_current_state.booking_id)
         return ChargingStatus.COMPLETED.value
     elif total_seconds_elapsed < time_related_data.target_duration_delta.total_seconds():
-        logger.info(f"Charging session is in progress for booking id {collective_data_for_current_state.booking_id}. "
-                    f"Current duration is {total_seconds_elapsed}")
+        logger.info("Charging session is in progress for booking id %s. Current duration is %s",
+                    collective_data_for_current_state.booking_id, total_seconds_elapsed)
         return ChargingStatus.IN_PROGRESS.value
     else:
         return None
@@ -105,11 +108,11 @@ def check_energy_based_status(collective_data_for_current_state: CollectiveDataF
     target_energy_kw = int(collective_data_for_current_state.target_energy_kw)
 
     if current_energy_consumed >= target_energy_kw:
-        logger.info(f"Charging session is completed for booking id {collective_data_for_current_state.booking_id}")
+        logger.info("Charging session is completed for booking id %s", collective_data_for_current_state.booking_id)
         return ChargingStatus.COMPLETED.value
     elif current_energy_consumed < target_energy_kw:
-        logger.info(f"Charging session is in progress for booking id {collective_data_for_current_state.booking_id}. "
-                    f"Current energy consumed is {current_energy_consumed}")
+        logger.info("Charging session is in progress for booking id %s. Current energy consumed is %s",
+                    collective_data_for_current_state.booking_id, current_energy_consumed)
         return ChargingStatus.IN_PROGRESS.value
     else:
         return None
@@ -125,5 +128,117 @@ def decider(start_time, time_based=None, energy_based=None) -> []:
         return [check_successful_start, check_termination, check_unknown_error, check_user_interruption,
                 check_energy_based_status]
     else:
-        logger.info(f"No strategy found input data to factory was {start_time, time_based, energy_based}")
+        logger.info("No strategy found input data to factory was %s", (start_time, time_based, energy_based))
         return None
+
+
+BOOKING_STRATEGY = "BOOKING"
+TIME_STRATEGY = "TIME"
+ENERGY_STRATEGY = "ENERGY"
+# Rules used when the table has no entry for the current status of a strategy
+DEFAULT_RULES = "DEFAULT"
+
+DECISION_RULES: Dict[str, Callable] = {rule.__name__: rule for rule in (
+    check_booking_timeout, check_start_failure, check_successful_start, check_termination, check_unknown_error,
+    check_user_interruption, check_time_based_status, check_energy_based_status)}
+
+
+def select_strategy(start_time, time_based=None, energy_based=None) -> Optional[str]:
+    """Same branching as decider but returns the name of the strategy"""
+    if not start_time:
+        return BOOKING_STRATEGY
+    elif time_based:
+        return TIME_STRATEGY
+    elif energy_based:
+        return ENERGY_STRATEGY
+    else:
+        return None
+
+
+def _started_session_rules(target_status_rule) -> Dict:
+    # Only check_user_interruption can decide COMPLETED and STOP_FAILED, and only when the user stopped.
+    # Otherwise the target check decides, exactly like the ordered list returned by decider
+    return {
+        ChargingStatus.STARTED.value: [check_successful_start],
+        ChargingStatus.TERMINATED.value: [check_termination],
+        ChargingStatus.UNKNOWN_ERROR.value: [check_unknown_error],
+        ChargingStatus.PROGRESS_UPDATE_UNKNOWN.value: [check_unknown_error],
+        ChargingStatus.COMPLETED.value: [check_user_interruption, target_status_rule],
+        ChargingStatus.STOP_FAILED.value: [check_user_interruption, target_status_rule],
+        DEFAULT_RULES: [target_status_rule]
+    }
+
+
+DEFAULT_DECISION_TABLE = {
+    BOOKING_STRATEGY: {
+        ChargingStatus.BOOKED.value: [check_booking_timeout],
+        ChargingStatus.REBOOKED.value: [check_booking_timeout],
+        ChargingStatus.START_FAILED.value: [check_start_failure],
+        ChargingStatus.UNKNOWN_ERROR.value: [check_unknown_error],
+        ChargingStatus.PROGRESS_UPDATE_UNKNOWN.value: [check_unknown_error],
+        DEFAULT_RULES: []
+    },
+    TIME_STRATEGY: _started_session_rules(check_time_based_status),
+    ENERGY_STRATEGY: _started_session_rules(check_energy_based_status)
+}
+
+
+class DecisionTable:
+    """
+    Dispatch table keyed by (strategy, current_status). Only the rules of the matching entry are run and the
+    first result which is not None is the decision. A status without an entry uses the DEFAULT_RULES of the
+    strategy. When no rule decides, DecisionException is raised.
+    """
+    def __init__(self, table: Dict[str, Dict[str, Iterable[Callable]]]):
+        self.table: Dict[Tuple[Optional[str], str], Tuple[Callable, ...]] = {
+            (strategy, current_status): tuple(rules)
+            for strategy, rules_by_status in table.items()
+            for current_status, rules in rules_by_status.items()}
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Dict[str, Iterable[str]]]) -> "DecisionTable":
+        """Builds the table from rule names, e.g. {"TIME": {"STARTED": ["check_successful_start"]}}"""
+        try:
+            return cls({strategy: {current_status: [DECISION_RULES[rule_name] for rule_name in rule_names]
+                                   for current_status, rule_names in rules_by_status.items()}
+                        for strategy, rules_by_status in data.items()})
+        except KeyError as e:
+            raise DecisionException(code=500, message=f"Unknown decision rule {e.args[0]}")
+
+    @classmethod
+    def from_json_file(cls, path) -> "DecisionTable":
+        with open(path, "r") as fh:
+            return cls.from_data(simplejson.load(fh))
+
+    def rules_for(self, strategy, current_status) -> Tuple[Callable, ...]:
+        try:
+            return self.table[(strategy, current_status)]
+        except KeyError:
+            return self.table.get((strategy, DEFAULT_RULES), ())
+
+    def decide(self, collective_data_for_current_state: CollectiveDataForCurrentState,
+               time_related_data: PrepareTimeDataForCurrentState) -> str:
+        strategy = select_strategy(collective_data_for_current_state.start_time,
+                                   collective_data_for_current_state.target_duration_timestamp,
+                                   collective_data_for_current_state.target_energy_kw)
+        current_status = collective_data_for_current_state.session_data["current_status"]
+        for rule in self.rules_for(strategy, current_status):
+            result = rule(collective_data_for_current_state, time_related_data)
+            if result is not None:
+                return result
+        raise DecisionException(code=500, message=f"No decision for strategy {strategy} and status {current_status}")
+
+
+_decision_table: Optional[DecisionTable] = None
+
+
+def get_decision_table() -> DecisionTable:
+    """Compiles the decision table once per process, from DECISION_TABLE_PATH when it is set"""
+    global _decision_table
+    if _decision_table is None:
+        if settings.DECISION_TABLE_PATH:
+            logger.info("Loading decision table from %s", settings.DECISION_TABLE_PATH)
+            _decision_table = DecisionTable.from_json_file(settings.DECISION_TABLE_PATH)
+        else:
+            _decision_table = DecisionTable(DEFAULT_DECISION_TABLE)
+    return _decision_table
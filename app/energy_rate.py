@@ -0,0 +1,127 @@
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Deque, Optional, Tuple
+from config import get_settings
+from logger_init import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+SessionKey = Tuple[str, str]
+
+
+@dataclass
+class EnergyRateEstimate:
+    # Energy per second, None until two samples at different times are known
+    rate_per_second: Optional[float] = None
+    seconds_to_target: Optional[float] = None
+    # Unix time at which the target energy is reached at the current rate
+    predicted_completion_at: Optional[float] = None
+    stalled: bool = False
+
+
+class EnergyRateEstimator:
+    """
+    Charging rate of one session from its last `capacity` (timestamp, energy) samples. The rate is the least
+    squares slope of the samples so that one late or rounded meter value does not swing the prediction.
+    Energy which goes down means the meter was reset, the history is dropped.
+    """
+    __slots__ = ("samples", "last_change_at")
+
+    def __init__(self, capacity: int):
+        self.samples: Deque[Tuple[float, float]] = deque(maxlen=capacity)
+        self.last_change_at: Optional[float] = None
+
+    def add(self, timestamp: float, energy: float):
+        if self.samples:
+            last_timestamp, last_energy = self.samples[-1]
+            if timestamp <= last_timestamp:
+                return
+            if energy < last_energy:
+                logger.info("Energy went down from %s to %s. Dropping the rate history", last_energy, energy)
+                self.samples.clear()
+                self.last_change_at = timestamp
+            elif energy > last_energy:
+                self.last_change_at = timestamp
+        else:
+            self.last_change_at = timestamp
+        self.samples.append((timestamp, energy))
+
+    def rate(self) -> Optional[float]:
+        if len(self.samples) < 2:
+            return None
+        first_timestamp = self.samples[0][0]
+        times = [timestamp - first_timestamp for timestamp, _ in self.samples]
+        energies = [energy for _, energy in self.samples]
+        mean_time = sum(times) / len(times)
+        mean_energy = sum(energies) / len(energies)
+        variance = sum((time - mean_time) ** 2 for time in times)
+        if variance == 0:
+            return None
+        return sum((time - mean_time) * (energy - mean_energy) for time, energy in zip(times, energies)) / variance
+
+    def is_stalled(self, now: float, stall_seconds: float) -> bool:
+        """True when the energy has not moved for `stall_seconds`"""
+        return self.last_change_at is not None and len(self.samples) >= 2 and now - self.last_change_at >= stall_seconds
+
+    def estimate(self, target_energy: float, now: float, stall_seconds: float) -> EnergyRateEstimate:
+        if not self.samples:
+            return EnergyRateEstimate()
+        if self.is_stalled(now, stall_seconds):
+            return EnergyRateEstimate(rate_per_second=0.0, stalled=True)
+        rate = self.rate()
+        if rate is None or rate <= 0:
+            return EnergyRateEstimate(rate_per_second=rate)
+        last_timestamp, last_energy = self.samples[-1]
+        predicted_completion_at = last_timestamp + max(0.0, target_energy - last_energy) / rate
+        return EnergyRateEstimate(rate_per_second=rate, seconds_to_target=max(0.0, predicted_completion_at - now),
+                                  predicted_completion_at=predicted_completion_at)
+
+
+class EnergyRateRegistry:
+    """
+    Estimators of the sessions monitored by this process, at most `capacity` sessions. The least recently
+    sampled session is dropped first, so memory stays bounded whatever the fleet size.
+    """
+    def __init__(self, capacity: int, samples: int):
+        self.capacity = capacity
+        self.samples = samples
+        self._estimators: "OrderedDict[SessionKey, EnergyRateEstimator]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add_sample(self, key: SessionKey, timestamp: float, energy: float, target_energy: float,
+                   stall_seconds: Optional[float] = None) -> EnergyRateEstimate:
+        """Adds the energy of a check and returns the estimate of the session"""
+        stall_seconds = settings.ENERGY_STALL_SECONDS if stall_seconds is None else stall_seconds
+        with self._lock:
+            estimator = self._estimators.get(key)
+            if estimator is None:
+                estimator = self._estimators[key] = EnergyRateEstimator(self.samples)
+            self._estimators.move_to_end(key)
+            while len(self._estimators) > self.capacity:
+                self._estimators.popitem(last=False)
+            estimator.add(timestamp, energy)
+            return estimator.estimate(target_energy, timestamp, stall_seconds)
+
+    def forget(self, key: SessionKey):
+        with self._lock:
+            self._estimators.pop(key, None)
+
+    def __len__(self):
+        return len(self._estimators)
+
+
+_energy_rate_registry: Optional[EnergyRateRegistry] = None
+_energy_rate_registry_lock = threading.Lock()
+
+
+def get_energy_rate_registry() -> EnergyRateRegistry:
+    """Process wide registry. A warm lambda or the scheduler daemon keeps the history between checks"""
+    global _energy_rate_registry
+    if _energy_rate_registry is None:
+        with _energy_rate_registry_lock:
+            if _energy_rate_registry is None:
+                _energy_rate_registry = EnergyRateRegistry(settings.ENERGY_RATE_TRACKER_CAPACITY,
+                                                           settings.ENERGY_RATE_SAMPLES)
+    return _energy_rate_registry
@@ -1,5 +1,5 @@
 from data_store.data_structure import ChargingStatus
-from data_store.data_schemas import CollectiveDataForCurrentState, DataToUpdateInSessionTable, DataForLiveUpdate
+from data_store.data_schemas import CollectiveDataForCurrentState, DataToUpdateInSessionTable, LiveUpdateRecord
 from app.time_calculations import PrepareTimeDataForCurrentState
 from abc import ABC, abstractmethod
 from typing import Optional, Dict
@@ -7,6 +7,48 @@ from logger_init import get_logger
 
 logger = get_logger(__name__)
 
+# A change of status, energy or live update seq makes a write worth doing. The timer only counts when it moves to
+# another bucket
+MEANINGFUL_SESSION_ATTRIBUTES = ("current_status", "live_update_seq")
+
+
+def timer_bucket(charging_timer: Optional[str], bucket_seconds: int) -> Optional[int]:
+    if not charging_timer:
+        return None
+    hours, minutes, seconds = (int(part) for part in charging_timer.split(":"))
+    return (hours * 3600 + minutes * 60 + seconds) // max(bucket_seconds, 1)
+
+
+def persisted_energy(session_data: Dict) -> Optional[str]:
+    """
+    Energy of the last charging_states written by the monitor. The current_energy_consumed of the record is
+    refreshed by the status api and copied into the payload, so it can not tell whether the energy moved.
+    """
+    charging_states = session_data.get("charging_states")
+    if not isinstance(charging_states, dict) or charging_states.get("current_energy_consumed") is None:
+        return None
+    return str(charging_states["current_energy_consumed"])
+
+
+def changed_data_to_update(session_data: Dict, data_to_update: DataToUpdateInSessionTable,
+                           timer_bucket_seconds: int) -> Optional[DataToUpdateInSessionTable]:
+    """
+    Compares the payload with the session record it was made from, and its energy with the last persisted one.
+    Returns None when nothing meaningful changed, else the payload with only the changed attributes.
+    """
+    current_energy = data_to_update.data_to_update.get("current_energy_consumed")
+    meaningful_change = any(attribute in data_to_update.data_to_update and
+                            data_to_update.data_to_update[attribute] != session_data.get(attribute)
+                            for attribute in MEANINGFUL_SESSION_ATTRIBUTES) or \
+        (None if current_energy is None else str(current_energy)) != persisted_energy(session_data) or \
+        timer_bucket(data_to_update.data_to_update.get("current_charging_timer"), timer_bucket_seconds) != \
+        timer_bucket(session_data.get("current_charging_timer"), timer_bucket_seconds)
+    if not meaningful_change:
+        return None
+    changed_attributes = {attribute: value for attribute, value in data_to_update.data_to_update.items()
+                          if attribute not in session_data or session_data[attribute] != value}
+    return data_to_update.copy(update={"data_to_update": changed_attributes})
+
 
 class DataToReturn(ABC):
     """
@@ -18,9 +60,11 @@ class DataToReturn(ABC):
 
 
 class FinalDataToReturnForDB(DataToReturn):
-    def __init__(self, collective_data_for_current_state, time_related_data_for_current_state):
+    def __init__(self, collective_data_for_current_state, time_related_data_for_current_state, live_update=None):
         self.collective_data_for_current_state: CollectiveDataForCurrentState = collective_data_for_current_state
         self.time_related_data_for_current_state: PrepareTimeDataForCurrentState = time_related_data_for_current_state
+        self.live_update: LiveUpdateRecord = live_update or LiveUpdateRecord.from_session_data(
+            collective_data_for_current_state.session_data)
         self.mapper = {
             ChargingStatus.TERMINATED.value: self.terminated_response,
             ChargingStatus.START_FAILED.value: self.start_failed_response,
@@ -39,21 +83,20 @@ class FinalDataToReturnForDB(DataToReturn):
         return self.mapper[final_response]()
 
     def _status_mapper(self, current_status):
-        return DataToUpdateInSessionTable.parse_obj({
-            "update_table": True,
-            "table_name": "ChargingSessionRecords",
-            "primary_key": {"booking_id": self.collective_data_for_current_state.booking_id},
-            "sort_key": {"vendor_id": self.collective_data_for_current_state.vendor_id},
-            "data_to_update": {
+        # Built from already validated data so the model is constructed without validating again
+        return DataToUpdateInSessionTable.construct(
+            update_table=True,
+            table_name="ChargingSessionRecords",
+            primary_key={"booking_id": self.collective_data_for_current_state.booking_id},
+            sort_key={"vendor_id": self.collective_data_for_current_state.vendor_id},
+            data_to_update={
                 "current_status": current_status,
                 "current_energy_consumed": self.collective_data_for_current_state.session_data[
                     "current_energy_consumed"],
                 "max_energy": self.collective_data_for_current_state.session_data["expanded_vehicle_data"]["power_capacity"],
                 "current_charging_timer": self.time_related_data_for_current_state.current_duration.duration_as_time_stamp_string,
-                "charging_states": DataForLiveUpdate.parse_obj(
-                    self.collective_data_for_current_state.session_data).dict()
-            }
-        })
+                "charging_states": self.live_update.dict()
+            })
 
     def terminated_response(self):
         return self._status_mapper(current_status=ChargingStatus.TERMINATED.value)
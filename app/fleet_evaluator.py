@@ -0,0 +1,149 @@
+import datetime
+from dataclasses import dataclass
+from typing import List, Optional
+import numpy as np
+from config import get_settings
+from data_store.data_schemas import CollectiveDataForCurrentState
+from data_store.data_structure import ChargingStatus
+from logger_init import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+STATUS_VALUES = [charging_status.value for charging_status in ChargingStatus]
+STATUS_CODES = {status_value: code for code, status_value in enumerate(STATUS_VALUES)}
+# Status code for statuses outside ChargingStatus in the input, and for sessions without a decision in the output
+NO_STATUS = -1
+
+MICROSECONDS = 1_000_000
+
+
+def _code(charging_status: ChargingStatus) -> int:
+    return STATUS_CODES[charging_status.value]
+
+
+def _datetime_to_microseconds(point_in_time: datetime.datetime) -> int:
+    return (point_in_time - datetime.datetime(1970, 1, 1)) // datetime.timedelta(microseconds=1)
+
+
+def _to_microseconds(time_string: Optional[str]) -> int:
+    if not time_string:
+        return 0
+    return _datetime_to_microseconds(datetime.datetime.fromisoformat(time_string))
+
+
+def _duration_to_microseconds(time_stamp: Optional[str]) -> int:
+    if not time_stamp:
+        return 0
+    hours, minutes, seconds = (int(part) for part in time_stamp.split(":"))
+    return (hours * 3600 + minutes * 60 + seconds) * MICROSECONDS
+
+
+@dataclass
+class FleetState:
+    """
+    Columnar state of N sessions. Times are integer microseconds since the epoch so that every comparison
+    is as exact as the timedelta arithmetic of the per session functions. The has_* masks follow the
+    truthiness checks done by decider and PrepareTimeDataForCurrentState.
+    """
+    start_time: np.ndarray
+    has_start_time: np.ndarray
+    booking_time: np.ndarray
+    has_booking_time: np.ndarray
+    target_duration: np.ndarray
+    is_time_based: np.ndarray
+    target_energy_kw: np.ndarray
+    is_energy_based: np.ndarray
+    current_energy_consumed: np.ndarray
+    status_code: np.ndarray
+    user_stopped: np.ndarray
+
+    def __len__(self):
+        return len(self.status_code)
+
+    @classmethod
+    def from_collective_data(cls, states: List[CollectiveDataForCurrentState]) -> "FleetState":
+        session_data = [state.session_data for state in states]
+        return cls(
+            start_time=np.array([_to_microseconds(state.start_time) for state in states], dtype=np.int64),
+            has_start_time=np.array([bool(state.start_time) for state in states], dtype=bool),
+            booking_time=np.array([_to_microseconds(data.get("booking_time")) for data in session_data],
+                                  dtype=np.int64),
+            has_booking_time=np.array([bool(data.get("booking_time")) for data in session_data], dtype=bool),
+            target_duration=np.array([_duration_to_microseconds(state.target_duration_timestamp)
+                                      for state in states], dtype=np.int64),
+            is_time_based=np.array([bool(state.target_duration_timestamp) for state in states], dtype=bool),
+            target_energy_kw=np.array([int(state.target_energy_kw or 0) for state in states], dtype=np.int64),
+            is_energy_based=np.array([bool(state.target_energy_kw) for state in states], dtype=bool),
+            current_energy_consumed=np.array([int(data["current_energy_consumed"]) for data in session_data],
+                                             dtype=np.int64),
+            status_code=np.array([STATUS_CODES.get(data["current_status"], NO_STATUS) for data in session_data],
+                                 dtype=np.int64),
+            user_stopped=np.array([bool(data["user_stopped"]) for data in session_data], dtype=bool))
+
+
+@dataclass
+class FleetEvaluation:
+    next_status_code: np.ndarray
+    charging_timer: np.ndarray
+
+    def next_statuses(self) -> List[Optional[str]]:
+        return [STATUS_VALUES[code] if code != NO_STATUS else None for code in self.next_status_code.tolist()]
+
+
+def format_timers(duration_seconds: np.ndarray) -> np.ndarray:
+    """Vectorized time.strftime("%H:%M:%S", time.gmtime(seconds)) for whole seconds"""
+    seconds_of_day = np.mod(duration_seconds, 86400)
+    parts = [seconds_of_day // 3600, seconds_of_day % 3600 // 60, seconds_of_day % 60]
+    padded = [np.char.zfill(part.astype(str), 2) for part in parts]
+    return np.char.add(np.char.add(np.char.add(padded[0], ":"), np.char.add(padded[1], ":")), padded[2])
+
+
+def evaluate_fleet(fleet: FleetState, current_time: Optional[datetime.datetime] = None,
+                   initial_timeout: Optional[datetime.timedelta] = None) -> FleetEvaluation:
+    """
+    Computes the next status and the charging timer of every session in one pass.
+    Gives the same result as DecisionTable.decide and the current_charging_timer of FinalDataToReturnForDB.
+    Sessions where the per session pipeline can not decide get NO_STATUS.
+    """
+    current_time = current_time or datetime.datetime.utcnow()
+    initial_timeout = initial_timeout if initial_timeout is not None else settings.INITIAL_TIMEOUT_MINUTES
+    now = _datetime_to_microseconds(current_time)
+    timeout = initial_timeout // datetime.timedelta(microseconds=1)
+
+    status = fleet.status_code
+    booking_strategy = ~fleet.has_start_time
+    time_strategy = fleet.has_start_time & fleet.is_time_based
+    energy_strategy = fleet.has_start_time & ~fleet.is_time_based & fleet.is_energy_based
+    started_strategy = time_strategy | energy_strategy
+
+    elapsed = now - fleet.start_time
+    booking_elapsed = now - fleet.booking_time
+    next_status = np.full(len(fleet), NO_STATUS, dtype=np.int64)
+
+    # Same order as the rules of DEFAULT_DECISION_TABLE, the first matching np.select condition wins
+    target_reached = np.where(time_strategy, elapsed >= fleet.target_duration,
+                              fleet.current_energy_consumed >= fleet.target_energy_kw)
+    keeps_status = np.isin(status, [_code(ChargingStatus.TERMINATED), _code(ChargingStatus.UNKNOWN_ERROR),
+                                    _code(ChargingStatus.PROGRESS_UPDATE_UNKNOWN)])
+    user_stop_decided = fleet.user_stopped & np.isin(status, [_code(ChargingStatus.COMPLETED),
+                                                              _code(ChargingStatus.STOP_FAILED)])
+    started_next_status = np.select(
+        [status == _code(ChargingStatus.STARTED), keeps_status | user_stop_decided, target_reached],
+        [_code(ChargingStatus.IN_PROGRESS), status, _code(ChargingStatus.COMPLETED)],
+        default=_code(ChargingStatus.IN_PROGRESS))
+
+    booked = status == _code(ChargingStatus.BOOKED)
+    booking_next_status = np.select(
+        [booked & (booking_elapsed > timeout), booked,
+         np.isin(status, [_code(ChargingStatus.REBOOKED), _code(ChargingStatus.START_FAILED),
+                          _code(ChargingStatus.UNKNOWN_ERROR), _code(ChargingStatus.PROGRESS_UPDATE_UNKNOWN)])],
+        [_code(ChargingStatus.START_FAILED), status, status],
+        default=NO_STATUS)
+
+    next_status = np.where(started_strategy, started_next_status, next_status)
+    # Without start and booking time there is no charging timer so the pipeline can not decide
+    next_status = np.where(booking_strategy & fleet.has_booking_time, booking_next_status, next_status)
+
+    timer_seconds = np.where(started_strategy, elapsed // MICROSECONDS, 0)
+    return FleetEvaluation(next_status_code=next_status, charging_timer=format_timers(timer_seconds))
@@ -0,0 +1,42 @@
+import threading
+from typing import Optional, TYPE_CHECKING
+from config import get_settings
+from logger_init import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+if TYPE_CHECKING:
+    import requests
+
+_http_session: Optional["requests.Session"] = None
+_http_session_lock = threading.Lock()
+
+
+def create_http_session(pool_connections=None, pool_maxsize=None, pool_block=None) -> "requests.Session":
+    """
+    Creates a requests session with a keep-alive connection pool.
+    pool_connections is the number of hosts to keep pools for and pool_maxsize the connections kept per host.
+    """
+    # requests is imported on first use to keep it out of the cold start import time
+    import requests
+    from requests.adapters import HTTPAdapter
+    adapter = HTTPAdapter(pool_connections=pool_connections or settings.HTTP_POOL_CONNECTIONS,
+                          pool_maxsize=pool_maxsize or settings.HTTP_POOL_MAXSIZE,
+                          pool_block=settings.HTTP_POOL_BLOCK if pool_block is None else pool_block)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+
+def get_http_session() -> "requests.Session":
+    """Returns the process wide session so warm invocations reuse the open connections"""
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                logger.info("Creating pooled http session")
+                _http_session = create_http_session()
+    return _http_session
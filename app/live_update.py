@@ -0,0 +1,101 @@
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+from config import get_settings
+from logger_init import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+FULL_MODE = "full"
+DELTA_MODE = "delta"
+
+SNAPSHOT_MESSAGE = "snapshot"
+DELTA_MESSAGE = "delta"
+
+
+@dataclass
+class SentLiveUpdate:
+    seq: int
+    payload: Dict
+
+
+@dataclass
+class PreparedLiveUpdate:
+    connection_id: str
+    seq: int
+    payload: Dict
+    message: str
+
+
+class LiveUpdateTracker:
+    """
+    Remembers the last live update sent on every connection of this process, at most `capacity` connections.
+    A connection without history (a new or reconnected client, or a cold start) gets a snapshot:
+        {"type": "snapshot", "seq": 1, "data": {...all fields...}}
+    After that only changed fields are sent, and nothing at all when nothing changed:
+        {"type": "delta", "seq": 2, "changes": {"current_charging_timer": "00:12:00"}}
+    Clients apply deltas in seq order. A client that sees a gap in seq should ask for a snapshot, a snapshot
+    replaces the state and the seq of the client.
+    The session record keeps the seq of the last message sent by any process as live_update_seq. The history of
+    this process is stale when its seq is not that one, another process sent since, and the connection then gets
+    a snapshot with a seq above both.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._sent: "OrderedDict[str, SentLiveUpdate]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def prepare(self, connection_id: str, payload: Dict, force_snapshot=False,
+                persisted_seq: Optional[int] = None) -> Optional[PreparedLiveUpdate]:
+        """
+        Returns the message to send on the connection or None when the client is already up to date.
+        The seq is recorded for the connection at once, so that a concurrent prepare gets the next one.
+        """
+        with self._lock:
+            previous = self._sent.get(connection_id)
+            stale = previous is not None and persisted_seq is not None and previous.seq != persisted_seq
+            if previous is None or force_snapshot or stale:
+                seq = max(persisted_seq or 0, previous.seq if previous else 0) + 1
+                message = {"type": SNAPSHOT_MESSAGE, "seq": seq, "data": payload}
+            else:
+                changes = {name: value for name, value in payload.items()
+                           if name not in previous.payload or previous.payload[name] != value}
+                if not changes:
+                    return None
+                seq = previous.seq + 1
+                message = {"type": DELTA_MESSAGE, "seq": seq, "changes": changes}
+            self._sent[connection_id] = SentLiveUpdate(seq=seq, payload=payload)
+            self._sent.move_to_end(connection_id)
+            while len(self._sent) > self.capacity:
+                self._sent.popitem(last=False)
+        return PreparedLiveUpdate(connection_id=connection_id, seq=seq, payload=payload, message=json.dumps(message))
+
+    def forget(self, prepared: PreparedLiveUpdate):
+        """The message was not delivered, the next message on the connection will be a snapshot"""
+        with self._lock:
+            sent = self._sent.get(prepared.connection_id)
+            # A later prepare of the connection already replaced this message, its own delivery decides
+            if sent is not None and sent.seq == prepared.seq:
+                del self._sent[prepared.connection_id]
+
+    def __len__(self):
+        return len(self._sent)
+
+
+_live_update_tracker: Optional[LiveUpdateTracker] = None
+_live_update_tracker_lock = threading.Lock()
+
+
+def get_live_update_tracker() -> Optional[LiveUpdateTracker]:
+    """Process wide tracker in delta mode, None in full mode where every poll sends the full payload"""
+    global _live_update_tracker
+    if settings.LIVE_UPDATE_MODE != DELTA_MODE:
+        return None
+    if _live_update_tracker is None:
+        with _live_update_tracker_lock:
+            if _live_update_tracker is None:
+                _live_update_tracker = LiveUpdateTracker(settings.LIVE_UPDATE_TRACKER_CAPACITY)
+    return _live_update_tracker
@@ -0,0 +1,168 @@
+import json
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Tuple
+from config import get_settings
+from logger_init import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+STATUS_CALL = "status_call"
+DB_READ = "db_read"
+TIME_CALCULATION = "time_calculation"
+DECISION = "decision"
+DB_WRITE = "db_write"
+SOCKET_PUSH = "socket_push"
+RATE_LIMIT_WAIT = "rate_limit_wait"
+
+NO_SINK = "none"
+EMF_SINK = "emf"
+MEMORY_SINK = "memory"
+
+DimensionKey = Tuple[Tuple[str, str], ...]
+
+# CloudWatch drops an embedded metric format document which holds more values for one metric
+EMF_MAX_VALUES_PER_METRIC = 100
+
+
+def metric_dimensions(vendor_id, station_id) -> Dict[str, str]:
+    return {"vendor_id": str(vendor_id), "station_id": str(station_id)}
+
+
+class MetricsSink(ABC):
+    """Receives the duration of every timed stage"""
+    enabled = True
+
+    @abstractmethod
+    def record(self, stage: str, duration_ms: float, dimensions: Dict[str, str]):
+        """Stores one duration of the stage"""
+
+    def flush(self):
+        """Sends what was recorded since the last flush. Called once at the end of an invocation"""
+
+
+class NoOpSink(MetricsSink):
+    enabled = False
+
+    def record(self, stage, duration_ms, dimensions):
+        pass
+
+
+class InMemorySink(MetricsSink):
+    """Keeps every duration per stage and dimensions, for tests and local load tests"""
+    def __init__(self):
+        self.histograms: Dict[Tuple[str, DimensionKey], List[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, stage, duration_ms, dimensions):
+        with self._lock:
+            self.histograms[(stage, tuple(sorted(dimensions.items())))].append(duration_ms)
+
+    def durations(self, stage, **dimensions) -> List[float]:
+        """Durations of the stage for every recorded dimensions which contain the given ones"""
+        with self._lock:
+            return [duration for (recorded_stage, key), durations in self.histograms.items()
+                    if recorded_stage == stage and dimensions.items() <= dict(key).items()
+                    for duration in durations]
+
+    def percentile(self, stage, share: float, **dimensions) -> Optional[float]:
+        durations = sorted(self.durations(stage, **dimensions))
+        if not durations:
+            return None
+        return durations[min(len(durations) - 1, max(0, int(round(share * len(durations))) - 1))]
+
+
+class EmfSink(MetricsSink):
+    """
+    Writes CloudWatch embedded metric format lines on flush, one line per vendor and station with a metric
+    per stage, and more lines when a stage has more than EMF_MAX_VALUES_PER_METRIC values. Lambda ships stdout
+    to CloudWatch logs which extracts the metrics, no api call is made.
+    """
+    def __init__(self, namespace: str, stream=None):
+        self.namespace = namespace
+        self.stream = stream or sys.stdout
+        self.pending: Dict[DimensionKey, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+        self._lock = threading.Lock()
+
+    def record(self, stage, duration_ms, dimensions):
+        with self._lock:
+            self.pending[tuple(sorted(dimensions.items()))][stage].append(round(duration_ms, 3))
+
+    def flush(self):
+        with self._lock:
+            pending, self.pending = self.pending, defaultdict(lambda: defaultdict(list))
+        timestamp = int(time.time() * 1000)
+        for key, pending_stages in pending.items():
+            dimensions = dict(key)
+            longest = max(len(durations) for durations in pending_stages.values())
+            for start in range(0, longest, EMF_MAX_VALUES_PER_METRIC):
+                stages = {stage: durations[start:start + EMF_MAX_VALUES_PER_METRIC]
+                          for stage, durations in pending_stages.items() if len(durations) > start}
+                line = {"_aws": {"Timestamp": timestamp,
+                                 "CloudWatchMetrics": [{"Namespace": self.namespace,
+                                                        "Dimensions": [list(dimensions)],
+                                                        "Metrics": [{"Name": stage, "Unit": "Milliseconds"}
+                                                                    for stage in stages]}]},
+                        **dimensions, **stages}
+                self.stream.write(json.dumps(line) + "\n")
+        self.stream.flush()
+
+
+class StageTimer:
+    __slots__ = ("sink", "stage", "dimensions", "started")
+
+    def __init__(self, sink: MetricsSink, stage: str, dimensions: Dict[str, str]):
+        self.sink = sink
+        self.stage = stage
+        self.dimensions = dimensions
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.sink.record(self.stage, (time.perf_counter() - self.started) * 1000, self.dimensions)
+        return False
+
+
+_metrics_sink: Optional[MetricsSink] = None
+_metrics_sink_lock = threading.Lock()
+# Shared by every stage while metrics are disabled so that timing a stage costs one function call
+_no_timer = nullcontext()
+
+
+def create_metrics_sink(kind: str) -> MetricsSink:
+    if kind == EMF_SINK:
+        return EmfSink(settings.METRICS_NAMESPACE)
+    if kind == MEMORY_SINK:
+        return InMemorySink()
+    if kind != NO_SINK:
+        logger.warning("Unknown metrics sink %s. Metrics are disabled", kind)
+    return NoOpSink()
+
+
+def get_metrics_sink() -> MetricsSink:
+    """Process wide sink chosen by METRICS_SINK"""
+    global _metrics_sink
+    if _metrics_sink is None:
+        with _metrics_sink_lock:
+            if _metrics_sink is None:
+                _metrics_sink = create_metrics_sink(settings.METRICS_SINK)
+    return _metrics_sink
+
+
+def stage_timer(stage: str, dimensions: Dict[str, str]):
+    """Context manager timing the block as the stage, tagged with the dimensions"""
+    sink = get_metrics_sink()
+    if not sink.enabled:
+        return _no_timer
+    return StageTimer(sink, stage, dimensions)
+
+
+def flush_metrics():
+    get_metrics_sink().flush()
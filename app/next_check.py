@@ -0,0 +1,84 @@
+from typing import Optional
+from config import get_settings
+from app.energy_rate import EnergyRateEstimate
+from app.time_calculations import PrepareTimeDataForCurrentState
+from data_store.data_schemas import CollectiveDataForCurrentState
+from data_store.data_structure import ChargingStatus, FINAL_STATUSES
+from logger_init import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+def bounded_delay(seconds: float, max_seconds: Optional[float] = None) -> int:
+    max_seconds = settings.NEXT_CHECK_MAX_SECONDS if max_seconds is None else max_seconds
+    return int(min(max_seconds, max(settings.NEXT_CHECK_MIN_SECONDS, seconds)))
+
+
+def delay_for_remaining(remaining_seconds: float, max_seconds: Optional[float] = None) -> int:
+    """
+    Checks again after a share of the time left, so the checks get closer while the end comes near.
+    At the minimum delay the session is checked at the latest that long after it ended
+    """
+    return bounded_delay(remaining_seconds * settings.NEXT_CHECK_REMAINING_SHARE, max_seconds)
+
+
+def seconds_until_booking_timeout(time_related_data: PrepareTimeDataForCurrentState) -> Optional[float]:
+    if time_related_data.current_booking_duration is None:
+        return None
+    return settings.INITIAL_TIMEOUT_MINUTES.total_seconds() - \
+        time_related_data.current_booking_duration.duration_delta.total_seconds()
+
+
+def seconds_until_target_duration(time_related_data: PrepareTimeDataForCurrentState) -> Optional[float]:
+    if time_related_data.target_duration_delta is None or time_related_data.current_duration is None:
+        return None
+    return time_related_data.target_duration_delta.total_seconds() - \
+        time_related_data.current_duration.duration_delta.total_seconds()
+
+
+def seconds_until_target_energy(collective_data_for_current_state: CollectiveDataForCurrentState,
+                                time_related_data: PrepareTimeDataForCurrentState,
+                                energy_estimate: Optional[EnergyRateEstimate] = None) -> Optional[float]:
+    """
+    Time left at the rate of the recent samples, or at the average rate since the start without samples.
+    None while nothing is consumed yet or when the energy stalled
+    """
+    if energy_estimate is not None and (energy_estimate.stalled or energy_estimate.seconds_to_target is not None):
+        return energy_estimate.seconds_to_target
+    if not collective_data_for_current_state.target_energy_kw or time_related_data.current_duration is None:
+        return None
+    consumed = float(collective_data_for_current_state.session_data.get("current_energy_consumed") or 0)
+    elapsed = time_related_data.current_duration.duration_delta.total_seconds()
+    if consumed <= 0 or elapsed <= 0:
+        return None
+    return (collective_data_for_current_state.target_energy_kw - consumed) / (consumed / elapsed)
+
+
+def next_check_delay(current_status: str, collective_data_for_current_state: CollectiveDataForCurrentState,
+                     time_related_data: PrepareTimeDataForCurrentState,
+                     energy_estimate: Optional[EnergyRateEstimate] = None) -> Optional[int]:
+    """
+    Seconds to wait before checking the session again, within NEXT_CHECK_MIN_SECONDS and NEXT_CHECK_MAX_SECONDS.
+    A booked session is paced by its booking timeout but checked at least every NEXT_CHECK_BOOKED_MAX_SECONDS,
+    so that its start is noticed soon. A started one is paced by the time or energy left to its target.
+    A stalled energy based session has no predicted completion and is checked at NEXT_CHECK_DEFAULT_SECONDS.
+    None for a final status, the session is not checked again.
+    """
+    if current_status in FINAL_STATUSES:
+        return None
+    max_seconds = None
+    if current_status == ChargingStatus.BOOKED.value:
+        remaining = seconds_until_booking_timeout(time_related_data)
+        max_seconds = min(settings.NEXT_CHECK_MAX_SECONDS, settings.NEXT_CHECK_BOOKED_MAX_SECONDS)
+    elif collective_data_for_current_state.target_duration_timestamp:
+        remaining = seconds_until_target_duration(time_related_data)
+    else:
+        remaining = seconds_until_target_energy(collective_data_for_current_state, time_related_data,
+                                                energy_estimate)
+    if remaining is None:
+        return bounded_delay(settings.NEXT_CHECK_DEFAULT_SECONDS, max_seconds)
+    delay = delay_for_remaining(remaining, max_seconds)
+    logger.debug("Next check of booking id %s in %s seconds, %s seconds left",
+                 collective_data_for_current_state.booking_id, delay, remaining)
+    return delay
@@ -0,0 +1,109 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from app.deadline import Deadline, STATUS_STAGE
+from app.metrics import stage_timer, RATE_LIMIT_WAIT
+from config import get_settings
+from logger_init import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+class TokenBucket:
+    """
+    Lets `rate` calls per second through with bursts of up to `burst` calls. A caller which finds the bucket
+    empty reserves the next token and waits for it, unless that takes longer than it is willing to wait.
+    """
+    def __init__(self, rate: float, burst: int, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        # Goes below zero while callers wait for reserved tokens
+        self.tokens = float(burst)
+        self.updated_at = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """Seconds to wait for the reserved token, None without reservation when that is more than `max_wait`"""
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+            if wait > max_wait:
+                return None
+            self.tokens -= 1
+            return wait
+
+    def acquire(self, max_wait: float) -> bool:
+        wait = self.reserve(max_wait)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+
+def parse_vendor_limits(vendor_limits: str) -> Dict[str, Tuple[float, int]]:
+    """Parses VENDOR_RATE_LIMITS like "electrolite=5:10,statiq=2", rate per second and optional burst"""
+    limits = {}
+    for entry in filter(None, (entry.strip() for entry in vendor_limits.split(","))):
+        vendor_id, _, limit = entry.partition("=")
+        rate, _, burst = limit.partition(":")
+        limits[vendor_id.strip()] = (float(rate), int(burst) if burst else settings.VENDOR_RATE_LIMIT_BURST)
+    return limits
+
+
+def vendor_limit(vendor_id: str) -> Tuple[float, int]:
+    return parse_vendor_limits(settings.VENDOR_RATE_LIMITS).get(
+        vendor_id, (settings.VENDOR_RATE_LIMIT_PER_SECOND, settings.VENDOR_RATE_LIMIT_BURST))
+
+
+_rate_limiters: Dict[str, Optional[TokenBucket]] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(vendor_id: str) -> Optional[TokenBucket]:
+    """
+    One bucket per vendor and process, None for a vendor without limit. The bucket is not shared between processes,
+    so a vendor sees the limit once per process calling it. The limit suits the daemon and batch modes, where few
+    processes call a vendor, and each process gets 1 / VENDOR_RATE_LIMIT_CONTAINERS of it. A single session lambda
+    with many concurrent containers is not bounded by it.
+    """
+    if vendor_id not in _rate_limiters:
+        with _rate_limiters_lock:
+            if vendor_id not in _rate_limiters:
+                rate, burst = vendor_limit(vendor_id)
+                containers = max(1, settings.VENDOR_RATE_LIMIT_CONTAINERS)
+                _rate_limiters[vendor_id] = TokenBucket(rate / containers, max(1, burst // containers)) \
+                    if rate > 0 else None
+    return _rate_limiters[vendor_id]
+
+
+class DeferredStatus:
+    """Status response of a booking whose vendor was saturated, the check goes on with the last known data"""
+    def __repr__(self):
+        return "STATUS_DEFERRED"
+
+
+STATUS_DEFERRED = DeferredStatus()
+
+
+def acquire_vendor_token(vendor_id: str, deadline: Optional[Deadline] = None) -> bool:
+    """
+    True when the vendor may be called, after waiting at most VENDOR_RATE_LIMIT_MAX_WAIT_SECONDS for a token.
+    False when the vendor is saturated, the caller should not call it now but defer or use the data it has.
+    The wait is recorded as the rate_limit_wait stage of the vendor.
+    """
+    rate_limiter = get_rate_limiter(vendor_id)
+    if rate_limiter is None:
+        return True
+    max_wait = settings.VENDOR_RATE_LIMIT_MAX_WAIT_SECONDS
+    if deadline is not None:
+        max_wait = min(max_wait, deadline.timeout_for(STATUS_STAGE))
+    with stage_timer(RATE_LIMIT_WAIT, {"vendor_id": str(vendor_id)}):
+        acquired = rate_limiter.acquire(max_wait)
+    if not acquired:
+        logger.warning("Vendor %s is saturated. Not calling its status api now", vendor_id)
+    return acquired
@@ -0,0 +1,220 @@
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+from config import get_settings
+from app.deadline import CallBudget, Deadline
+from exceptions.exception import CircuitOpenException, VendorSaturatedException
+from logger_init import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Responses worth another attempt. Anything else is an answer of the endpoint and is returned as it is
+TRANSIENT_HTTP_STATUS = frozenset({429, 500, 502, 503, 504})
+TRANSIENT_SOCKET_ERROR_CODES = frozenset({"InternalServerError", "ServiceUnavailableException",
+                                          "LimitExceededException", "ThrottlingException", "TooManyRequestsException"})
+
+
+class TransientResponseError(Exception):
+    """Raised for a response with a transient http status so that it is retried like a network error"""
+    def __init__(self, response):
+        super().__init__(f"Transient http status {response.status_code}")
+        self.response = response
+
+
+def raise_for_transient_status(response):
+    if response.status_code in TRANSIENT_HTTP_STATUS:
+        raise TransientResponseError(response)
+    return response
+
+
+def is_transient_http_error(error: Exception) -> bool:
+    # requests is already imported by the http session when a request fails
+    from requests.exceptions import ConnectionError, Timeout
+    return isinstance(error, (ConnectionError, Timeout, TransientResponseError))
+
+
+def is_transient_socket_error(error: Exception) -> bool:
+    """Network errors, throttling and server errors of api gateway. A gone connection is not transient"""
+    from botocore.exceptions import ClientError, ConnectionError, HTTPClientError
+    if isinstance(error, (ConnectionError, HTTPClientError)):
+        return True
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code") in TRANSIENT_SOCKET_ERROR_CODES or \
+            error.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0) >= 500
+    return False
+
+
+@dataclass
+class RetryPolicy:
+    attempts: int
+    base_delay: float
+    max_delay: float
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter, a random delay up to the exponential backoff of the attempt"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+def default_retry_policy() -> RetryPolicy:
+    return RetryPolicy(attempts=settings.RETRY_MAX_ATTEMPTS, base_delay=settings.RETRY_BASE_DELAY_SECONDS,
+                       max_delay=settings.RETRY_MAX_DELAY_SECONDS)
+
+
+class CircuitBreaker:
+    """
+    Fails fast once an endpoint had `failure_threshold` transient failures in a row.
+    After `reset_timeout` seconds one trial request is let through. It closes the circuit on success
+    and opens it again on failure.
+    """
+    def __init__(self, endpoint: str, failure_threshold: int, reset_timeout: float):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._move_to(HALF_OPEN)
+            if self.state == HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self.trial_in_flight = False
+            if self.state != CLOSED:
+                self._move_to(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.trial_in_flight = False
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                if self.state != OPEN:
+                    self._move_to(OPEN)
+
+    def _move_to(self, state):
+        logger.warning("Circuit for %s moved from %s to %s after %s consecutive failures", self.endpoint, self.state,
+                       state, self.consecutive_failures)
+        self.state = state
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.consecutive_failures}
+
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+
+
+def vendor_circuit(endpoint: str, vendor_id) -> str:
+    """Circuit of one vendor behind a shared endpoint, so that a failing vendor does not open it for the others"""
+    return f"{endpoint} (vendor {vendor_id})"
+
+
+def get_circuit_breaker(endpoint: str) -> CircuitBreaker:
+    """One breaker per endpoint, or per circuit name like vendor_circuit, and process"""
+    circuit_breaker = _circuit_breakers.get(endpoint)
+    if circuit_breaker is None:
+        with _circuit_breakers_lock:
+            circuit_breaker = _circuit_breakers.setdefault(
+                endpoint, CircuitBreaker(endpoint, settings.CIRCUIT_FAILURE_THRESHOLD,
+                                         settings.CIRCUIT_RESET_TIMEOUT_SECONDS))
+    return circuit_breaker
+
+
+def circuit_breaker_states() -> Dict[str, Dict]:
+    """State of every circuit of this process, keyed by endpoint"""
+    with _circuit_breakers_lock:
+        circuit_breakers = list(_circuit_breakers.values())
+    return {circuit_breaker.endpoint: circuit_breaker.snapshot() for circuit_breaker in circuit_breakers}
+
+
+def get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _circuit_breakers_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(max_workers=settings.HEDGE_MAX_WORKERS, thread_name_prefix="hedge")
+    return _hedge_executor
+
+
+def hedged_call(request: Callable, hedge_delay: float):
+    """
+    Sends a second identical request when the first one has not answered after `hedge_delay` seconds.
+    The first successful answer wins. Only meant for reads which can safely be sent twice.
+    """
+    executor = get_hedge_executor()
+    first = executor.submit(request)
+    try:
+        return first.result(timeout=hedge_delay)
+    except FutureTimeoutError:
+        logger.info("No answer after %s seconds. Sending a hedged request", hedge_delay)
+    pending = {first, executor.submit(request)}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def call_with_retry(endpoint: str, request: Callable, is_transient: Callable[[Exception], bool],
+                    policy: Optional[RetryPolicy] = None, deadline: Optional[Deadline] = None,
+                    hedge_delay: Optional[float] = None, circuit: Optional[str] = None,
+                    budget: Optional[CallBudget] = None, acquire_token: Optional[Callable[[], bool]] = None):
+    """
+    Runs the request through the circuit breaker of the endpoint, or of `circuit` when given, and retries transient
+    errors with jittered backoff. Gives up when the attempts are used or the next backoff does not fit in the
+    deadline or in the budget of the call, then the last error is raised. Raises CircuitOpenException without
+    calling the endpoint while its circuit is open. Every attempt first takes a token with `acquire_token` when
+    given, VendorSaturatedException is raised without calling the endpoint when there is none.
+    """
+    policy = policy or default_retry_policy()
+    circuit = circuit or endpoint
+    circuit_breaker = get_circuit_breaker(circuit)
+    for attempt in range(1, policy.attempts + 1):
+        if acquire_token is not None and not acquire_token():
+            raise VendorSaturatedException(code=429, message=f"No token to call {endpoint} now")
+        if not circuit_breaker.allow_request():
+            raise CircuitOpenException(code=503, message=f"Circuit for {circuit} is open",
+                                       detail_error=circuit_breaker.snapshot())
+        try:
+            result = hedged_call(request, hedge_delay) if hedge_delay else request()
+        except Exception as e:
+            if not is_transient(e):
+                # The endpoint did answer, the error belongs to the request
+                circuit_breaker.record_success()
+                raise
+            circuit_breaker.record_failure()
+            delay = policy.backoff(attempt)
+            if attempt == policy.attempts or (deadline is not None and deadline.remaining() <= delay) or \
+                    (budget is not None and not budget.allows_retry_after(delay)):
+                logger.warning("Giving up on %s after %s attempts: %r", endpoint, attempt, e)
+                raise
+            logger.warning("Attempt %s on %s failed with %r. Retrying in %.3f seconds", attempt, endpoint, e, delay)
+            time.sleep(delay)
+        else:
+            circuit_breaker.record_success()
+            return result
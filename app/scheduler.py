@@ -0,0 +1,206 @@
+import argparse
+import heapq
+import itertools
+import json
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from app import get_socket_client
+from app.batch import monitor_batch_item
+from app.deadline import Deadline
+from app.metrics import flush_metrics
+from app.write_behind import flush_write_behind
+from config import get_settings
+from data_store.data_schemas import BatchSessionResult
+from data_store.data_structure import ChargingStatus, FINAL_STATUSES
+from logger_init import get_logger, flush_logs
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+SessionKey = Tuple[str, str]
+
+
+def session_key(event) -> SessionKey:
+    return event["booking_id"], event["vendor_id"]
+
+
+@dataclass
+class ScheduledSession:
+    event: Dict
+    due_at: float
+    # Bumped on every reschedule, heap entries of an older generation are skipped
+    generation: int = 0
+    consecutive_failures: int = 0
+    polls: int = 0
+    last_status: Optional[str] = None
+
+
+@dataclass
+class SchedulerStats:
+    polls: int = 0
+    failures: int = 0
+    finished: Dict[str, int] = field(default_factory=dict)
+
+
+def poll_session(event, socket_client) -> BatchSessionResult:
+    """One check of the session, the same as one lambda invocation of the state machine"""
+    return monitor_batch_item(event, socket_client, Deadline(settings.SCHEDULER_POLL_BUDGET_MS, reserve_ms=0))
+
+
+class SessionScheduler:
+    """
+    Long running monitor of many sessions in one process. Active sessions wait in a heap keyed on the time they
+    are due. Due sessions are polled on a bounded pool, a session stays in the heap while all workers are busy.
+    After a poll the session is due again after the next check delay of the result, or the poll interval when
+    the result has none, unless it reached a final status or failed `SCHEDULER_MAX_CONSECUTIVE_FAILURES` times in
+    a row, then it drops out.
+    """
+    def __init__(self, poll: Optional[Callable[[Dict], BatchSessionResult]] = None, poll_interval=None,
+                 max_workers=None, clock=time.monotonic):
+        self.poll = poll or (lambda event: poll_session(event, get_socket_client()))
+        self.poll_interval = settings.SCHEDULER_POLL_INTERVAL_SECONDS if poll_interval is None else poll_interval
+        self.max_workers = max_workers or settings.SCHEDULER_MAX_WORKERS
+        self.clock = clock
+        self.sessions: Dict[SessionKey, ScheduledSession] = {}
+        self.stats = SchedulerStats()
+        self._heap: List[Tuple[float, int, SessionKey, int]] = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scheduler")
+        self._condition = threading.Condition()
+
+    def add(self, event, delay: float = 0):
+        """Starts monitoring the session, or moves its next poll when it is already monitored"""
+        key = session_key(event)
+        with self._condition:
+            scheduled = self.sessions.get(key)
+            if scheduled is None:
+                scheduled = self.sessions[key] = ScheduledSession(event=event, due_at=0)
+            else:
+                scheduled.event = event
+            self._push(key, scheduled, self.clock() + delay)
+            self._condition.notify()
+
+    def remove(self, booking_id, vendor_id):
+        with self._condition:
+            self.sessions.pop((booking_id, vendor_id), None)
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def _push(self, key: SessionKey, scheduled: ScheduledSession, due_at: float):
+        scheduled.generation += 1
+        scheduled.due_at = due_at
+        heapq.heappush(self._heap, (due_at, next(self._sequence), key, scheduled.generation))
+
+    def _pop_due(self) -> List[ScheduledSession]:
+        due = []
+        now = self.clock()
+        while self._heap and self._heap[0][0] <= now and self._in_flight < self.max_workers:
+            _, _, key, generation = heapq.heappop(self._heap)
+            scheduled = self.sessions.get(key)
+            if scheduled is None or scheduled.generation != generation:
+                continue
+            self._in_flight += 1
+            due.append(scheduled)
+        return due
+
+    def run_due(self) -> int:
+        """Submits every due session which has a free worker and returns their number"""
+        with self._condition:
+            due = self._pop_due()
+        for scheduled in due:
+            self._executor.submit(self._run, scheduled)
+        return len(due)
+
+    def _run(self, scheduled: ScheduledSession):
+        key = session_key(scheduled.event)
+        try:
+            result = self.poll(scheduled.event)
+        except Exception as e:
+            logger.exception("Polling booking id %s failed", key[0])
+            result = BatchSessionResult(booking_id=key[0], vendor_id=key[1],
+                                        current_status=ChargingStatus.TERMINATED.value, error=repr(e))
+        with self._condition:
+            self._finish_poll(key, scheduled, result)
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def _finish_poll(self, key: SessionKey, scheduled: ScheduledSession, result: BatchSessionResult):
+        self.stats.polls += 1
+        scheduled.polls += 1
+        if self.sessions.get(key) is not scheduled:
+            return
+        if result.error:
+            self.stats.failures += 1
+            scheduled.consecutive_failures += 1
+            if scheduled.consecutive_failures < settings.SCHEDULER_MAX_CONSECUTIVE_FAILURES:
+                self._push(key, scheduled, self.clock() + self.poll_interval)
+                return
+            logger.error("Booking id %s failed %s polls in a row. It is not monitored anymore", key[0],
+                         scheduled.consecutive_failures)
+        else:
+            scheduled.consecutive_failures = 0
+            scheduled.last_status = result.current_status
+            if result.current_status not in FINAL_STATUSES:
+                delay = self.poll_interval if result.next_check_delay_seconds is None else \
+                    result.next_check_delay_seconds
+                self._push(key, scheduled, self.clock() + delay)
+                return
+        del self.sessions[key]
+        self.stats.finished[result.current_status] = self.stats.finished.get(result.current_status, 0) + 1
+        logger.info("Booking id %s reached %s after %s polls", key[0], result.current_status, scheduled.polls)
+
+    def run_forever(self, stop: threading.Event, idle_wait=1.0):
+        """Polls due sessions until `stop` is set. Sleeps until the next session is due or a session is added"""
+        while not stop.is_set():
+            self.run_due()
+            flush_metrics()
+            flush_logs()
+            with self._condition:
+                wait = self._next_wakeup(idle_wait)
+                if wait > 0:
+                    self._condition.wait(wait)
+
+    def _next_wakeup(self, idle_wait) -> float:
+        if not self._heap or self._in_flight >= self.max_workers:
+            return idle_wait
+        return min(idle_wait, max(0.0, self._heap[0][0] - self.clock()))
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+        failed = flush_write_behind()
+        if failed:
+            logger.error("%s session updates were not written before the scheduler stopped", len(failed))
+
+
+def add_events_from(scheduler: SessionScheduler, lines: Iterable[str]):
+    """Adds the session of every json line until the lines end. A line which is not a session event is skipped"""
+    for line in filter(None, (line.strip() for line in lines)):
+        try:
+            scheduler.add(json.loads(line))
+        except (ValueError, TypeError, KeyError):
+            logger.exception("Skipping session event %s", line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monitors the sessions read as json lines from stdin, also the ones "
+                                                 "which arrive while it runs, until it gets SIGINT or SIGTERM")
+    parser.add_argument("--poll-interval", type=float, default=settings.SCHEDULER_POLL_INTERVAL_SECONDS)
+    parser.add_argument("--max-workers", type=int, default=settings.SCHEDULER_MAX_WORKERS)
+    args = parser.parse_args()
+
+    scheduler = SessionScheduler(poll_interval=args.poll_interval, max_workers=args.max_workers)
+    stop_event = threading.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signal_number, lambda *_: stop_event.set())
+    # New bookings are added while the due ones are polled. The end of stdin does not stop the daemon
+    threading.Thread(target=add_events_from, args=(scheduler, sys.stdin), name="session-events", daemon=True).start()
+    scheduler.run_forever(stop_event)
+    scheduler.shutdown()
+    print(json.dumps(vars(scheduler.stats)))
@@ -0,0 +1,217 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from app.deadline import CallBudget, Deadline, READ_STAGE, WRITE_STAGE
+from app.http_client import get_http_session
+from app.resilience import call_with_retry, default_retry_policy, is_transient_http_error, \
+    raise_for_transient_status
+from config import get_settings
+from data_store.data_schemas import DataToUpdateInSessionTable
+from exceptions.exception import DbFetchException
+from logger_init import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+SESSION_TABLE = "ChargingSessionRecords"
+
+SessionKey = Tuple[str, str]
+
+
+def chunks(entries: List, size: int) -> Iterable[List]:
+    for start in range(0, len(entries), size):
+        yield entries[start:start + size]
+
+
+def update_key(update: DataToUpdateInSessionTable) -> SessionKey:
+    return update.primary_key["booking_id"], update.sort_key["vendor_id"]
+
+
+def coalesce_updates(updates: List[DataToUpdateInSessionTable]) -> List[DataToUpdateInSessionTable]:
+    """One update per session, later attributes win. A batch may not hold the same key twice"""
+    coalesced: Dict[SessionKey, DataToUpdateInSessionTable] = {}
+    for update in updates:
+        key = update_key(update)
+        if key in coalesced:
+            coalesced[key] = coalesced[key].copy(
+                update={"data_to_update": {**coalesced[key].data_to_update, **update.data_to_update}})
+        else:
+            coalesced[key] = update
+    return list(coalesced.values())
+
+
+class SessionTableClient(ABC):
+    """
+    Reads and writes many session records with one request per `batch_size` records. The table may leave part
+    of a batch unprocessed when it is throttled, that part is sent again with backoff up to `max_rounds` times.
+    """
+    def __init__(self, batch_size: Optional[int] = None, max_rounds: Optional[int] = None):
+        self.batch_size = batch_size or settings.DB_BATCH_SIZE
+        self.max_rounds = max_rounds or settings.DB_BATCH_MAX_ROUNDS
+
+    @abstractmethod
+    def read_chunk(self, keys: List[SessionKey]) -> Tuple[List[Dict], List[SessionKey]]:
+        """Returns the found records and the keys left unprocessed. A missing record is not unprocessed"""
+
+    @abstractmethod
+    def write_chunk(self, updates: List[DataToUpdateInSessionTable]) -> List[DataToUpdateInSessionTable]:
+        """Returns the updates left unprocessed"""
+
+    def send_until_processed(self, pending: List, send: Callable[[List], List]) -> List:
+        """Returns what is still unprocessed after the last round"""
+        policy = default_retry_policy()
+        for attempt in range(1, self.max_rounds + 1):
+            pending = send(pending)
+            if not pending or attempt == self.max_rounds:
+                return pending
+            logger.info("%s entries were left unprocessed. Sending them again", len(pending))
+            time.sleep(policy.backoff(attempt))
+        return pending
+
+    def batch_read(self, keys: List[SessionKey]) -> Tuple[Dict[SessionKey, Dict], List[SessionKey]]:
+        """
+        Records keyed by (booking_id, vendor_id), and the keys still unprocessed after the last round. A key which
+        is in neither has no record in the table
+        """
+        items: Dict[SessionKey, Dict] = {}
+        still_unprocessed: List[SessionKey] = []
+
+        def send(pending_keys):
+            found, unprocessed = self.read_chunk(pending_keys)
+            for item in found:
+                items[(item["booking_id"], item["vendor_id"])] = item
+            return unprocessed
+
+        for chunk in chunks(list(dict.fromkeys(keys)), self.batch_size):
+            unprocessed = self.send_until_processed(chunk, send)
+            if unprocessed:
+                logger.warning("%s session records were not read after %s rounds", len(unprocessed), self.max_rounds)
+                still_unprocessed.extend(unprocessed)
+        return items, still_unprocessed
+
+    def batch_write(self, updates: List[DataToUpdateInSessionTable]) -> List[DataToUpdateInSessionTable]:
+        """Writes the updates and returns the ones which could not be written"""
+        failed = []
+        for chunk in chunks(coalesce_updates(updates), self.batch_size):
+            try:
+                failed.extend(self.send_until_processed(chunk, self.write_chunk))
+            except Exception:
+                logger.exception("Unable to write a batch of %s session records", len(chunk))
+                failed.extend(chunk)
+        if failed:
+            logger.warning("%s session records were not written", len(failed))
+        return failed
+
+
+class HttpSessionTableClient(SessionTableClient):
+    """
+    Batch requests to DB_API, next to read_table and update_table:
+        {"batch_read_table": true, "table_name": ..., "keys": [{"booking_id": ..., "vendor_id": ...}]}
+            -> {"items": [...], "unprocessed_keys": [{"booking_id": ..., "vendor_id": ...}]}
+        {"batch_update_table": true, "table_name": ..., "updates": [<update_table request>, ...]}
+            -> {"unprocessed_updates": [<update_table request>, ...]}
+    DB_API has to implement these two requests before DB_BULK_IO is turned on. Only the stub services of
+    tools/load_harness.py are known to support them. A DB_API which does not know them may answer with an
+    error, which fails the batch, or may take a batch_update_table request for something else, so the
+    contract has to be checked against the deployed DB_API first. A batch answer without its list of
+    unprocessed entries fails the batch instead of being taken as fully processed.
+    Without `bulk_io`, DB_BULK_IO by default, the updates are written with one update_table request each.
+    """
+    def __init__(self, db_api=None, deadline: Optional[Deadline] = None, batch_size=None, max_rounds=None,
+                 bulk_io: Optional[bool] = None):
+        super().__init__(batch_size, max_rounds)
+        self.db_api = db_api or settings.DB_API
+        self.deadline = deadline
+        self.bulk_io = settings.DB_BULK_IO if bulk_io is None else bulk_io
+
+    def post(self, body: Dict, stage) -> Dict:
+        budget = CallBudget(settings.REQUEST_TIMEOUT_SECONDS if self.deadline is None else
+                            self.deadline.timeout_for(stage), self.deadline)
+        response = call_with_retry(
+            self.db_api,
+            lambda: raise_for_transient_status(get_http_session().post(self.db_api, json=body,
+                                                                       timeout=budget.attempt_timeout())),
+            is_transient_http_error, deadline=self.deadline, budget=budget)
+        return response.json()
+
+    @staticmethod
+    def batch_answer(response: Dict, *keys: str) -> Dict:
+        missing = [key for key in keys if not isinstance(response.get(key), list)]
+        if missing:
+            raise DbFetchException(code=500, message="Unexpected answer to a batch request",
+                                   detail_error=f"missing {', '.join(missing)}")
+        return response
+
+    def read_chunk(self, keys):
+        response = self.batch_answer(self.post({"batch_read_table": True, "table_name": SESSION_TABLE,
+                                                "keys": [{"booking_id": booking_id, "vendor_id": vendor_id}
+                                                         for booking_id, vendor_id in keys]}, READ_STAGE),
+                                     "items", "unprocessed_keys")
+        return response["items"], [(key["booking_id"], key["vendor_id"]) for key in response["unprocessed_keys"]]
+
+    def write_chunk(self, updates):
+        if not self.bulk_io:
+            return self.write_one_by_one(updates)
+        response = self.batch_answer(self.post({"batch_update_table": True, "table_name": SESSION_TABLE,
+                                                "updates": [update.dict() for update in updates]}, WRITE_STAGE),
+                                     "unprocessed_updates")
+        return [DataToUpdateInSessionTable.parse_obj(update) for update in response["unprocessed_updates"]]
+
+    def write_one_by_one(self, updates):
+        unprocessed = []
+        for update in updates:
+            try:
+                self.post(update.dict(), WRITE_STAGE)
+            except Exception:
+                logger.exception("Unable to write the session record of %s", update_key(update))
+                unprocessed.append(update)
+        return unprocessed
+
+
+class InMemorySessionTableClient(SessionTableClient):
+    """
+    Local stand-in with the contract of HttpSessionTableClient, for tests and local runs. Each request processes
+    at most `max_items_per_request` entries and leaves the rest unprocessed, like a throttled table
+    """
+    def __init__(self, items: Optional[Iterable[Dict]] = None, max_items_per_request: Optional[int] = None,
+                 batch_size=None, max_rounds=None):
+        super().__init__(batch_size, max_rounds)
+        self.items: Dict[SessionKey, Dict] = {}
+        self.max_items_per_request = max_items_per_request
+        self.read_requests = 0
+        self.write_requests = 0
+        self._lock = threading.Lock()
+        for item in items or []:
+            self.put(item)
+
+    def put(self, item: Dict):
+        with self._lock:
+            self.items[(item["booking_id"], item["vendor_id"])] = dict(item)
+
+    def split(self, entries: List) -> Tuple[List, List]:
+        if self.max_items_per_request is None:
+            return entries, []
+        return entries[:self.max_items_per_request], entries[self.max_items_per_request:]
+
+    def read_chunk(self, keys):
+        processed, unprocessed = self.split(keys)
+        with self._lock:
+            self.read_requests += 1
+            found = [dict(self.items[key]) for key in processed if key in self.items]
+        return found, unprocessed
+
+    def write_chunk(self, updates):
+        processed, unprocessed = self.split(updates)
+        with self._lock:
+            self.write_requests += 1
+            for update in processed:
+                self.items.setdefault(update_key(update), {"booking_id": update.primary_key["booking_id"],
+                                                           "vendor_id": update.sort_key["vendor_id"]}) \
+                    .update(update.data_to_update)
+        return unprocessed
+
+
+def get_session_table_client(deadline: Optional[Deadline] = None) -> SessionTableClient:
+    """Client of DB_API for one invocation, bounded by its deadline"""
+    return HttpSessionTableClient(deadline=deadline)
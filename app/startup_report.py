@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import List
+from config import get_settings
+
+settings = get_settings()
+
+# Modules which must not be imported while a handler module is imported
+LAZY_MODULES = ("boto3", "botocore", "requests", "numpy")
+
+
+@dataclass
+class ImportTiming:
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+@dataclass
+class ImportTimeReport:
+    module: str
+    timings: List[ImportTiming]
+
+    @property
+    def total_ms(self) -> float:
+        return next(timing.cumulative_us for timing in self.timings if timing.module == self.module) / 1000
+
+    def imported(self, module) -> bool:
+        return any(timing.module == module or timing.module.startswith(f"{module}.") for timing in self.timings)
+
+    def eager_lazy_modules(self) -> List[str]:
+        return [module for module in LAZY_MODULES if self.imported(module)]
+
+    def within_budget(self, budget_ms=None) -> bool:
+        return self.total_ms <= (budget_ms or settings.IMPORT_TIME_BUDGET_MS)
+
+    def slowest(self, count=10) -> List[ImportTiming]:
+        return sorted(self.timings, key=lambda timing: timing.self_us, reverse=True)[:count]
+
+
+def measure_import_time(module="lambda_handler") -> ImportTimeReport:
+    """
+    Imports the module in a fresh interpreter with -X importtime, the same way a cold start does,
+    and returns the timings of every module imported on the way.
+    """
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               cwd=project_root, capture_output=True, text=True, check=True)
+    timings = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, imported_module = line[len("import time:"):].split("|")
+        timings.append(ImportTiming(module=imported_module.strip(), self_us=int(self_us),
+                                    cumulative_us=int(cumulative_us)))
+    return ImportTimeReport(module=module, timings=timings)
+
+
+if __name__ == "__main__":
+    report = measure_import_time(sys.argv[1] if len(sys.argv) > 1 else "lambda_handler")
+    print(f"Importing {report.module} took {report.total_ms:.1f} ms "
+          f"(budget {settings.IMPORT_TIME_BUDGET_MS} ms)")
+    print(f"Lazy modules imported eagerly: {report.eager_lazy_modules()}")
+    for timing in report.slowest():
+        print(f"{timing.self_us / 1000:8.1f} ms  {timing.module}")
@@ -0,0 +1,120 @@
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+from app.api_caller import call_api
+from app.deadline import Deadline, STATUS_STAGE
+from app.rate_limit import DeferredStatus, STATUS_DEFERRED, acquire_vendor_token
+from app.resilience import vendor_circuit
+from app.metrics import stage_timer, STATUS_CALL
+from app.session_table import SessionKey, chunks
+from app.status_manager import request_booking_status
+from config import get_settings
+from exceptions.exception import VendorSaturatedException
+from logger_init import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+STATUS_REQUEST_KEYS = ("booking_id", "vendor_id", "expanded_vehicle_data")
+
+# A status response, or STATUS_DEFERRED for a booking whose vendor is saturated
+StatusResponse = Union[Dict, DeferredStatus]
+
+
+def batch_vendors() -> frozenset:
+    """Vendors listed in STATUS_BATCH_VENDORS, like "electrolite,statiq" """
+    return frozenset(filter(None, (vendor.strip() for vendor in settings.STATUS_BATCH_VENDORS.split(","))))
+
+
+def status_batching_enabled() -> bool:
+    return bool(settings.STATUS_BATCH_URL and batch_vendors())
+
+
+def event_key(event) -> SessionKey:
+    return event.get("booking_id"), event.get("vendor_id")
+
+
+def status_timeout(deadline: Optional[Deadline]) -> float:
+    return settings.REQUEST_TIMEOUT_SECONDS if deadline is None else deadline.timeout_for(STATUS_STAGE)
+
+
+def call_status_batch_api(vendor_id, events: List, deadline: Optional[Deadline] = None) -> StatusResponse:
+    """
+    One status call for many bookings of a vendor:
+        POST STATUS_BATCH_URL?vendor_id=...  {"bookings": [{"booking_id": ..., "expanded_vehicle_data": ...}]}
+            -> {"statuses": {"<booking_id>": <status response of the booking>}}
+    Returns the status responses keyed by booking id, empty when the call failed. Every attempt takes a token of
+    the vendor, STATUS_DEFERRED is returned when the vendor is saturated
+    """
+    try:
+        with stage_timer(STATUS_CALL, {"vendor_id": str(vendor_id)}):
+            response = call_api(settings.STATUS_BATCH_URL, params={"vendor_id": vendor_id},
+                                body={"bookings": [{"booking_id": event["booking_id"],
+                                                    "expanded_vehicle_data": event["expanded_vehicle_data"]}
+                                                   for event in events]},
+                                timeout=status_timeout(deadline), deadline=deadline,
+                                circuit=vendor_circuit(settings.STATUS_BATCH_URL, vendor_id),
+                                acquire_token=lambda: acquire_vendor_token(vendor_id, deadline))
+    except VendorSaturatedException:
+        return STATUS_DEFERRED
+    statuses = response.get("statuses") if isinstance(response, dict) else None
+    return statuses if isinstance(statuses, dict) else {}
+
+
+def result_or_empty(future: Future, booking_ids) -> Dict:
+    try:
+        return future.result()
+    except Exception:
+        logger.exception("Status call failed for booking ids %s. Continuing with last known session data",
+                         booking_ids)
+        return {}
+
+
+def refresh_statuses(events: List, deadline: Optional[Deadline] = None) -> Dict[SessionKey, StatusResponse]:
+    """
+    Status response of every event keyed by (booking_id, vendor_id). The bookings of a vendor in
+    STATUS_BATCH_VENDORS are refreshed STATUS_BATCH_SIZE at a time with one call, the others one by one.
+    A booking left out of a batch answer is called on its own. When the batch call failed its bookings get
+    an empty response, like a failed single call, so that a vendor in trouble is not called once per booking.
+    The bookings of a saturated vendor get STATUS_DEFERRED, the check goes on with their last known data.
+    An event which can not make a status request is left out, it fails in its own pipeline.
+    """
+    events = [event for event in events if all(name in event for name in STATUS_REQUEST_KEYS)]
+    vendors = batch_vendors() if settings.STATUS_BATCH_URL else frozenset()
+    events_by_vendor: Dict[str, List] = defaultdict(list)
+    for event in events:
+        events_by_vendor[event["vendor_id"]].append(event)
+    batches: List[Tuple[str, List]] = [(vendor_id, chunk) for vendor_id, vendor_events in events_by_vendor.items()
+                                       if vendor_id in vendors
+                                       for chunk in chunks(vendor_events, settings.STATUS_BATCH_SIZE)]
+    single_events = [event for event in events if event["vendor_id"] not in vendors]
+    responses: Dict[SessionKey, StatusResponse] = {}
+    if not events:
+        return responses
+    with ThreadPoolExecutor(max_workers=min(settings.BATCH_MAX_WORKERS, len(batches) + len(single_events))) \
+            as executor:
+        batch_futures = [(chunk, executor.submit(call_status_batch_api, vendor_id, chunk, deadline))
+                         for vendor_id, chunk in batches]
+        single_futures = [(event, executor.submit(request_booking_status, event, deadline))
+                          for event in single_events]
+        missing = []
+        for chunk, future in batch_futures:
+            statuses = result_or_empty(future, [event["booking_id"] for event in chunk])
+            for event in chunk:
+                if statuses is STATUS_DEFERRED:
+                    responses[event_key(event)] = STATUS_DEFERRED
+                elif event["booking_id"] in statuses:
+                    responses[event_key(event)] = statuses[event["booking_id"]]
+                elif statuses:
+                    missing.append(event)
+                else:
+                    responses[event_key(event)] = {}
+        if missing:
+            logger.info("%s bookings were not in the batch status answer. Calling them one by one", len(missing))
+            single_futures.extend((event, executor.submit(request_booking_status, event, deadline))
+                                  for event in missing)
+        for event, future in single_futures:
+            responses[event_key(event)] = result_or_empty(future, [event["booking_id"]])
+    logger.info("Refreshed %s bookings with %s batch and %s single status calls", len(events), len(batches),
+                len(single_futures))
+    return responses
@@ -1,54 +1,318 @@
-from logger_init import get_logger
-from config import Settings
+from logger_init import get_logger, submit_with_log_context
+from config import get_settings
 from json.decoder import JSONDecodeError
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from app.poller import ChargingSessionMonitor
-from typing import Dict
+from typing import Dict, List, Optional
+from app import get_socket_client, is_process_socket_client
 from app.api_caller import call_api
-from app.decision_making_functions import decider
+from app.http_client import get_http_session
+from app.deadline import CallBudget, Deadline, STATUS_STAGE, READ_STAGE, WRITE_STAGE, SOCKET_STAGE
+from app.resilience import call_with_retry, is_transient_http_error, is_transient_socket_error, \
+    raise_for_transient_status, vendor_circuit
+from app.metrics import stage_timer, metric_dimensions, STATUS_CALL, DB_READ, TIME_CALCULATION, DB_WRITE, \
+    SOCKET_PUSH
+from app.next_check import next_check_delay
+from app.energy_rate import EnergyRateEstimate, get_energy_rate_registry
+from app.write_behind import get_write_behind_buffer
+from app.rate_limit import acquire_vendor_token, STATUS_DEFERRED
+from app.live_update import LiveUpdateTracker, PreparedLiveUpdate, get_live_update_tracker
+from app.decision_making_functions import get_decision_table, select_strategy, ENERGY_STRATEGY
 from app.time_calculations import PrepareTimeDataForCurrentState
-from app.final_data_maker import FinalDataToReturnForDB
-from exceptions.exception import DbFetchException, SocketException
-from data_store.data_schemas import DataToUpdateInSessionTable, DataForLiveUpdate, CollectiveDataForCurrentState
-import requests
+from app.final_data_maker import FinalDataToReturnForDB, changed_data_to_update
+from data_store.data_structure import ChargingStatus, FINAL_STATUSES
+from exceptions.exception import DbFetchException, SocketException, CircuitOpenException, \
+    VendorSaturatedException
+from data_store.data_schemas import DataToUpdateInSessionTable, DataForLiveUpdate, CollectiveDataForCurrentState, \
+    LiveUpdateRecord, SocketDeliveryReport, FinalStageReport
 import simplejson
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
 
 logger = get_logger(__name__)
-settings = Settings()
+settings = get_settings()
+
+# Keys of a ChargingSessionRecords item which the monitor reads while checking the current state
+SESSION_RECORD_REQUIRED_KEYS = frozenset({"booking_id", "vendor_id", "current_status", "start_time", "booking_time",
+                                          "user_stopped", "current_energy_consumed", "expanded_vehicle_data",
+                                          "socket_connection_id"})
+
+
+@dataclass
+class SessionWriteStats:
+    """Counts the session table writes saved by change aware writes in this process"""
+    writes: int = 0
+    writes_skipped: int = 0
+    attributes_skipped: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, full_payload: DataToUpdateInSessionTable, payload_to_write: Optional[DataToUpdateInSessionTable]):
+        with self._lock:
+            if payload_to_write is None:
+                self.writes_skipped += 1
+                self.attributes_skipped += len(full_payload.data_to_update)
+            else:
+                self.writes += 1
+                self.attributes_skipped += len(full_payload.data_to_update) - len(payload_to_write.data_to_update)
+
+
+session_write_stats = SessionWriteStats()
+
+# A dependency which is down for a while. The session itself is fine, it keeps its status and is checked again later
+DEPENDENCY_UNAVAILABLE_ERRORS = (DbFetchException, CircuitOpenException)
+
+
+def status_to_keep(event) -> str:
+    """Status the session had before a check which could not run. An event without status can not be checked again"""
+    return event.get("current_status") or ChargingStatus.TERMINATED.value
+
+
+def request_booking_status(event, deadline: Optional[Deadline] = None, dimensions: Optional[Dict] = None):
+    """
+    Status call of one booking, timed as the status_call stage. Made by StatusManager.call_status_api and by
+    refresh_statuses for the bookings which are not batched. Every attempt takes a token of the vendor.
+    Returns {} when the call failed and STATUS_DEFERRED when the vendor is saturated
+    """
+    vendor_id = event["vendor_id"]
+    timeout = settings.REQUEST_TIMEOUT_SECONDS if deadline is None else deadline.timeout_for(STATUS_STAGE)
+    try:
+        with stage_timer(STATUS_CALL, dimensions or metric_dimensions(vendor_id, event.get("station_id"))):
+            return call_api(settings.STATUS_URL, params={"booking_id": event["booking_id"], "vendor_id": vendor_id},
+                            body={"expanded_vehicle_data": event["expanded_vehicle_data"]}, timeout=timeout,
+                            deadline=deadline, circuit=vendor_circuit(settings.STATUS_URL, vendor_id),
+                            acquire_token=lambda: acquire_vendor_token(vendor_id, deadline))
+    except VendorSaturatedException:
+        return STATUS_DEFERRED
+
+
+_socket_executor: Optional[ThreadPoolExecutor] = None
+_side_effect_executor: Optional[ThreadPoolExecutor] = None
+_socket_executor_lock = threading.Lock()
+
+
+def wait_for_side_effect(future: Future, deadline: float):
+    """Returns the result of the side effect, or its timeout or error. A side effect never fails the check"""
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except Exception as e:
+        return e
+
+
+def get_side_effect_executor() -> ThreadPoolExecutor:
+    """Pool running the session table write and the socket push of the final stage side by side"""
+    global _side_effect_executor
+    if _side_effect_executor is None:
+        with _socket_executor_lock:
+            if _side_effect_executor is None:
+                _side_effect_executor = ThreadPoolExecutor(max_workers=settings.SIDE_EFFECT_MAX_WORKERS,
+                                                           thread_name_prefix="side-effect")
+    return _side_effect_executor
+
+
+def get_socket_executor() -> ThreadPoolExecutor:
+    """Bounded pool shared by all socket fan-outs of this process"""
+    global _socket_executor
+    if _socket_executor is None:
+        with _socket_executor_lock:
+            if _socket_executor is None:
+                _socket_executor = ThreadPoolExecutor(max_workers=settings.SOCKET_FANOUT_MAX_WORKERS,
+                                                      thread_name_prefix="socket-fanout")
+    return _socket_executor
+
+
+def is_gone_connection_error(error: Exception) -> bool:
+    """True when api gateway reports that the connection does not exist anymore"""
+    if type(error).__name__ == "GoneException":
+        return True
+    response = getattr(error, "response", None) or {}
+    return response.get("Error", {}).get("Code") == "GoneException" or \
+        response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 410
 
 
 class SocketCommunicator:
-    def __init__(self, socket_client, data_to_parse):
+    def __init__(self, socket_client, data_to_parse, live_update: Optional[LiveUpdateRecord] = None,
+                 live_update_tracker: Optional[LiveUpdateTracker] = None, deadline: Optional[Deadline] = None):
         self.socket_client = socket_client
-        try:
-            self.connection_id = data_to_parse["socket_connection_id"]
-        except KeyError:
+        self.deadline = deadline
+        self.metric_dimensions = metric_dimensions(data_to_parse.get("vendor_id"), data_to_parse.get("station_id"))
+        self.connection_ids = self.collect_connection_ids(data_to_parse)
+        if not self.connection_ids:
             raise SocketException(code=400, message="There is no connection id in the incoming data")
-        self.parsed_data_to_send_on_socket = self.parse_data_for_live_update(data_to_parse)
+        self.connection_id = self.connection_ids[0]
+        self.live_update_tracker = live_update_tracker if live_update_tracker is not None else \
+            get_live_update_tracker()
+        # Set on the session record when a client asks for the full state again
+        self.force_snapshot = bool(data_to_parse.get("live_update_snapshot_requested"))
+        self.persisted_seq = data_to_parse.get("live_update_seq")
+        self.prepared: Optional[Dict[str, Optional[PreparedLiveUpdate]]] = None
+        if self.live_update_tracker is not None:
+            self.live_update_payload = live_update.dict() if live_update is not None else \
+                DataForLiveUpdate.parse_obj(data_to_parse).dict()
+        elif live_update is not None:
+            self.parsed_data_to_send_on_socket = live_update.json()
+        else:
+            self.parsed_data_to_send_on_socket = self.parse_data_for_live_update(data_to_parse)
+        self.delivery_report = SocketDeliveryReport()
+
+    @staticmethod
+    def collect_connection_ids(data_to_parse) -> List[str]:
+        """A session can be watched from many clients so socket_connection_id may also hold a list of ids"""
+        connection_ids = data_to_parse.get("socket_connection_id")
+        if isinstance(connection_ids, str):
+            connection_ids = [connection_ids]
+        connection_ids = list(connection_ids or []) + list(data_to_parse.get("socket_connection_ids") or [])
+        return list(dict.fromkeys(connection_id for connection_id in connection_ids if connection_id))
 
     @staticmethod
     def parse_data_for_live_update(parsed_data):
         return DataForLiveUpdate.parse_obj(parsed_data).json()
 
-    def send_message_to_socket(self):
+    def socket_client_for_call(self, budget: CallBudget):
+        """
+        The process client bounded by what is left of the budget of the post. Another client, like a test double,
+        is used as it is
+        """
+        if self.deadline is None or not is_process_socket_client(self.socket_client):
+            return self.socket_client
+        return get_socket_client(budget.attempt_timeout())
+
+    def post_to_connection(self, connection_id, data) -> bool:
+        budget = CallBudget(settings.SOCKET_PUSH_TIMEOUT_SECONDS if self.deadline is None else
+                            self.deadline.timeout_for(SOCKET_STAGE), self.deadline)
         try:
-            self.socket_client.post_to_connection(ConnectionId=self.connection_id,
-                                                  Data=self.parsed_data_to_send_on_socket.encode("utf-8"))
+            call_with_retry(settings.WEB_SOCKET_API,
+                            lambda: self.socket_client_for_call(budget).post_to_connection(ConnectionId=connection_id,
+                                                                                           Data=data),
+                            is_transient_socket_error, deadline=self.deadline, budget=budget)
+        except CircuitOpenException as e:
+            logger.error("%s. Not sending data on socket for id %s", e.message, connection_id)
+            self.delivery_report.failed.append(connection_id)
+            return False
         except Exception as e:
-            raise SocketException(code=500, message="Unable to send data over socket")
+            if is_gone_connection_error(e):
+                logger.warning("Socket connection %s is gone. It should be pruned", connection_id)
+                self.delivery_report.gone.append(connection_id)
+            else:
+                logger.exception("Unable to send data on socket for id %s", connection_id)
+                self.delivery_report.failed.append(connection_id)
+            return False
         else:
-            logger.info(f"Sent Live data on socket for id {self.connection_id}")
+            logger.info("Sent Live data on socket for id %s", connection_id)
+            self.delivery_report.delivered.append(connection_id)
+            return True
+
+    def prepare_live_updates(self) -> Optional[int]:
+        """
+        Prepares the message of every connection in delta mode. Returns the seq to keep as live_update_seq of the
+        session record, None when no message is sent
+        """
+        if self.live_update_tracker is None:
+            return None
+        if self.prepared is None:
+            self.prepared = {connection_id: self.live_update_tracker.prepare(connection_id, self.live_update_payload,
+                                                                             self.force_snapshot, self.persisted_seq)
+                             for connection_id in self.connection_ids}
+        return max((prepared.seq for prepared in self.prepared.values() if prepared is not None), default=None)
+
+    def deliver_to_connection(self, connection_id):
+        if self.live_update_tracker is None:
+            self.post_to_connection(connection_id, self.parsed_data_to_send_on_socket.encode("utf-8"))
+            return
+        prepared = self.prepared[connection_id]
+        if prepared is None:
+            logger.debug("Live data is unchanged for socket id %s", connection_id)
+            self.delivery_report.unchanged.append(connection_id)
+        elif not self.post_to_connection(connection_id, prepared.message.encode("utf-8")):
+            # The client may have missed this message so it gets a snapshot next time
+            self.live_update_tracker.forget(prepared)
+
+    def send_message_to_socket(self) -> SocketDeliveryReport:
+        self.prepare_live_updates()
+        with stage_timer(SOCKET_PUSH, self.metric_dimensions):
+            if len(self.connection_ids) == 1:
+                self.deliver_to_connection(self.connection_id)
+            else:
+                executor = get_socket_executor()
+                wait([submit_with_log_context(executor, self.deliver_to_connection, connection_id)
+                      for connection_id in self.connection_ids])
+        if self.delivery_report.failed and not self.delivery_report.delivered:
+            raise SocketException(code=500, message="Unable to send data over socket",
+                                  detail_error=self.delivery_report)
+        return self.delivery_report
 
 
 class StatusManager:
-    def __init__(self, event):
-        self.event_data = event
+    # Set when the vendor was saturated and the check went on with the last known session data
+    status_deferred = False
+    # Set by the batch and daemon modes, where the write behind buffer can batch the writes of many checks
+    write_behind = False
+
+    def __init__(self, event, deadline: Optional[Deadline] = None, status_response=None, write_behind=False):
+        """
+        `status_response` is the answer of a status call already made for the booking, see refresh_statuses.
+        `write_behind` hands the write to the write behind buffer when WRITE_BEHIND is set
+        """
+        self.set_up(event, deadline)
+        self.write_behind = write_behind
         # Call status api before fetching the current booking session details
-        status_updated = call_api(settings.STATUS_URL, params={"booking_id": self.event_data["booking_id"],
-                                                               "vendor_id": self.event_data["vendor_id"]},
-                                  body={"expanded_vehicle_data": self.event_data["expanded_vehicle_data"]})
-        self.session_data = self.get_current_booking_session_data(settings.DB_API, self.event_data["booking_id"],
-                                                                  self.event_data["vendor_id"])
+        status_updated = self.call_status_api() if status_response is None else status_response
+        self.session_data = self.session_data_from_status_response(status_updated)
+        if self.session_data is None:
+            self.session_data = self.read_session_data()
+        self.prepare_current_state()
+
+    def set_up(self, event, deadline: Optional[Deadline] = None):
+        """Sets the attributes of the check without any I/O, the session data is not known yet"""
+        self.event_data = event
+        self.deadline = deadline
+        self.metric_dimensions = metric_dimensions(event["vendor_id"], event.get("station_id"))
+        self.session_data = None
+
+    def call_status_api(self):
+        return request_booking_status(self.event_data, self.deadline, self.metric_dimensions)
+
+    def read_session_data(self):
+        with stage_timer(DB_READ, self.metric_dimensions):
+            return self.get_current_booking_session_data(settings.DB_API, self.event_data["booking_id"],
+                                                         self.event_data["vendor_id"])
+
+    def stage_timeout(self, stage) -> float:
+        """Timeout of a stage from the invocation deadline, or the default request timeout without deadline"""
+        if self.deadline is None:
+            return settings.REQUEST_TIMEOUT_SECONDS
+        return self.deadline.timeout_for(stage)
+
+    def call_budget(self, stage) -> CallBudget:
+        """Budget of one call of the stage with all its attempts"""
+        return CallBudget(self.stage_timeout(stage), self.deadline)
+
+    def session_data_from_status_response(self, status_updated) -> Optional[Dict]:
+        """
+        Returns the status api response as session data when it holds the complete session record of this booking.
+        Returns None when the mode is off or the record is missing or incomplete so that the caller reads the db.
+        STATUS_DEFERRED marks the check as deferred, it goes on with the session data in the db.
+        """
+        if status_updated is STATUS_DEFERRED:
+            self.status_deferred = True
+            return None
+        if not settings.USE_STATUS_RESPONSE_AS_SESSION_DATA or not isinstance(status_updated, dict):
+            return None
+        missing_keys = SESSION_RECORD_REQUIRED_KEYS.difference(status_updated)
+        if missing_keys:
+            logger.info("Status response is missing %s for booking id %s. Reading session data from db",
+                        sorted(missing_keys), self.event_data['booking_id'])
+            return None
+        if status_updated["booking_id"] != self.event_data["booking_id"] or \
+                status_updated["vendor_id"] != self.event_data["vendor_id"]:
+            logger.warning("Status response belongs to another booking. Reading session data from db for "
+                           "booking id %s", self.event_data['booking_id'])
+            return None
+        logger.info("Using status response as session data for booking id %s", self.event_data['booking_id'])
+        return status_updated
+
+    def prepare_current_state(self):
+        """Builds the current state and the poller from event data and the fetched session data"""
         # Taking start time data dynamically because initial data is passed at booking time
         # There will be no start time at that moment
         self.start_time = self.session_data["start_time"]
@@ -64,29 +328,39 @@ class StatusManager:
             start_time=self.start_time,
             session_data=self.session_data)
 
-        self.time_related_data = PrepareTimeDataForCurrentState.parse_obj({"collective_data_for_current_state":
-                                                                               self.collective_data_for_current_state})
-        self.time_related_data.calculate_time_related_data()
+        # collective_data_for_current_state is validated above, constructing skips validating and copying it again
+        self.time_related_data = PrepareTimeDataForCurrentState.construct(
+            collective_data_for_current_state=self.collective_data_for_current_state)
+        with stage_timer(TIME_CALCULATION, self.metric_dimensions):
+            self.time_related_data.calculate_time_related_data()
+        self.live_update = LiveUpdateRecord.from_session_data(self.session_data)
 
-        logger.info(f"Initializing ChargingSessionMonitor")
+        logger.debug("Initializing ChargingSessionMonitor")
         self.poller = ChargingSessionMonitor(
             collective_data_for_current_state=self.collective_data_for_current_state,
             time_related_data=self.time_related_data,
-            activities=decider(self.collective_data_for_current_state.start_time,
-                               self.collective_data_for_current_state.target_duration_timestamp,
-                               self.collective_data_for_current_state.target_energy_kw),
-            final_data_decider=FinalDataToReturnForDB(self.collective_data_for_current_state, self.time_related_data))
+            decision_table=get_decision_table(),
+            final_data_decider=FinalDataToReturnForDB(self.collective_data_for_current_state, self.time_related_data,
+                                                      self.live_update))
 
     def get_current_booking_session_data(self, db_api, booking_id, vendor_id):
+        budget = self.call_budget(READ_STAGE)
+
+        def read_session_table():
+            return raise_for_transient_status(get_http_session().post(db_api,
+                                                                      json={"read_table": True,
+                                                                            "table_name": "ChargingSessionRecords",
+                                                                            "primary_key": "booking_id",
+                                                                            "primary_key_value": booking_id,
+                                                                            "sort_key": "vendor_id",
+                                                                            "sort_key_value": vendor_id
+                                                                            },
+                                                                      timeout=budget.attempt_timeout()))
+
         try:
-            response = requests.post(db_api,
-                                     json={"read_table": True,
-                                           "table_name": "ChargingSessionRecords",
-                                           "primary_key": "booking_id",
-                                           "primary_key_value": booking_id,
-                                           "sort_key": "vendor_id",
-                                           "sort_key_value": vendor_id
-                                           })
+            response = call_with_retry(db_api, read_session_table, is_transient_http_error, deadline=self.deadline,
+                                       hedge_delay=settings.HEDGE_DELAY_SECONDS if settings.HEDGE_READS else None,
+                                       budget=budget)
         except Exception:
             logger.exception("Error while reading data from session table")
             raise DbFetchException(code=500, message="Not able to fetch data from db")
@@ -94,30 +368,175 @@ class StatusManager:
             try:
                 parsed_response = response.json()
             except JSONDecodeError:
-                logger.exception(f"Unable to parse fetched data for the booking id: "
-                                 f"{booking_id}")
+                logger.exception("Unable to parse fetched data for the booking id: %s", booking_id)
                 raise DbFetchException(code=500, message="No data available in response")
             else:
-                logger.debug(f"Response from reading table {parsed_response} for booking id "
-                             f"{booking_id}")
+                logger.debug("Response from reading table %s for booking id %s", parsed_response, booking_id)
                 return parsed_response
 
+    def data_to_write(self, data_to_update: DataToUpdateInSessionTable) -> Optional[DataToUpdateInSessionTable]:
+        """Returns the payload to write in session table or None when the write can be skipped"""
+        if not settings.CHANGE_AWARE_WRITES:
+            return data_to_update
+        payload_to_write = changed_data_to_update(self.session_data, data_to_update,
+                                                  settings.WRITE_TIMER_BUCKET_SECONDS)
+        session_write_stats.record(data_to_update, payload_to_write)
+        if payload_to_write is None:
+            logger.info("Nothing changed for booking id %s. Skipping session table write. Writes saved so far: %s",
+                        self.event_data['booking_id'], session_write_stats.writes_skipped)
+        return payload_to_write
+
+    def energy_rate_estimate(self, current_status) -> Optional[EnergyRateEstimate]:
+        """Adds the energy of this check to the rate history of a started energy based session"""
+        collective_data = self.collective_data_for_current_state
+        if select_strategy(collective_data.start_time, collective_data.target_duration_timestamp,
+                           collective_data.target_energy_kw) != ENERGY_STRATEGY:
+            return None
+        key = (collective_data.booking_id, collective_data.vendor_id)
+        if current_status in FINAL_STATUSES:
+            get_energy_rate_registry().forget(key)
+            return None
+        estimate = get_energy_rate_registry().add_sample(
+            key, time.time(), float(self.session_data.get("current_energy_consumed") or 0),
+            collective_data.target_energy_kw)
+        if estimate.stalled:
+            logger.warning("Energy of booking id %s has not moved for %s seconds", collective_data.booking_id,
+                           settings.ENERGY_STALL_SECONDS)
+        return estimate
+
+    def final_stage_report(self, current_status) -> FinalStageReport:
+        energy_estimate = self.energy_rate_estimate(current_status)
+        return FinalStageReport(current_status=current_status,
+                                next_check_delay_seconds=next_check_delay(current_status,
+                                                                          self.collective_data_for_current_state,
+                                                                          self.time_related_data, energy_estimate),
+                                energy_stalled=energy_estimate is not None and energy_estimate.stalled,
+                                status_deferred=self.status_deferred)
+
+    def side_effect_timeout(self, stage, configured_timeout) -> float:
+        if self.deadline is None:
+            return configured_timeout
+        return min(configured_timeout, self.deadline.timeout_for(stage))
+
+    def write_current_session_data(self, data_to_update: DataToUpdateInSessionTable):
+        """
+        Writes the changed data in session table, or hands it to the write behind buffer when WRITE_BEHIND is set
+        and the check runs in the batch or daemon mode. A single check writes at once, a buffer flushed when its
+        invocation returns would not merge anything. Raises DbFetchException when the write fails
+        """
+        payload_to_write = self.data_to_write(data_to_update)
+        if payload_to_write is None:
+            return
+        write_behind_buffer = get_write_behind_buffer() if self.write_behind else None
+        with stage_timer(DB_WRITE, self.metric_dimensions):
+            if write_behind_buffer is None:
+                self.set_current_booking_session_data(payload_to_write, settings.DB_API)
+            elif not write_behind_buffer.submit(payload_to_write):
+                raise DbFetchException(code=500, message="Not able to update data to db")
+
+    def socket_communicator(self, socket_client) -> SocketCommunicator:
+        return SocketCommunicator(socket_client, self.session_data, self.live_update, deadline=self.deadline)
+
+    @staticmethod
+    def with_live_update_seq(data_to_update: DataToUpdateInSessionTable,
+                             live_update_seq: Optional[int]) -> DataToUpdateInSessionTable:
+        """Keeps the seq of the live update sent by this check on the session record, for the next process"""
+        if live_update_seq is None:
+            return data_to_update
+        return data_to_update.copy(update={"data_to_update": {**data_to_update.data_to_update,
+                                                              "live_update_seq": live_update_seq}})
+
     def check_current_session_data(self):
         data_to_update_db_and_return_status: DataToUpdateInSessionTable = self.poller.check_current_charging_status()
         try:
-            self.set_current_booking_session_data(data_to_update_db_and_return_status, settings.DB_API)
+            self.write_current_session_data(data_to_update_db_and_return_status)
         except DbFetchException:
             logger.exception("Unable to write data in session table")
             return data_to_update_db_and_return_status.data_to_update["current_status"]
         else:
             return data_to_update_db_and_return_status.data_to_update["current_status"]
 
-    @staticmethod
-    def set_current_booking_session_data(result_to_update: DataToUpdateInSessionTable, db_api):
+    def check_current_session_data_and_push(self, socket_client) -> FinalStageReport:
+        """
+        Decides the current status, then writes it in session table and pushes the live data on socket at the
+        same time. Each side effect has its own timeout and error, any error of a side effect only goes on the
+        report. A side effect which timed out is still waited for before returning, see settle_side_effects.
+        """
+        data_to_update_db_and_return_status: DataToUpdateInSessionTable = self.poller.check_current_charging_status()
+        report = self.final_stage_report(data_to_update_db_and_return_status.data_to_update["current_status"])
+        socket_communicator, no_connection = None, None
+        try:
+            socket_communicator = self.socket_communicator(socket_client)
+        except SocketException as e:
+            no_connection = e
+        else:
+            # Prepared before the write so that the write keeps the seq of the messages about to be sent
+            data_to_update_db_and_return_status = self.with_live_update_seq(
+                data_to_update_db_and_return_status, socket_communicator.prepare_live_updates())
+        executor = get_side_effect_executor()
+        started = time.monotonic()
+        side_effects = {"db_write": (submit_with_log_context(executor, self.write_current_session_data,
+                                                             data_to_update_db_and_return_status),
+                                     self.side_effect_timeout(WRITE_STAGE, settings.DB_WRITE_TIMEOUT_SECONDS))}
+        if socket_communicator is not None:
+            side_effects["socket_push"] = (submit_with_log_context(executor,
+                                                                   socket_communicator.send_message_to_socket),
+                                           self.side_effect_timeout(SOCKET_STAGE,
+                                                                    settings.SOCKET_PUSH_TIMEOUT_SECONDS))
+        # Waiting in deadline order so that each side effect is judged against its own timeout
+        outcomes = {name: wait_for_side_effect(future, started + timeout)
+                    for name, (future, timeout) in sorted(side_effects.items(), key=lambda item: item[1][1])}
+        db_write, socket_push = outcomes["db_write"], outcomes.get("socket_push", no_connection)
+        if isinstance(db_write, FutureTimeoutError):
+            logger.error("Session table write timed out for booking id %s", self.event_data['booking_id'])
+            report.db_error = "Session table write timed out"
+        elif isinstance(db_write, DbFetchException):
+            logger.error("Unable to write data in session table for booking id %s", self.event_data['booking_id'])
+            report.db_error = db_write.message
+        elif isinstance(db_write, Exception):
+            logger.error("Session table write failed for booking id %s", self.event_data['booking_id'],
+                         exc_info=db_write)
+            report.db_error = "Not able to update data to db"
+        if isinstance(socket_push, FutureTimeoutError):
+            logger.error("Socket push timed out for booking id %s", self.event_data['booking_id'])
+            report.socket_error = "Socket push timed out"
+        elif isinstance(socket_push, SocketException):
+            logger.error("Unable to send data on socket for booking id %s but we will continue the state machine",
+                         self.event_data['booking_id'])
+            report.socket_error = socket_push.message
+            report.socket_delivery = socket_push.detail_error
+        elif isinstance(socket_push, Exception):
+            logger.error("Socket push failed for booking id %s but we will continue the state machine",
+                         self.event_data['booking_id'], exc_info=socket_push)
+            report.socket_error = "Unable to send data over socket"
+        else:
+            report.socket_delivery = socket_push
+        self.settle_side_effects([future for future, _ in side_effects.values()])
+        return report
+
+    def settle_side_effects(self, futures: List[Future]):
+        """
+        Side effects which timed out are cancelled when they did not start yet, else waited for until the
+        invocation deadline. Their calls are bounded by their own timeouts, and work left running when the handler
+        returns would be frozen with the runtime and resumed in a later invocation.
+        """
+        running = [future for future in futures if not future.done() and not future.cancel()]
+        if running:
+            logger.warning("Waiting for %s side effects which outlived their timeout", len(running))
+            wait(running, timeout=None if self.deadline is None else self.deadline.remaining())
+
+    def set_current_booking_session_data(self, result_to_update: DataToUpdateInSessionTable, db_api):
         # update to session db
+        budget = self.call_budget(WRITE_STAGE)
+
+        def write_session_table():
+            return raise_for_transient_status(get_http_session().post(db_api, json=result_to_update.dict(),
+                                                                      timeout=budget.attempt_timeout()))
+
         try:
-            response = requests.post(db_api,
-                                     json=result_to_update.dict())
+            # A retried write sets the same attributes again so retrying after a lost answer is harmless
+            response = call_with_retry(db_api, write_session_table, is_transient_http_error, deadline=self.deadline,
+                                       budget=budget)
         except Exception:
             raise DbFetchException(code=500, message="Not able to update data to db")
         else:
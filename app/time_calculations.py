@@ -16,34 +16,34 @@ class PrepareTimeDataForCurrentState(BaseModel):
     current_duration: Optional[DurationCalculatorData] = None
     current_booking_duration: Optional[DurationCalculatorData] = None
 
-    def calculate_time_related_data(self):
-        logger.info(f"Calculating time related data for the booking id "
-                    f"{self.collective_data_for_current_state.booking_id}, "
-                    f"start time: {self.collective_data_for_current_state.start_time}")
+    def calculate_time_related_data(self, current_time=None):
+        logger.info("Calculating time related data for the booking id %s, start time: %s",
+                    self.collective_data_for_current_state.booking_id,
+                    self.collective_data_for_current_state.start_time)
         if self.collective_data_for_current_state.start_time and self.collective_data_for_current_state.target_duration_timestamp:
             self.iso_formatted_start_time = self.define_time_in_iso_format(self.collective_data_for_current_state.start_time)
             self.target_duration_delta = self.convert_time_stamp_to_time_delta(self.collective_data_for_current_state.target_duration_timestamp)
-            self.current_duration = self.calculate_duration(self.iso_formatted_start_time)
+            self.current_duration = self.calculate_duration(self.iso_formatted_start_time, current_time)
 
         elif self.collective_data_for_current_state.start_time and self.collective_data_for_current_state.target_energy_kw:
             self.iso_formatted_start_time = self.define_time_in_iso_format(
                 self.collective_data_for_current_state.start_time)
-            self.current_duration = self.calculate_duration(self.iso_formatted_start_time)
+            self.current_duration = self.calculate_duration(self.iso_formatted_start_time, current_time)
 
         elif self.collective_data_for_current_state.session_data["booking_time"]:
             self.iso_formatted_booking_time = self.define_time_in_iso_format(
                 self.collective_data_for_current_state.session_data["booking_time"])
-            self.current_booking_duration = self.calculate_duration(self.iso_formatted_booking_time)
+            self.current_booking_duration = self.calculate_duration(self.iso_formatted_booking_time, current_time)
             self.current_duration = self.calculate_duration(self.define_time_in_iso_format("1900-01-01 00:00:00"),
                                                             self.define_time_in_iso_format("1900-01-01 00:00:00"))
 
         else:
             logger.info("Neither start nor booking time is defined aborting")
-        logger.info(f"All time related parameters are set. current duration: {self.current_duration}")
+        logger.info("All time related parameters are set. current duration: %s", self.current_duration)
 
     @staticmethod
     def define_time_in_iso_format(start_time):
-        logger.info(f"Defining time {start_time} in iso format")
+        logger.debug("Defining time %s in iso format", start_time)
         try:
             iso_formatted_start_time = datetime.datetime.fromisoformat(start_time)
         except ValueError:
@@ -64,7 +64,6 @@ class PrepareTimeDataForCurrentState(BaseModel):
             current_time = datetime.datetime.utcnow()
         current_duration_delta = (current_time - iso_formatted_time)
         current_duration_as_time_stamp_string = time.strftime("%H:%M:%S", time.gmtime(current_duration_delta.total_seconds()))
-        return DurationCalculatorData.parse_obj(
-            {"duration_delta": current_duration_delta,
-             "duration_as_time_stamp_string": current_duration_as_time_stamp_string}
-        )
+        # Both values are computed here so there is nothing to validate
+        return DurationCalculatorData.construct(duration_delta=current_duration_delta,
+                                                duration_as_time_stamp_string=current_duration_as_time_stamp_string)
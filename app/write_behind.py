@@ -0,0 +1,146 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from app.deadline import Deadline
+from app.session_table import SessionKey, SessionTableClient, HttpSessionTableClient, coalesce_updates, \
+    get_session_table_client, update_key
+from config import get_settings
+from data_store.data_schemas import DataToUpdateInSessionTable
+from data_store.data_structure import ChargingStatus
+from logger_init import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+# A session which reached one of these is not polled again, its last write can not wait for a later flush
+IMMEDIATE_FLUSH_STATUSES = frozenset({ChargingStatus.COMPLETED.value, ChargingStatus.START_FAILED.value,
+                                      ChargingStatus.TERMINATED.value})
+
+
+@dataclass
+class WriteBehindStats:
+    submitted: int = 0
+    coalesced: int = 0
+    flushes: int = 0
+    written: int = 0
+    failed: int = 0
+
+
+class WriteBehindBuffer:
+    """
+    Holds session table updates and writes them in batches. A new update of a session which is still pending is
+    merged into the pending one, the last value of every attribute wins. The buffer is flushed once it holds
+    `max_pending` sessions or its oldest update waited `max_delay` seconds, and at once for an update to one of
+    IMMEDIATE_FLUSH_STATUSES. Updates which fail to be written stay pending for the next flush.
+    """
+    def __init__(self, client: SessionTableClient, max_pending: int, max_delay: float):
+        self.client = client
+        self.max_pending = max_pending
+        self.max_delay = max_delay
+        self.pending: Dict[SessionKey, DataToUpdateInSessionTable] = {}
+        self.oldest_at: Optional[float] = None
+        self.stats = WriteBehindStats()
+        self._condition = threading.Condition()
+        # One flush at a time so that a failed update is put back before a newer one of the session is flushed
+        self._flush_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+
+    def _add(self, key: SessionKey, update: DataToUpdateInSessionTable):
+        pending = self.pending.get(key)
+        if pending is None:
+            self.pending[key] = update
+            if self.oldest_at is None:
+                self.oldest_at = time.monotonic()
+        else:
+            self.pending[key] = coalesce_updates([pending, update])[0]
+
+    def submit(self, update: DataToUpdateInSessionTable) -> bool:
+        """
+        Returns False when the update had to be written at once and the write failed.
+        A buffered update returns True, its write happens with a later flush
+        """
+        key = update_key(update)
+        with self._condition:
+            self.stats.submitted += 1
+            if key in self.pending:
+                self.stats.coalesced += 1
+            self._add(key, update)
+            flush_now = update.data_to_update.get("current_status") in IMMEDIATE_FLUSH_STATUSES or \
+                len(self.pending) >= self.max_pending
+            if not flush_now:
+                self._start_flusher()
+                self._condition.notify()
+                return True
+        failed = self.flush()
+        return key not in {update_key(failed_update) for failed_update in failed}
+
+    def flush(self, client: Optional[SessionTableClient] = None) -> List[DataToUpdateInSessionTable]:
+        """Writes every pending update with `client`, or the client of the buffer, and returns the ones which failed"""
+        with self._flush_lock:
+            with self._condition:
+                updates, self.pending, self.oldest_at = list(self.pending.values()), {}, None
+            if not updates:
+                return []
+            failed = (client or self.client).batch_write(updates)
+            with self._condition:
+                self.stats.flushes += 1
+                self.stats.written += len(updates) - len(failed)
+                self.stats.failed += len(failed)
+                for failed_update in failed:
+                    key = update_key(failed_update)
+                    newer = self.pending.pop(key, None)
+                    self._add(key, failed_update)
+                    if newer is not None:
+                        self._add(key, newer)
+            return failed
+
+    def _start_flusher(self):
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_when_due, name="write-behind", daemon=True)
+            self._flusher.start()
+
+    def _flush_when_due(self):
+        while True:
+            with self._condition:
+                while self.oldest_at is None:
+                    self._condition.wait()
+                wait = self.oldest_at + self.max_delay - time.monotonic()
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+            self.flush()
+
+    def __len__(self):
+        return len(self.pending)
+
+
+_write_behind_buffer: Optional[WriteBehindBuffer] = None
+_write_behind_buffer_lock = threading.Lock()
+
+
+def get_write_behind_buffer() -> Optional[WriteBehindBuffer]:
+    """
+    Process wide buffer when WRITE_BEHIND is set, None when every update is written on its own. Only the batch
+    and daemon modes write through it, see StatusManager.write_behind
+    """
+    global _write_behind_buffer
+    if not settings.WRITE_BEHIND:
+        return None
+    if _write_behind_buffer is None:
+        with _write_behind_buffer_lock:
+            if _write_behind_buffer is None:
+                _write_behind_buffer = WriteBehindBuffer(HttpSessionTableClient(),
+                                                         settings.WRITE_BEHIND_MAX_PENDING,
+                                                         settings.WRITE_BEHIND_MAX_DELAY_SECONDS)
+    return _write_behind_buffer
+
+
+def flush_write_behind(deadline: Optional[Deadline] = None) -> List[DataToUpdateInSessionTable]:
+    """
+    Writes what is pending and returns the updates which failed, they stay pending. Called before an invocation
+    returns and the process is frozen, the writes are then bounded by the deadline of the invocation
+    """
+    if _write_behind_buffer is None:
+        return []
+    return _write_behind_buffer.flush(None if deadline is None else get_session_table_client(deadline))
@@ -1,6 +1,7 @@
 import datetime
 from pydantic import BaseSettings, AnyHttpUrl
 from typing import Optional
+from functools import lru_cache
 import pathlib
 import os
 
@@ -14,13 +15,89 @@ class Settings(BaseSettings):
     INITIAL_TIMEOUT_MINUTES: datetime.timedelta
     STATUS_URL: AnyHttpUrl
     WEB_SOCKET_API: AnyHttpUrl
+    BATCH_MAX_WORKERS: int = 16
+    ASYNC_IO_MAX_WORKERS: int = 64
+    ASYNC_MAX_CONCURRENT_SESSIONS: int = 64
+    HTTP_POOL_CONNECTIONS: int = 4
+    HTTP_POOL_MAXSIZE: int = 64
+    HTTP_POOL_BLOCK: bool = False
+    USE_STATUS_RESPONSE_AS_SESSION_DATA: bool = False
+    CHANGE_AWARE_WRITES: bool = True
+    WRITE_TIMER_BUCKET_SECONDS: int = 60
+    DECISION_TABLE_PATH: Optional[str] = None
+    SOCKET_FANOUT_MAX_WORKERS: int = 8
+    LIVE_UPDATE_MODE: str = "full"
+    LIVE_UPDATE_TRACKER_CAPACITY: int = 10000
+    SIDE_EFFECT_MAX_WORKERS: int = 32
+    DB_WRITE_TIMEOUT_SECONDS: float = 5
+    SOCKET_PUSH_TIMEOUT_SECONDS: float = 3
+    SOCKET_TIMEOUT_STEP_SECONDS: float = 0.25
+    # Share of a socket push timeout given to the connect, the rest bounds the reads of the answer
+    SOCKET_CONNECT_TIMEOUT_SHARE: float = 0.4
+    REQUEST_TIMEOUT_SECONDS: float = 10
+    DEADLINE_RESERVE_MS: int = 500
+    DEADLINE_STATUS_SHARE: float = 0.35
+    DEADLINE_READ_SHARE: float = 0.25
+    DEADLINE_WRITE_SHARE: float = 0.2
+    DEADLINE_SOCKET_SHARE: float = 0.2
+    DEADLINE_MIN_STAGE_TIMEOUT_SECONDS: float = 0.05
+    RETRY_MAX_ATTEMPTS: int = 3
+    RETRY_BASE_DELAY_SECONDS: float = 0.05
+    RETRY_MAX_DELAY_SECONDS: float = 1
+    HEDGE_READS: bool = False
+    HEDGE_DELAY_SECONDS: float = 0.2
+    HEDGE_MAX_WORKERS: int = 16
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RESET_TIMEOUT_SECONDS: float = 30
+    METRICS_SINK: str = "none"
+    METRICS_NAMESPACE: str = "ChargingSessionMonitor"
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: str = ""
+    LOG_SAMPLE_RATE: float = 1.0
+    SCHEDULER_MAX_WORKERS: int = 32
+    SCHEDULER_POLL_INTERVAL_SECONDS: float = 30
+    SCHEDULER_POLL_BUDGET_MS: int = 10000
+    SCHEDULER_MAX_CONSECUTIVE_FAILURES: int = 3
+    RETURN_NEXT_CHECK_DELAY: bool = False
+    NEXT_CHECK_MIN_SECONDS: int = 10
+    NEXT_CHECK_MAX_SECONDS: int = 300
+    # A booked session may start any moment, its start should not wait for the booking timeout pacing
+    NEXT_CHECK_BOOKED_MAX_SECONDS: int = 30
+    NEXT_CHECK_DEFAULT_SECONDS: int = 30
+    NEXT_CHECK_REMAINING_SHARE: float = 0.5
+    ENERGY_RATE_SAMPLES: int = 16
+    ENERGY_RATE_TRACKER_CAPACITY: int = 10000
+    ENERGY_STALL_SECONDS: float = 600
+    # Needs the batch_read_table and batch_update_table requests on DB_API, see HttpSessionTableClient
+    DB_BULK_IO: bool = False
+    DB_BATCH_SIZE: int = 25
+    DB_BATCH_MAX_ROUNDS: int = 4
+    # Without DB_BULK_IO the buffer is flushed with one update_table request per session, see HttpSessionTableClient
+    WRITE_BEHIND: bool = False
+    WRITE_BEHIND_MAX_PENDING: int = 25
+    WRITE_BEHIND_MAX_DELAY_SECONDS: float = 1.0
+    STATUS_BATCH_URL: Optional[AnyHttpUrl] = None
+    STATUS_BATCH_VENDORS: str = ""
+    STATUS_BATCH_SIZE: int = 50
+    VENDOR_RATE_LIMIT_PER_SECOND: float = 0
+    VENDOR_RATE_LIMIT_BURST: int = 10
+    VENDOR_RATE_LIMITS: str = ""
+    VENDOR_RATE_LIMIT_MAX_WAIT_SECONDS: float = 0.5
+    # The limits are kept per process. Processes calling a vendor at the same time share its limit evenly
+    VENDOR_RATE_LIMIT_CONTAINERS: int = 1
+
+    IMPORT_TIME_BUDGET_MS: int = 1500
 
     class Config:
-        print(pathlib.Path(__file__).resolve().parents[0])
         env_file = pathlib.Path.joinpath(pathlib.Path(__file__).resolve().parents[0], f"configs/{env_name}.env")
-        print(env_file)
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Reads the env file once per process. Modules share this object instead of creating their own Settings"""
+    return Settings()
 
 
 if __name__ == "__main__":
-    settings = Settings()
+    settings = get_settings()
     print(settings.dict())
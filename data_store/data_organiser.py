@@ -1,6 +1,6 @@
-from config import Settings
+from config import get_settings
 
-settings = Settings()
+settings = get_settings()
 
 
 class DbCommunicator:
@@ -1,7 +1,8 @@
 import datetime
+import json
 
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from decimal import Decimal
 
 
@@ -25,6 +26,28 @@ class DataForLiveUpdate(BaseModel):
     max_energy: Optional[str] = None
 
 
+class LiveUpdateRecord:
+    """
+    Plain record with the fields of DataForLiveUpdate. The session data is validated once through
+    DataForLiveUpdate and the same record then gives the db charging_states and the socket payload.
+    """
+    __slots__ = tuple(DataForLiveUpdate.__fields__)
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+    @classmethod
+    def from_session_data(cls, session_data: Dict) -> "LiveUpdateRecord":
+        return cls(**DataForLiveUpdate.parse_obj(session_data).__dict__)
+
+    def dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def json(self) -> str:
+        return json.dumps(self.dict())
+
+
 class DurationCalculatorData(BaseModel):
     duration_delta: Optional[datetime.timedelta] = "00:00:00"
     duration_as_time_stamp_string: Optional[str] = None
@@ -40,3 +63,43 @@ class CollectiveDataForCurrentState(BaseModel):
     target_energy_kw: Optional[int] = None
     start_time: Optional[str] = None
     session_data: Dict
+
+
+class BatchSessionResult(BaseModel):
+    booking_id: Optional[str] = None
+    vendor_id: Optional[str] = None
+    current_status: str
+    error: Optional[str] = None
+    db_error: Optional[str] = None
+    socket_error: Optional[str] = None
+    gone_connection_ids: List[str] = []
+    next_check_delay_seconds: Optional[int] = None
+    energy_stalled: bool = False
+    status_deferred: bool = False
+
+
+class SocketDeliveryReport(BaseModel):
+    delivered: List[str] = []
+    gone: List[str] = []
+    failed: List[str] = []
+    unchanged: List[str] = []
+
+
+class FinalStageReport(BaseModel):
+    current_status: str
+    db_error: Optional[str] = None
+    socket_error: Optional[str] = None
+    socket_delivery: Optional[SocketDeliveryReport] = None
+    next_check_delay_seconds: Optional[int] = None
+    energy_stalled: bool = False
+    status_deferred: bool = False
+
+    def batch_result_fields(self) -> Dict:
+        """Fields of BatchSessionResult which come from the final stage"""
+        return {"current_status": self.current_status,
+                "db_error": self.db_error,
+                "socket_error": self.socket_error,
+                "gone_connection_ids": self.socket_delivery.gone if self.socket_delivery is not None else [],
+                "next_check_delay_seconds": self.next_check_delay_seconds,
+                "energy_stalled": self.energy_stalled,
+                "status_deferred": self.status_deferred}
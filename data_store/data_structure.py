@@ -14,3 +14,9 @@ class ChargingStatus(Enum):
     UNKNOWN_ERROR = 'UNKNOWN_ERROR'
     STOP_FAILED = 'STOP_FAILED'
 
+
+# Statuses after which the monitor keeps returning the same status, polling the session again changes nothing
+FINAL_STATUSES = frozenset({ChargingStatus.COMPLETED.value, ChargingStatus.START_FAILED.value,
+                            ChargingStatus.TERMINATED.value, ChargingStatus.UNKNOWN_ERROR.value,
+                            ChargingStatus.PROGRESS_UPDATE_UNKNOWN.value, ChargingStatus.STOP_FAILED.value,
+                            ChargingStatus.REBOOKED.value})
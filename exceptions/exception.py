@@ -9,4 +9,25 @@ class SocketException(Exception):
     def __init__(self, code, message, detail_error=None):
         self.code = code
         self.message = message
-        self.detail_error = detail_error
\ No newline at end of file
+        self.detail_error = detail_error
+
+
+class DecisionException(Exception):
+    def __init__(self, code, message, detail_error=None):
+        self.code = code
+        self.message = message
+        self.detail_error = detail_error
+
+
+class CircuitOpenException(Exception):
+    def __init__(self, code, message, detail_error=None):
+        self.code = code
+        self.message = message
+        self.detail_error = detail_error
+
+
+class VendorSaturatedException(Exception):
+    def __init__(self, code, message, detail_error=None):
+        self.code = code
+        self.message = message
+        self.detail_error = detail_error
@@ -1,27 +1,103 @@
 import simplejson
-from app.status_manager import StatusManager, SocketCommunicator
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from app.batch import monitor_batch_item
+from app.status_manager import StatusManager, DEPENDENCY_UNAVAILABLE_ERRORS, status_to_keep
+from app.deadline import Deadline
+from app.metrics import flush_metrics
+from app.write_behind import flush_write_behind
+from app.session_table import update_key
+from app.status_batch import event_key, refresh_statuses, status_batching_enabled
 from data_store.data_structure import ChargingStatus
-from exceptions.exception import SocketException
-from app import get_socket_client
-from logger_init import get_logger
+from data_store.data_schemas import BatchSessionResult
+from app import get_socket_client, settings
+from logger_init import get_logger, flush_logs, booking_log_context
 
 logger = get_logger(__name__)
 
 
+def handler_response(current_status, next_check_delay_seconds=None):
+    """
+    The status alone, or with the recommended delay before the next check when RETURN_NEXT_CHECK_DELAY is set.
+    The state machine can wait `next_check_delay_seconds` instead of a fixed time, it is None for a final status
+    """
+    if not settings.RETURN_NEXT_CHECK_DELAY:
+        return current_status
+    return {"current_status": current_status, "next_check_delay_seconds": next_check_delay_seconds}
+
+
 def lambda_handler(event, context):
     try:
-        logger.info(f"Passing this event to status manager {event}")
-        status_manager = StatusManager(event)
-        result = status_manager.check_current_session_data()
+        with booking_log_context(event.get("booking_id")):
+            logger.info("Passing booking id %s of vendor %s to status manager", event.get("booking_id"),
+                        event.get("vendor_id"))
+            logger.debug("Incoming event %s", event)
+            status_manager = StatusManager(event, Deadline.from_context(context))
+            # Session table write and socket push run side by side. A socket failure is only logged
+            # and we will continue the state machine
+            final_stage_report = status_manager.check_current_session_data_and_push(get_socket_client())
+    except DEPENDENCY_UNAVAILABLE_ERRORS:
+        logger.exception("Session data of booking id %s is not available now. Keeping its status and checking "
+                         "again later", event.get("booking_id"))
+        return handler_response(status_to_keep(event), settings.NEXT_CHECK_DEFAULT_SECONDS)
     except Exception:
         logger.exception("Status manager is not able to check current session data")
-        return ChargingStatus.TERMINATED
+        return handler_response(ChargingStatus.TERMINATED.value)
+    else:
+        return handler_response(final_stage_report.current_status, final_stage_report.next_check_delay_seconds)
+    finally:
+        flush_metrics()
+        flush_logs()
+
+
+def batch_lambda_handler(event, context):
+    """
+    Checks many bookings in one invocation. The event is either a list of single session events
+    or a dict with the list under "sessions". Returns one result per booking in the same order.
+    With DB_BULK_IO the session table is read and written in batches instead of once per booking.
+    The status api is called once per STATUS_BATCH_SIZE bookings of a vendor in STATUS_BATCH_VENDORS.
+    """
+    sessions = event["sessions"] if isinstance(event, dict) else event
+    logger.info("Received batch of %s sessions", len(sessions))
+    if not sessions:
+        return []
+    socket_client = get_socket_client()
+    deadline = Deadline.from_context(context)
+    if settings.DB_BULK_IO:
+        # Only needed in bulk mode, it stays out of the cold start of the other handlers
+        from app.bulk_status_manager import monitor_sessions_bulk
+        results = monitor_sessions_bulk(sessions, socket_client, deadline)
     else:
-        try:
-            socket_comm = SocketCommunicator(get_socket_client(), status_manager.session_data)
-            socket_comm.send_message_to_socket()
-        except SocketException:
-            logger.exception("Unable to send data on socket but we will continue the state machine")
-            return result
-        else:
-            return result
+        status_responses = refresh_statuses(sessions, deadline) if status_batching_enabled() else {}
+        with ThreadPoolExecutor(max_workers=min(settings.BATCH_MAX_WORKERS, len(sessions))) as executor:
+            results = list(executor.map(
+                lambda session_event: monitor_batch_item(session_event, socket_client, deadline,
+                                                         status_responses.get(event_key(session_event))),
+                sessions))
+    return finish_batch(results, deadline)
+
+
+def async_batch_lambda_handler(event, context):
+    """Same contract as batch_lambda_handler but runs all sessions on one asyncio event loop"""
+    # asyncio is only needed by this handler so it stays out of the cold start of the others
+    from app.async_status_manager import monitor_sessions
+    sessions = event["sessions"] if isinstance(event, dict) else event
+    logger.info("Received async batch of %s sessions", len(sessions))
+    if not sessions:
+        return []
+    deadline = Deadline.from_context(context)
+    status_responses = refresh_statuses(sessions, deadline) if status_batching_enabled() else {}
+    results = monitor_sessions(sessions, get_socket_client(), deadline=deadline, status_responses=status_responses)
+    return finish_batch(results, deadline)
+
+
+def finish_batch(results: List[BatchSessionResult], deadline: Optional[Deadline]) -> List[dict]:
+    """Writes what the write behind buffer holds, marks the sessions whose write failed and flushes the records"""
+    failed_writes = {update_key(update) for update in flush_write_behind(deadline)}
+    for result in results:
+        if (result.booking_id, result.vendor_id) in failed_writes:
+            result.db_error = "Not able to update data to db"
+    flush_metrics()
+    flush_logs()
+    return [result.dict() for result in results]
+
@@ -1,10 +1,116 @@
+import atexit
+import contextvars
 import logging
+import queue
+import threading
+import zlib
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from config import get_settings
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+DATE_FORMAT = '%d-%b-%y %H:%M:%S'
+
+_log_queue: Optional[queue.Queue] = None
+_listener: Optional[QueueListener] = None
+_configure_lock = threading.Lock()
+# Booking whose check is being logged, set by the entry points with booking_log_context
+_booking_id: contextvars.ContextVar = contextvars.ContextVar("booking_id", default=None)
+
+
+@contextmanager
+def booking_log_context(booking_id):
+    token = _booking_id.set(booking_id)
+    try:
+        yield
+    finally:
+        _booking_id.reset(token)
+
+
+def submit_with_log_context(executor, fn, *args):
+    """Submits to a pool thread with the log context of the caller, so that the booking being logged goes along"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def is_booking_sampled(booking_id, rate: float) -> bool:
+    """The same answer for a booking in every process and invocation, from a hash of the booking id"""
+    return zlib.crc32(str(booking_id).encode("utf-8")) / 2 ** 32 < rate
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets the records at INFO and below of `rate` of the bookings through, so that a session is either logged
+    completely or not at all. Warnings and errors, and records logged outside of a booking, are always kept
+    """
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record) -> bool:
+        if record.levelno > logging.INFO or self.rate >= 1:
+            return True
+        booking_id = _booking_id.get()
+        return booking_id is None or is_booking_sampled(booking_id, self.rate)
+
+
+def parse_module_levels(module_levels: str) -> Dict[str, str]:
+    """Parses LOG_LEVELS like "app.poller=WARNING,lambda_handler=DEBUG" """
+    levels = {}
+    for entry in filter(None, (entry.strip() for entry in module_levels.split(","))):
+        name, _, level = entry.partition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def level_for(name: str) -> str:
+    """Level of the closest module in LOG_LEVELS, LOG_LEVEL when no module of the name is listed"""
+    settings = get_settings()
+    module_levels = parse_module_levels(settings.LOG_LEVELS)
+    matches = [module for module in module_levels if name == module or name.startswith(f"{module}.")]
+    return module_levels[max(matches, key=len)] if matches else settings.LOG_LEVEL.upper()
+
+
+def configure_logging():
+    """
+    Sends every record through one queue to the handlers of the root logger, run in their own thread so that
+    logging does not wait on the stream. The handler the lambda runtime installs on the root logger is kept
+    behind the queue, it adds the aws_request_id and writes a traceback as one log event. The records of an
+    invocation are written before it returns, see flush_logs, so they get the request id of their invocation.
+    Without a root handler, like in tests and local runs, a stream handler is used.
+    """
+    global _log_queue, _listener
+    if _listener is not None:
+        return
+    with _configure_lock:
+        if _listener is not None:
+            return
+        root_logger = logging.getLogger()
+        handlers = list(root_logger.handlers)
+        if not handlers:
+            stream_handler = logging.StreamHandler()
+            stream_handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT))
+            handlers = [stream_handler]
+        _log_queue = queue.Queue()
+        queue_handler = QueueHandler(_log_queue)
+        queue_handler.addFilter(SamplingFilter(get_settings().LOG_SAMPLE_RATE))
+        # Moved behind the queue, not dropped, so that every record is written once by the same handlers
+        for handler in handlers:
+            root_logger.removeHandler(handler)
+        root_logger.addHandler(queue_handler)
+        _listener = QueueListener(_log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def flush_logs():
+    """Waits until the queued records are written. Called before an invocation returns and the process is frozen"""
+    if _log_queue is not None:
+        _log_queue.join()
 
 
 def get_logger(name) -> logging.Logger:
-    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                        datefmt='%d-%b-%y %H:%M:%S')
+    configure_logging()
     logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(level_for(name))
     return logger
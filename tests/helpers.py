@@ -0,0 +1,33 @@
+import datetime
+from typing import Dict
+from unittest import TestCase
+import simplejson
+
+SESSION_DATA_FILE = "./test_data/session_data.json"
+
+
+def load_session_data() -> Dict:
+    with open(SESSION_DATA_FILE, "r") as fh:
+        return simplejson.load(fh)
+
+
+def time_ago(elapsed: datetime.timedelta) -> str:
+    return (datetime.datetime.utcnow() - elapsed).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class SessionTestCase(TestCase):
+    """
+    Test case on a fresh copy of the session fixture in `test_data`. `start_session` turns it into a session booked
+    and started a while ago, `start_patchers` starts patchers which are stopped after the test
+    """
+    def setUp(self) -> None:
+        self.test_data = load_session_data()
+
+    def start_session(self, elapsed: datetime.timedelta, **session_data):
+        start_time = time_ago(elapsed)
+        self.test_data.update(booking_time=start_time, start_time=start_time, **session_data)
+
+    def start_patchers(self, *patchers):
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
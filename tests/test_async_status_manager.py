@@ -0,0 +1,71 @@
+import asyncio
+import copy
+import datetime
+import time
+from unittest.mock import patch, MagicMock
+import lambda_handler
+from app.async_status_manager import AsyncStatusManager, monitor_sessions_async
+from app.status_manager import StatusManager
+from data_store.data_structure import ChargingStatus
+from exceptions.exception import DbFetchException
+from logger_init import get_logger
+from tests.helpers import SessionTestCase
+
+logger = get_logger(__name__)
+
+
+class TestAsyncStatusManager(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.start_session(datetime.timedelta(minutes=2), current_status=ChargingStatus.STARTED.value,
+                           expanded_vehicle_data={"power_capacity": "30"})
+        self.written = []
+        self.socket_client = MagicMock()
+        self.start_patchers(
+            patch("app.status_manager.call_api", return_value={}),
+            patch.object(StatusManager, "get_current_booking_session_data", self.mock_get_current_session_data),
+            patch.object(StatusManager, "set_current_booking_session_data", self.mock_set_current_session_data),
+            patch("lambda_handler.get_socket_client", return_value=self.socket_client))
+
+    def mock_get_current_session_data(self, db_api, booking_id, vendor_id):
+        time.sleep(0.2)
+        if booking_id == "unavailable":
+            raise DbFetchException(code=500, message="Not able to fetch data from db")
+        session = copy.deepcopy(self.test_data)
+        session["booking_id"] = booking_id
+        return session
+
+    def mock_set_current_session_data(self, result_to_update, db_api):
+        self.written.append(result_to_update.primary_key["booking_id"])
+
+    def make_events(self, count):
+        return [dict(copy.deepcopy(self.test_data), booking_id=f"booking-{index}") for index in range(count)]
+
+    def test_single_session_pipeline(self):
+        async def run():
+            status_manager = await AsyncStatusManager.create(self.test_data)
+            return await status_manager.check_current_session_data_and_push_async(self.socket_client)
+
+        report = asyncio.run(run())
+        self.assertEqual(report.current_status, ChargingStatus.IN_PROGRESS.value)
+        self.assertEqual(self.written, [self.test_data["booking_id"]])
+        self.assertEqual(report.socket_delivery.delivered, [self.test_data["socket_connection_id"]])
+
+    def test_sessions_run_concurrently_on_one_loop(self):
+        started = time.monotonic()
+        results = asyncio.run(monitor_sessions_async(self.make_events(20), self.socket_client))
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual([result.current_status for result in results], [ChargingStatus.IN_PROGRESS.value] * 20)
+        self.assertEqual(sorted(self.written), sorted(f"booking-{index}" for index in range(20)))
+        self.assertEqual(self.socket_client.post_to_connection.call_count, 20)
+
+    def test_unavailable_session_data_keeps_the_status(self):
+        event = dict(self.test_data, booking_id="unavailable")
+        result, = asyncio.run(monitor_sessions_async([event], self.socket_client))
+        self.assertEqual(result.current_status, ChargingStatus.STARTED.value)
+        self.assertIsNotNone(result.error)
+
+    def test_async_batch_lambda_handler(self):
+        results = lambda_handler.async_batch_lambda_handler({"sessions": self.make_events(3)}, None)
+        self.assertEqual([result["booking_id"] for result in results], ["booking-0", "booking-1", "booking-2"])
+        self.assertEqual({result["current_status"] for result in results}, {ChargingStatus.IN_PROGRESS.value})
@@ -0,0 +1,61 @@
+import copy
+import datetime
+from unittest.mock import patch, MagicMock
+import lambda_handler
+from app.status_manager import StatusManager
+from data_store.data_structure import ChargingStatus
+from exceptions.exception import DbFetchException
+from logger_init import get_logger
+from tests.helpers import SessionTestCase
+
+logger = get_logger(__name__)
+
+
+class TestBatchLambdaHandler(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.start_session(datetime.timedelta(minutes=2), expanded_vehicle_data={"power_capacity": "30"})
+        self.sessions = {}
+        for booking_id, status in (("booking-1", "STARTED"), ("booking-2", "IN_PROGRESS"), ("booking-3", "BROKEN")):
+            session = copy.deepcopy(self.test_data)
+            session["booking_id"] = booking_id
+            session["current_status"] = status
+            self.sessions[booking_id] = session
+        self.socket_client = MagicMock()
+        patchers = [
+            patch("app.status_manager.call_api", return_value={}),
+            patch.object(StatusManager, "get_current_booking_session_data", self.mock_get_current_session_data),
+            patch.object(StatusManager, "set_current_booking_session_data", MagicMock()),
+            patch("lambda_handler.get_socket_client", return_value=self.socket_client)
+        ]
+        self.start_patchers(*patchers)
+
+    def mock_get_current_session_data(self, db_api, booking_id, vendor_id):
+        session = self.sessions[booking_id]
+        if session["current_status"] == "BROKEN":
+            raise DbFetchException(code=500, message="Not able to fetch data from db")
+        return session
+
+    def test_every_booking_gets_a_result_in_order(self):
+        results = lambda_handler.batch_lambda_handler({"sessions": list(self.sessions.values())}, None)
+        self.assertEqual([result["booking_id"] for result in results], ["booking-1", "booking-2", "booking-3"])
+        self.assertEqual(results[0]["current_status"], ChargingStatus.IN_PROGRESS.value)
+        self.assertEqual(results[1]["current_status"], ChargingStatus.IN_PROGRESS.value)
+        self.assertIsNone(results[0]["error"])
+
+    def test_errors_are_kept_per_booking(self):
+        results = lambda_handler.batch_lambda_handler(list(self.sessions.values()), None)
+        # A session whose record can not be read keeps the status it came with
+        self.assertEqual(results[2]["current_status"], "BROKEN")
+        self.assertIn("DbFetchException", results[2]["error"])
+        self.assertEqual(self.socket_client.post_to_connection.call_count, 2)
+
+    def test_socket_failure_does_not_fail_the_booking(self):
+        self.socket_client.post_to_connection.side_effect = RuntimeError("socket gone")
+        results = lambda_handler.batch_lambda_handler([self.sessions["booking-1"]], None)
+        self.assertEqual(results[0]["current_status"], ChargingStatus.IN_PROGRESS.value)
+        self.assertIsNone(results[0]["error"])
+        self.assertEqual(results[0]["socket_error"], "Unable to send data over socket")
+
+    def test_empty_batch(self):
+        self.assertEqual(lambda_handler.batch_lambda_handler({"sessions": []}, None), [])
@@ -0,0 +1,45 @@
+import os
+import tempfile
+from unittest import TestCase
+from tools.benchmark_suite import run_benchmarks, default_benchmarks, compare_reports, regressions, \
+    BenchmarkReport, BenchmarkResult
+from app.decision_making_functions import logger as decision_logger
+from data_store.data_structure import ChargingStatus
+from logger_init import get_logger
+
+logger = get_logger(__name__)
+
+
+class TestBenchmarkSuite(TestCase):
+    def test_benchmarks_cover_the_decision_and_serialization_core(self):
+        benchmarks = default_benchmarks()
+        for name in ("decision_table.decide", "check_time_based_status", "check_energy_based_status",
+                     "calculate_time_related_data.time", "map_final_data", "parse_data_for_live_update"):
+            self.assertIn(name, benchmarks)
+        self.assertEqual(benchmarks["check_time_based_status"](), ChargingStatus.IN_PROGRESS.value)
+        self.assertEqual(benchmarks["check_user_interruption"](), ChargingStatus.COMPLETED.value)
+        self.assertEqual(benchmarks["map_final_data"]().data_to_update["current_charging_timer"], "00:05:00")
+        for name in ("decision_table.decide", "decision_table.decide.booking", "decision_table.decide.energy"):
+            self.assertIn(benchmarks[name](), {status.value for status in ChargingStatus})
+
+    def test_results_survive_a_round_trip(self):
+        level = decision_logger.level
+        report = run_benchmarks(["decision_table.decide", "map_final_data"], number=10, repeat=2)
+        self.assertEqual(decision_logger.level, level)
+        self.assertEqual(report.meta["log_level"], "WARNING")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results.json")
+            report.save(path)
+            loaded = BenchmarkReport.load(path)
+        self.assertEqual(loaded.results, report.results)
+        self.assertEqual(loaded.meta, report.meta)
+
+    def test_slower_benchmarks_are_reported(self):
+        def report(map_final_data_us):
+            return BenchmarkReport(results={
+                "decision_table.decide": BenchmarkResult("decision_table.decide", 10, 2, best_us=1.0, median_us=1.0),
+                "map_final_data": BenchmarkResult("map_final_data", 10, 2, best_us=map_final_data_us,
+                                                  median_us=map_final_data_us)})
+        comparisons = compare_reports(report(5.0), report(7.0))
+        self.assertEqual([comparison.name for comparison in regressions(comparisons, threshold=1.25)],
+                         ["map_final_data"])
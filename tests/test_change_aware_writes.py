@@ -0,0 +1,71 @@
+import datetime
+from unittest.mock import patch, MagicMock
+from app import status_manager as status_manager_module
+from app.final_data_maker import timer_bucket
+from app.status_manager import StatusManager, SessionWriteStats
+from data_store.data_structure import ChargingStatus
+from logger_init import get_logger
+from tests.helpers import SessionTestCase
+
+logger = get_logger(__name__)
+
+
+class TestChangeAwareWrites(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.start_session(datetime.timedelta(minutes=2, seconds=20), current_charging_timer="00:02:00",
+                           expanded_vehicle_data={"power_capacity": "30"}, current_energy_consumed="4",
+                           charging_states={"current_energy_consumed": "4"})
+        self.db_write = MagicMock()
+        patchers = [
+            patch("app.status_manager.call_api", return_value={}),
+            patch("app.status_manager.session_write_stats", SessionWriteStats()),
+            patch.object(StatusManager, "get_current_booking_session_data", lambda *args: self.test_data),
+            patch.object(StatusManager, "set_current_booking_session_data", self.db_write)
+        ]
+        self.start_patchers(*patchers)
+
+    def test_write_is_skipped_when_only_timer_moved_inside_bucket(self):
+        self.test_data["current_status"] = ChargingStatus.IN_PROGRESS.value
+        result = StatusManager(self.test_data).check_current_session_data()
+        self.assertEqual(result, ChargingStatus.IN_PROGRESS.value)
+        self.db_write.assert_not_called()
+        self.assertEqual(status_manager_module.session_write_stats.writes_skipped, 1)
+
+    def test_energy_is_compared_with_the_last_persisted_energy(self):
+        self.test_data["current_status"] = ChargingStatus.IN_PROGRESS.value
+        self.test_data["current_energy_consumed"] = "5"
+        StatusManager(self.test_data).check_current_session_data()
+        payload = self.db_write.call_args[0][0]
+        self.assertEqual(payload.data_to_update["charging_states"]["current_energy_consumed"], "5")
+        self.assertEqual(status_manager_module.session_write_stats.writes, 1)
+
+    def test_first_write_of_a_session_is_not_skipped(self):
+        self.test_data["current_status"] = ChargingStatus.IN_PROGRESS.value
+        self.test_data["charging_states"] = {}
+        StatusManager(self.test_data).check_current_session_data()
+        self.db_write.assert_called_once()
+
+    def test_only_changed_attributes_are_written(self):
+        self.test_data["current_status"] = ChargingStatus.STARTED.value
+        StatusManager(self.test_data).check_current_session_data()
+        payload = self.db_write.call_args[0][0]
+        self.assertEqual(payload.data_to_update["current_status"], ChargingStatus.IN_PROGRESS.value)
+        self.assertIn("charging_states", payload.data_to_update)
+        self.assertNotIn("current_energy_consumed", payload.data_to_update)
+        self.assertEqual(payload.primary_key, {"booking_id": self.test_data["booking_id"]})
+        self.assertEqual(status_manager_module.session_write_stats.writes, 1)
+        self.assertGreater(status_manager_module.session_write_stats.attributes_skipped, 0)
+
+    def test_full_payload_is_written_when_disabled(self):
+        self.test_data["current_status"] = ChargingStatus.IN_PROGRESS.value
+        with patch.object(status_manager_module.settings, "CHANGE_AWARE_WRITES", False):
+            StatusManager(self.test_data).check_current_session_data()
+        payload = self.db_write.call_args[0][0]
+        self.assertEqual(set(payload.data_to_update), {"current_status", "current_energy_consumed", "max_energy",
+                                                       "current_charging_timer", "charging_states"})
+
+    def test_timer_bucket(self):
+        self.assertEqual(timer_bucket("00:02:59", 60), timer_bucket("00:02:00", 60))
+        self.assertNotEqual(timer_bucket("00:03:00", 60), timer_bucket("00:02:59", 60))
+        self.assertIsNone(timer_bucket(None, 60))
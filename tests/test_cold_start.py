@@ -0,0 +1,21 @@
+from unittest import TestCase
+from app.startup_report import measure_import_time
+from config import get_settings
+from logger_init import get_logger
+
+logger = get_logger(__name__)
+
+
+class TestColdStart(TestCase):
+    def setUp(self) -> None:
+        self.report = measure_import_time("lambda_handler")
+
+    def test_handler_import_is_within_budget(self):
+        logger.info(f"Importing lambda_handler took {self.report.total_ms} ms")
+        self.assertTrue(self.report.within_budget(), f"{self.report.total_ms} ms is over the budget")
+
+    def test_heavy_dependencies_are_not_imported_eagerly(self):
+        self.assertEqual(self.report.eager_lazy_modules(), [])
+
+    def test_settings_are_read_once(self):
+        self.assertIs(get_settings(), get_settings())
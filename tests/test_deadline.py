@@ -0,0 +1,133 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+import lambda_handler
+from app.api_caller import call_api, settings
+from app.deadline import CallBudget, Deadline, STATUS_STAGE, READ_STAGE, WRITE_STAGE, SOCKET_STAGE
+from app.status_manager import StatusManager
+from data_store.data_structure import ChargingStatus
+from logger_init import get_logger
+from tests.helpers import SessionTestCase
+
+logger = get_logger(__name__)
+
+# Other test modules replace these on the class without restoring them, the originals are kept here
+get_current_booking_session_data = StatusManager.get_current_booking_session_data
+set_current_booking_session_data = StatusManager.set_current_booking_session_data
+
+
+class FakeLambdaContext:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(1)
+        body = b"{}"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestDeadline(TestCase):
+    def test_stages_share_the_remaining_time(self):
+        deadline = Deadline.from_context(FakeLambdaContext(10500))
+        self.assertAlmostEqual(deadline.budget, 10.0)
+        self.assertAlmostEqual(deadline.timeout_for(STATUS_STAGE), 3.5, places=2)
+        self.assertAlmostEqual(deadline.timeout_for(READ_STAGE), 2.5, places=2)
+        self.assertAlmostEqual(deadline.timeout_for(WRITE_STAGE), 2.0, places=2)
+        self.assertAlmostEqual(deadline.timeout_for(SOCKET_STAGE), 2.0, places=2)
+
+    def test_stage_never_gets_more_than_what_is_left(self):
+        deadline = Deadline(10500)
+        deadline.expires_at = time.monotonic() + 1
+        self.assertLessEqual(deadline.timeout_for(STATUS_STAGE), 1.0)
+        deadline.expires_at = time.monotonic() - 1
+        self.assertEqual(deadline.timeout_for(STATUS_STAGE), 0.05)
+
+    def test_no_deadline_without_lambda_context(self):
+        self.assertIsNone(Deadline.from_context(None))
+
+
+class TestDeadlineAwareRequests(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.test_data["expanded_vehicle_data"] = {"power_capacity": "30"}
+
+    def test_slow_status_api_returns_empty_response(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        started = time.monotonic()
+        with patch.object(settings, "RETRY_MAX_ATTEMPTS", 1):
+            self.assertEqual(call_api(f"http://127.0.0.1:{server.server_address[1]}/status", body={}, timeout=0.2),
+                             {})
+        self.assertLess(time.monotonic() - started, 0.9)
+
+    def test_retries_stay_in_the_stage_share(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        deadline = Deadline.from_context(FakeLambdaContext(2500))
+        started = time.monotonic()
+        with patch.object(settings, "RETRY_MAX_ATTEMPTS", 5), patch.object(settings, "RETRY_BASE_DELAY_SECONDS", 0):
+            self.assertEqual(call_api(f"http://127.0.0.1:{server.server_address[1]}/status", body={},
+                                      timeout=deadline.timeout_for(STATUS_STAGE), deadline=deadline), {})
+        # The status share is 0.7 seconds, a retry would only get what is left of it
+        self.assertLess(time.monotonic() - started, 0.95)
+
+    def test_call_budget_shrinks_with_every_attempt(self):
+        deadline = Deadline(10500)
+        budget = CallBudget(1.0, deadline)
+        budget.expires_at = time.monotonic() + 0.3
+        self.assertLessEqual(budget.attempt_timeout(), 0.3)
+        self.assertFalse(budget.allows_retry_after(0.5))
+        budget.expires_at = time.monotonic() - 1
+        self.assertEqual(budget.attempt_timeout(), settings.DEADLINE_MIN_STAGE_TIMEOUT_SECONDS)
+        self.assertEqual(CallBudget(1.0).attempt_timeout(), 1.0)
+
+    def test_stage_timeouts_are_passed_to_requests(self):
+        session = MagicMock()
+        session.post.return_value.json.return_value = self.test_data
+        deadline = Deadline.from_context(FakeLambdaContext(10500))
+        with patch("app.status_manager.call_api", return_value={}) as status_call, \
+                patch("app.status_manager.get_http_session", return_value=session), \
+                patch.object(StatusManager, "get_current_booking_session_data", get_current_booking_session_data), \
+                patch.object(StatusManager, "set_current_booking_session_data", set_current_booking_session_data):
+            status_manager = StatusManager(self.test_data, deadline)
+            status_manager.set_current_booking_session_data(MagicMock(), "db_api")
+        self.assertAlmostEqual(status_call.call_args[1]["timeout"], 3.5, places=1)
+        read_timeout, write_timeout = [call[1]["timeout"] for call in session.post.call_args_list]
+        self.assertAlmostEqual(read_timeout, 2.5, places=1)
+        self.assertAlmostEqual(write_timeout, 2.0, places=1)
+
+    def test_default_timeout_without_deadline(self):
+        with patch("app.status_manager.call_api", return_value={}) as status_call, \
+                patch.object(StatusManager, "get_current_booking_session_data", lambda *args: self.test_data):
+            StatusManager(self.test_data)
+        self.assertEqual(status_call.call_args[1]["timeout"], 10)
+
+    def test_lambda_handler_uses_the_context_deadline(self):
+        with patch.object(lambda_handler, "StatusManager") as status_manager, \
+                patch("lambda_handler.get_socket_client"):
+            status_manager.return_value.check_current_session_data_and_push.return_value.current_status = \
+                ChargingStatus.IN_PROGRESS.value
+            lambda_handler.lambda_handler(self.test_data, FakeLambdaContext(3000))
+        deadline = status_manager.call_args[0][1]
+        self.assertAlmostEqual(deadline.budget, 2.5)
@@ -0,0 +1,86 @@
+import datetime
+from unittest.mock import MagicMock
+from app.decision_making_functions import *
+from app.time_calculations import PrepareTimeDataForCurrentState
+from data_store.data_schemas import CollectiveDataForCurrentState
+from data_store.data_structure import ChargingStatus
+from exceptions.exception import DecisionException
+from logger_init import get_logger
+from tests.helpers import SessionTestCase
+
+logger = get_logger(__name__)
+
+
+class TestDecisionTable(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.decision_table = DecisionTable(DEFAULT_DECISION_TABLE)
+
+    def make_state(self, current_status, start_time, target_duration_timestamp=None, target_energy_kw=None,
+                   current_energy_consumed=0, user_stopped=False, minutes_elapsed=2):
+        session_data = dict(self.test_data)
+        point_in_time = (datetime.datetime.utcnow() - datetime.timedelta(minutes=minutes_elapsed)).strftime(
+            '%Y-%m-%d %H:%M:%S')
+        session_data.update({"current_status": current_status, "user_stopped": user_stopped,
+                             "current_energy_consumed": current_energy_consumed, "booking_time": point_in_time,
+                             "start_time": point_in_time if start_time else None})
+        collective_data_for_current_state = CollectiveDataForCurrentState(
+            booking_id=session_data["booking_id"], station_id=session_data["station_id"],
+            vendor_id=session_data["vendor_id"], charger_point_id=session_data["charger_point_id"],
+            connector_point_id=session_data["connector_point_id"],
+            target_duration_timestamp=target_duration_timestamp, target_energy_kw=target_energy_kw,
+            start_time=session_data["start_time"], session_data=session_data)
+        time_related_data = PrepareTimeDataForCurrentState.parse_obj(
+            {"collective_data_for_current_state": collective_data_for_current_state})
+        time_related_data.calculate_time_related_data()
+        return collective_data_for_current_state, time_related_data
+
+    @staticmethod
+    def legacy_decision(collective_data_for_current_state, time_related_data):
+        activities = decider(collective_data_for_current_state.start_time,
+                             collective_data_for_current_state.target_duration_timestamp,
+                             collective_data_for_current_state.target_energy_kw)
+        results = [activity(collective_data_for_current_state, time_related_data) for activity in activities]
+        results = [result for result in results if result is not None]
+        return results[0] if results else None
+
+    def table_decision(self, collective_data_for_current_state, time_related_data):
+        try:
+            return self.decision_table.decide(collective_data_for_current_state, time_related_data)
+        except DecisionException:
+            return None
+
+    def test_table_matches_legacy_decider_for_every_status(self):
+        targets = [{"start_time": False}, {"start_time": False, "minutes_elapsed": 10},
+                   {"start_time": True, "target_duration_timestamp": "00:10:00"},
+                   {"start_time": True, "target_duration_timestamp": "00:01:00"},
+                   {"start_time": True, "target_energy_kw": 20, "current_energy_consumed": 10},
+                   {"start_time": True, "target_energy_kw": 20, "current_energy_consumed": 25}]
+        for current_status in ChargingStatus:
+            for user_stopped in (False, True):
+                for target in targets:
+                    state = self.make_state(current_status.value, user_stopped=user_stopped, **target)
+                    with self.subTest(status=current_status.value, user_stopped=user_stopped, target=target):
+                        self.assertEqual(self.table_decision(*state), self.legacy_decision(*state))
+
+    def test_only_matching_rule_is_called(self):
+        rule = MagicMock(return_value=ChargingStatus.IN_PROGRESS.value)
+        not_called = MagicMock()
+        decision_table = DecisionTable({TIME_STRATEGY: {ChargingStatus.STARTED.value: [rule],
+                                                        DEFAULT_RULES: [not_called]}})
+        state = self.make_state(ChargingStatus.STARTED.value, start_time=True, target_duration_timestamp="00:10:00")
+        self.assertEqual(decision_table.decide(*state), ChargingStatus.IN_PROGRESS.value)
+        rule.assert_called_once()
+        not_called.assert_not_called()
+
+    def test_no_decision_raises(self):
+        state = self.make_state(ChargingStatus.IN_PROGRESS.value, start_time=False)
+        with self.assertRaises(DecisionException):
+            self.decision_table.decide(*state)
+
+    def test_table_can_be_loaded_from_data(self):
+        decision_table = DecisionTable.from_data({"TIME": {"DEFAULT": ["check_time_based_status"]}})
+        self.assertEqual(decision_table.rules_for(TIME_STRATEGY, ChargingStatus.STARTED.value),
+                         (check_time_based_status,))
+        with self.assertRaises(DecisionException):
+            DecisionTable.from_data({"TIME": {"DEFAULT": ["not_a_rule"]}})
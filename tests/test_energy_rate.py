@@ -0,0 +1,114 @@
+import datetime
+import time
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+from app.energy_rate import EnergyRateEstimator, EnergyRateRegistry
+from app import energy_rate
+from app.status_manager import StatusManager
+from data_store.data_structure import ChargingStatus
+from logger_init import get_logger
+from tests.helpers import SessionTestCase
+
+logger = get_logger(__name__)
+
+STALL_SECONDS = 600
+
+
+class TestEnergyRateEstimator(TestCase):
+    def test_rate_and_predicted_completion(self):
+        estimator = EnergyRateEstimator(8)
+        for minute in range(5):
+            estimator.add(1000 + minute * 60, minute * 0.5)
+        estimate = estimator.estimate(10, 1240, STALL_SECONDS)
+        self.assertAlmostEqual(estimate.rate_per_second, 0.5 / 60)
+        # 8 more at half a unit per minute
+        self.assertAlmostEqual(estimate.seconds_to_target, 16 * 60)
+        self.assertAlmostEqual(estimate.predicted_completion_at, 1240 + 16 * 60)
+        self.assertFalse(estimate.stalled)
+
+    def test_rate_follows_the_recent_samples(self):
+        estimator = EnergyRateEstimator(4)
+        for minute in range(10):
+            estimator.add(minute * 60, minute * 1.0 if minute < 6 else 6 + (minute - 6) * 2.0)
+        self.assertEqual(len(estimator.samples), 4)
+        self.assertAlmostEqual(estimator.rate(), 2.0 / 60)
+
+    def test_single_sample_has_no_rate(self):
+        estimator = EnergyRateEstimator(4)
+        estimator.add(0, 1)
+        self.assertIsNone(estimator.estimate(10, 0, STALL_SECONDS).seconds_to_target)
+
+    def test_energy_which_stops_moving_is_stalled(self):
+        estimator = EnergyRateEstimator(8)
+        estimator.add(0, 1)
+        estimator.add(60, 2)
+        estimator.add(300, 2)
+        self.assertFalse(estimator.estimate(10, 300, STALL_SECONDS).stalled)
+        estimator.add(660, 2)
+        estimate = estimator.estimate(10, 660, STALL_SECONDS)
+        self.assertTrue(estimate.stalled)
+        self.assertIsNone(estimate.predicted_completion_at)
+        estimator.add(720, 3)
+        self.assertFalse(estimator.estimate(10, 720, STALL_SECONDS).stalled)
+
+    def test_meter_reset_drops_the_history(self):
+        estimator = EnergyRateEstimator(8)
+        estimator.add(0, 5)
+        estimator.add(60, 6)
+        estimator.add(120, 0)
+        self.assertEqual(list(estimator.samples), [(120, 0)])
+
+    def test_registry_keeps_at_most_capacity_sessions(self):
+        registry = EnergyRateRegistry(capacity=2, samples=4)
+        for booking_id in ("a", "b", "c"):
+            registry.add_sample((booking_id, "vendor"), 0, 0, 10)
+        self.assertEqual(len(registry), 2)
+        self.assertNotIn(("a", "vendor"), registry._estimators)
+        registry.forget(("b", "vendor"))
+        self.assertEqual(len(registry), 1)
+
+
+class TestStatusManagerEnergyRate(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.start_session(datetime.timedelta(minutes=10), booking_id="energy-rate",
+                           current_status=ChargingStatus.IN_PROGRESS.value, target_duration_timestamp=None,
+                           target_energy_kw=40, current_energy_consumed=10,
+                           expanded_vehicle_data={"power_capacity": "30"})
+        self.registry = EnergyRateRegistry(capacity=10, samples=8)
+        self.now = time.time()
+        patchers = [patch("app.status_manager.call_api", return_value={}),
+                    patch.object(StatusManager, "get_current_booking_session_data", lambda *args: self.test_data),
+                    patch.object(StatusManager, "set_current_booking_session_data", lambda *args: None),
+                    patch("app.status_manager.get_energy_rate_registry", return_value=self.registry),
+                    patch("app.status_manager.time.time", lambda: self.now),
+                    patch.object(energy_rate.settings, "ENERGY_STALL_SECONDS", STALL_SECONDS)]
+        self.start_patchers(*patchers)
+
+    def check(self, energy, after_seconds):
+        self.now += after_seconds
+        self.test_data["current_energy_consumed"] = energy
+        return StatusManager(self.test_data).check_current_session_data_and_push(MagicMock())
+
+    def test_samples_of_every_check_pace_the_next_check(self):
+        self.check(10, 0)
+        # 1 unit per minute, 20 minutes left at 30
+        report = self.check(30, 20 * 60)
+        self.assertEqual(report.current_status, ChargingStatus.IN_PROGRESS.value)
+        self.assertEqual(report.next_check_delay_seconds, 300)
+        report = self.check(39, 9 * 60)
+        self.assertEqual(report.next_check_delay_seconds, 30)
+        self.assertFalse(report.energy_stalled)
+
+    def test_stalled_session_is_reported(self):
+        self.check(10, 0)
+        self.check(12, 60)
+        report = self.check(12, STALL_SECONDS)
+        self.assertTrue(report.energy_stalled)
+
+    def test_completed_session_is_forgotten(self):
+        self.check(10, 0)
+        self.assertEqual(len(self.registry), 1)
+        report = self.check(40, 60)
+        self.assertEqual(report.current_status, ChargingStatus.COMPLETED.value)
+        self.assertEqual(len(self.registry), 0)
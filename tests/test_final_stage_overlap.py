@@ -0,0 +1,92 @@
+import datetime
+import time
+from unittest.mock import patch, MagicMock
+import simplejson
+import lambda_handler
+from app import status_manager as status_manager_module
+from app.live_update import LiveUpdateTracker
+from app.status_manager import StatusManager
+from data_store.data_structure import ChargingStatus
+from exceptions.exception import DbFetchException
+from logger_init import get_logger
+from tests.helpers import SessionTestCase
+
+logger = get_logger(__name__)
+
+
+class TestFinalStageOverlap(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.start_session(datetime.timedelta(minutes=2), current_status=ChargingStatus.STARTED.value,
+                           expanded_vehicle_data={"power_capacity": "30"})
+        self.db_write_delay = 0.3
+        self.db_write_error = None
+        self.written = []
+        self.socket_client = MagicMock()
+        self.socket_client.post_to_connection.side_effect = lambda **kwargs: time.sleep(0.3)
+        patchers = [
+            patch("app.status_manager.call_api", return_value={}),
+            patch.object(StatusManager, "get_current_booking_session_data", lambda *args: self.test_data),
+            patch.object(StatusManager, "set_current_booking_session_data", self.mock_set_current_session_data),
+            patch("lambda_handler.get_socket_client", return_value=self.socket_client)
+        ]
+        self.start_patchers(*patchers)
+
+    def mock_set_current_session_data(self, result_to_update, db_api):
+        self.written.append(result_to_update)
+        time.sleep(self.db_write_delay)
+        if self.db_write_error:
+            raise self.db_write_error
+
+    def test_write_and_push_overlap(self):
+        started = time.monotonic()
+        report = StatusManager(self.test_data).check_current_session_data_and_push(self.socket_client)
+        elapsed = time.monotonic() - started
+        self.assertLess(elapsed, 0.55)
+        self.assertEqual(report.current_status, ChargingStatus.IN_PROGRESS.value)
+        self.assertIsNone(report.db_error)
+        self.assertEqual(report.socket_delivery.delivered, [self.test_data["socket_connection_id"]])
+
+    def test_each_side_effect_has_its_own_timeout(self):
+        with patch.object(status_manager_module.settings, "SOCKET_PUSH_TIMEOUT_SECONDS", 0.1):
+            report = StatusManager(self.test_data).check_current_session_data_and_push(self.socket_client)
+        self.assertEqual(report.socket_error, "Socket push timed out")
+        self.assertIsNone(report.db_error)
+
+    def test_timed_out_side_effect_is_finished_before_returning(self):
+        pushes = []
+        self.socket_client.post_to_connection.side_effect = lambda **kwargs: (time.sleep(0.3), pushes.append(1))
+        with patch.object(status_manager_module.settings, "SOCKET_PUSH_TIMEOUT_SECONDS", 0.1):
+            report = StatusManager(self.test_data).check_current_session_data_and_push(self.socket_client)
+        self.assertEqual(report.socket_error, "Socket push timed out")
+        self.assertEqual(pushes, [1])
+
+    def test_unexpected_side_effect_error_is_only_reported(self):
+        with patch.object(status_manager_module.SocketCommunicator, "send_message_to_socket",
+                          side_effect=ConnectionError("endpoint unreachable")):
+            report = StatusManager(self.test_data).check_current_session_data_and_push(self.socket_client)
+            self.assertEqual(lambda_handler.lambda_handler(self.test_data, None), ChargingStatus.IN_PROGRESS.value)
+        self.assertEqual(report.current_status, ChargingStatus.IN_PROGRESS.value)
+        self.assertEqual(report.socket_error, "Unable to send data over socket")
+        self.assertIsNone(report.db_error)
+
+    def test_errors_are_reported_per_side_effect(self):
+        self.db_write_error = DbFetchException(code=500, message="Not able to update data to db")
+        self.socket_client.post_to_connection.side_effect = RuntimeError("socket down")
+        report = StatusManager(self.test_data).check_current_session_data_and_push(self.socket_client)
+        self.assertEqual(report.current_status, ChargingStatus.IN_PROGRESS.value)
+        self.assertEqual(report.db_error, "Not able to update data to db")
+        self.assertEqual(report.socket_error, "Unable to send data over socket")
+
+    def test_live_update_seq_is_written_with_the_push(self):
+        self.db_write_delay = 0
+        self.test_data["live_update_seq"] = 6
+        with patch("app.status_manager.get_live_update_tracker", return_value=LiveUpdateTracker(capacity=10)):
+            StatusManager(self.test_data).check_current_session_data_and_push(self.socket_client)
+        message = simplejson.loads(self.socket_client.post_to_connection.call_args[1]["Data"])
+        self.assertEqual((message["type"], message["seq"]), ("snapshot", 7))
+        self.assertEqual(self.written[0].data_to_update["live_update_seq"], 7)
+
+    def test_lambda_handler_continues_when_socket_fails(self):
+        self.socket_client.post_to_connection.side_effect = RuntimeError("socket down")
+        self.assertEqual(lambda_handler.lambda_handler(self.test_data, None), ChargingStatus.IN_PROGRESS.value)
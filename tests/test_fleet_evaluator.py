@@ -0,0 +1,73 @@
+import datetime
+import random
+from app.decision_making_functions import DecisionTable, DEFAULT_DECISION_TABLE
+from app.fleet_evaluator import FleetState, evaluate_fleet, format_timers
+from app.time_calculations import PrepareTimeDataForCurrentState
+from data_store.data_schemas import CollectiveDataForCurrentState
+from data_store.data_structure import ChargingStatus
+from exceptions.exception import DecisionException
+from logger_init import get_logger
+from tests.helpers import SessionTestCase
+import numpy as np
+import time
+
+logger = get_logger(__name__)
+
+
+class TestFleetEvaluator(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.current_time = datetime.datetime(2023, 1, 2, 10, 30, 15, 250000)
+        self.decision_table = DecisionTable(DEFAULT_DECISION_TABLE)
+        self.random = random.Random(7)
+
+    def random_state(self, index):
+        point_in_time = (self.current_time - datetime.timedelta(seconds=self.random.randint(0, 3 * 3600),
+                                                                microseconds=self.random.choice([0, 500000])))
+        point_in_time = point_in_time.isoformat(sep=" ")
+        started = self.random.random() < 0.7
+        mode = self.random.choice(["time", "energy", "both", "none"])
+        session_data = dict(self.test_data)
+        session_data.update({
+            "booking_id": f"booking-{index}",
+            "current_status": self.random.choice([status.value for status in ChargingStatus] + ["SOMETHING_ELSE"]),
+            "user_stopped": self.random.random() < 0.3,
+            "current_energy_consumed": self.random.randint(0, 40),
+            "booking_time": point_in_time,
+            "start_time": point_in_time if started else None})
+        return CollectiveDataForCurrentState(
+            booking_id=session_data["booking_id"], station_id=session_data["station_id"],
+            vendor_id=session_data["vendor_id"], charger_point_id=session_data["charger_point_id"],
+            connector_point_id=session_data["connector_point_id"],
+            target_duration_timestamp=self.random.choice(["00:05:00", "01:00:00", "02:30:00"])
+            if mode in ("time", "both") else self.random.choice([None, ""]),
+            target_energy_kw=self.random.randint(0, 40) if mode in ("energy", "both") else None,
+            start_time=session_data["start_time"], session_data=session_data)
+
+    def per_session(self, collective_data_for_current_state):
+        time_related_data = PrepareTimeDataForCurrentState.parse_obj(
+            {"collective_data_for_current_state": collective_data_for_current_state})
+        time_related_data.calculate_time_related_data(self.current_time)
+        try:
+            decision = self.decision_table.decide(collective_data_for_current_state, time_related_data)
+        except (DecisionException, AttributeError):
+            return None, None
+        if time_related_data.current_duration is None:
+            return None, None
+        return decision, time_related_data.current_duration.duration_as_time_stamp_string
+
+    def test_matches_per_session_functions(self):
+        states = [self.random_state(index) for index in range(500)]
+        evaluation = evaluate_fleet(FleetState.from_collective_data(states), self.current_time)
+        next_statuses = evaluation.next_statuses()
+        for index, state in enumerate(states):
+            decision, timer = self.per_session(state)
+            with self.subTest(state=state):
+                self.assertEqual(next_statuses[index], decision)
+                if decision is not None:
+                    self.assertEqual(evaluation.charging_timer[index], timer)
+
+    def test_format_timers_matches_gmtime(self):
+        seconds = np.array([0, 59, 61, 3599, 3600, 86399, 86400, 90061, -1])
+        self.assertEqual(format_timers(seconds).tolist(),
+                         [time.strftime("%H:%M:%S", time.gmtime(value)) for value in seconds.tolist()])
@@ -0,0 +1,55 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from app.api_caller import call_api
+from app.http_client import get_http_session, create_http_session
+from logger_init import get_logger
+
+logger = get_logger(__name__)
+
+
+class RecordingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.client_ports.append(self.client_address[1])
+        body = json.dumps({"current_status": "IN_PROGRESS"}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestPooledHttpClient(TestCase):
+    def setUp(self) -> None:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), RecordingHandler)
+        self.server.client_ports = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/internal/charging/status"
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_session_is_created_once_per_process(self):
+        self.assertIs(get_http_session(), get_http_session())
+
+    def test_pool_is_tunable(self):
+        session = create_http_session(pool_connections=2, pool_maxsize=5, pool_block=True)
+        adapter = session.get_adapter("https://example.com")
+        self.assertEqual(adapter._pool_connections, 2)
+        self.assertEqual(adapter._pool_maxsize, 5)
+        self.assertTrue(adapter._pool_block)
+
+    def test_connection_is_reused_between_calls(self):
+        for _ in range(3):
+            self.assertEqual(call_api(self.url, params={"booking_id": "1"}, body={}),
+                             {"current_status": "IN_PROGRESS"})
+        self.assertEqual(len(self.server.client_ports), 3)
+        self.assertEqual(len(set(self.server.client_ports)), 1)
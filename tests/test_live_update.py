@@ -0,0 +1,101 @@
+from unittest.mock import MagicMock
+import simplejson
+from app.live_update import LiveUpdateTracker
+from app.status_manager import SocketCommunicator
+from data_store.data_schemas import DataForLiveUpdate
+from exceptions.exception import SocketException
+from logger_init import get_logger
+from tests.helpers import SessionTestCase
+
+logger = get_logger(__name__)
+
+
+class TestDeltaLiveUpdates(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.test_data["current_status"] = "IN_PROGRESS"
+        self.test_data["current_charging_timer"] = "00:10:00"
+        self.tracker = LiveUpdateTracker(capacity=100)
+        self.socket_client = MagicMock()
+
+    def send(self):
+        return SocketCommunicator(self.socket_client, self.test_data,
+                                  live_update_tracker=self.tracker).send_message_to_socket()
+
+    def last_message(self):
+        return simplejson.loads(self.socket_client.post_to_connection.call_args[1]["Data"])
+
+    def test_first_message_is_a_full_snapshot(self):
+        self.send()
+        message = self.last_message()
+        self.assertEqual(message["type"], "snapshot")
+        self.assertEqual(message["seq"], 1)
+        self.assertEqual(message["data"], DataForLiveUpdate.parse_obj(self.test_data).dict())
+
+    def test_nothing_is_sent_when_nothing_changed(self):
+        self.send()
+        report = self.send()
+        self.assertEqual(self.socket_client.post_to_connection.call_count, 1)
+        self.assertEqual(report.unchanged, [self.test_data["socket_connection_id"]])
+
+    def test_only_changed_fields_are_sent(self):
+        self.send()
+        self.test_data["current_charging_timer"] = "00:11:00"
+        self.send()
+        self.assertEqual(self.last_message(), {"type": "delta", "seq": 2,
+                                               "changes": {"current_charging_timer": "00:11:00"}})
+
+    def test_snapshot_on_request_and_on_reconnect(self):
+        self.send()
+        self.test_data["live_update_snapshot_requested"] = True
+        self.send()
+        self.assertEqual(self.last_message()["type"], "snapshot")
+        self.assertEqual(self.last_message()["seq"], 2)
+        self.test_data["live_update_snapshot_requested"] = False
+        self.test_data["socket_connection_id"] = "reconnected-id"
+        self.send()
+        self.assertEqual(self.last_message()["type"], "snapshot")
+        self.assertEqual(self.last_message()["seq"], 1)
+
+    def test_failed_delivery_falls_back_to_snapshot(self):
+        self.send()
+        self.socket_client.post_to_connection.side_effect = RuntimeError("timeout")
+        self.test_data["current_charging_timer"] = "00:11:00"
+        with self.assertRaises(SocketException):
+            self.send()
+        self.socket_client.post_to_connection.side_effect = None
+        self.send()
+        self.assertEqual(self.last_message()["type"], "snapshot")
+
+    def test_tracker_memory_is_bounded(self):
+        tracker = LiveUpdateTracker(capacity=2)
+        for connection_id in ("a", "b", "c"):
+            tracker.prepare(connection_id, {"current_status": "IN_PROGRESS"})
+        self.assertEqual(len(tracker), 2)
+        self.assertEqual(simplejson.loads(tracker.prepare("a", {"current_status": "IN_PROGRESS"}).message)["type"],
+                         "snapshot")
+
+    def test_stale_process_history_falls_back_to_snapshot(self):
+        self.send()
+        # Another process sent seq 2 and 3 on the connection and kept 3 on the session record
+        self.test_data["live_update_seq"] = 3
+        self.test_data["current_charging_timer"] = "00:11:00"
+        self.send()
+        self.assertEqual(self.last_message()["type"], "snapshot")
+        self.assertEqual(self.last_message()["seq"], 4)
+        self.test_data["live_update_seq"] = 4
+        self.test_data["current_charging_timer"] = "00:12:00"
+        self.send()
+        self.assertEqual(self.last_message(), {"type": "delta", "seq": 5,
+                                               "changes": {"current_charging_timer": "00:12:00"}})
+
+    def test_concurrent_prepares_get_their_own_seq(self):
+        tracker = LiveUpdateTracker(capacity=10)
+        tracker.prepare("a", {"current_charging_timer": "00:10:00"})
+        first = tracker.prepare("a", {"current_charging_timer": "00:11:00"})
+        second = tracker.prepare("a", {"current_charging_timer": "00:12:00"})
+        self.assertEqual((first.seq, second.seq), (2, 3))
+        # The failed first message does not drop the history of the second one
+        tracker.forget(first)
+        self.assertEqual(simplejson.loads(tracker.prepare("a", {"current_charging_timer": "00:13:00"}).message),
+                         {"type": "delta", "seq": 4, "changes": {"current_charging_timer": "00:13:00"}})
@@ -0,0 +1,66 @@
+from unittest import TestCase
+from unittest.mock import patch
+import app
+from tools.load_harness import StubServices, StubBehaviour, run_load_test, percentile, settings
+from app.status_manager import StatusManager
+from data_store.data_structure import ChargingStatus
+from logger_init import get_logger
+
+logger = get_logger(__name__)
+
+# Other test modules replace these on the class without restoring them, the originals are kept here
+get_current_booking_session_data = StatusManager.get_current_booking_session_data
+set_current_booking_session_data = StatusManager.set_current_booking_session_data
+
+
+class TestLoadTestHarness(TestCase):
+    def setUp(self) -> None:
+        self.db_api = settings.DB_API
+        for patcher in (patch.object(StatusManager, "get_current_booking_session_data",
+                                     get_current_booking_session_data),
+                        patch.object(StatusManager, "set_current_booking_session_data",
+                                     set_current_booking_session_data)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_stubs(self, **behaviours):
+        stubs = StubServices(**behaviours).start()
+        self.addCleanup(stubs.stop)
+        return stubs
+
+    def test_sessions_go_from_booked_to_completed(self):
+        stubs = self.run_stubs()
+        report = run_load_test(stubs, sessions=3, target_duration_timestamp="00:00:01", poll_interval=0.3)
+        self.assertEqual(report.final_statuses(), {ChargingStatus.COMPLETED.value: 3})
+        for run in report.runs:
+            self.assertEqual(run.path, [ChargingStatus.BOOKED.value, ChargingStatus.IN_PROGRESS.value,
+                                        ChargingStatus.COMPLETED.value])
+            self.assertEqual(stubs.store.read(run.booking_id, "electrolite")["current_status"],
+                             ChargingStatus.COMPLETED.value)
+        self.assertEqual(stubs.stats["/socket"].requests, report.invocations)
+        self.assertGreater(report.throughput, 0)
+        percentiles = report.latency_percentiles()
+        self.assertLessEqual(percentiles["p50"], percentiles["p99"])
+        self.assertEqual(settings.DB_API, self.db_api)
+        self.assertEqual(app._socket_clients, {})
+
+    def test_injected_errors_are_survived(self):
+        stubs = self.run_stubs(db=StubBehaviour(latency_ms=5, error_rate=0.2), status=StubBehaviour(error_rate=0.2),
+                               seed=0)
+        report = run_load_test(stubs, sessions=3, target_duration_timestamp="00:00:01", poll_interval=0.3)
+        self.assertEqual(report.final_statuses(), {ChargingStatus.COMPLETED.value: 3})
+        # With seed 0 the fifth session table request of the run gets an injected error
+        self.assertGreater(stubs.stats["/db"].injected_errors, 0)
+        self.assertEqual(report.summary()["sessions"], 3)
+
+    def test_unknown_db_request_is_not_taken_for_an_update(self):
+        stubs = StubServices()
+        self.assertIsNone(stubs.handle_db({"primary_key": {"booking_id": "A-1"}, "sort_key": {"vendor_id": "x"},
+                                           "data_to_update": {"current_status": "BOOKED"}}))
+        self.assertIsNone(stubs.store.read("A-1", "x"))
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([], 0.5), 0.0)
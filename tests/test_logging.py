@@ -0,0 +1,90 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler
+from unittest import TestCase
+from unittest.mock import patch
+import logger_init
+from logger_init import get_logger, parse_module_levels, level_for, SamplingFilter, flush_logs, booking_log_context, \
+    is_booking_sampled, submit_with_log_context
+
+logger = get_logger(__name__)
+
+
+class CountingArgument:
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return "argument"
+
+
+class TestLogging(TestCase):
+    def test_one_handler_however_often_loggers_are_created(self):
+        for _ in range(3):
+            module_logger = get_logger("app.poller")
+        self.assertEqual(module_logger.handlers, [])
+        queue_handlers = [handler for handler in logging.getLogger().handlers if isinstance(handler, QueueHandler)]
+        self.assertEqual(len(queue_handlers), 1)
+
+    def test_disabled_records_are_never_formatted(self):
+        argument = CountingArgument()
+        module_logger = get_logger("app.lazy_formatting")
+        module_logger.setLevel(logging.WARNING)
+        module_logger.info("Session data %s", argument)
+        self.assertEqual(argument.formatted, 0)
+
+    def test_per_module_levels(self):
+        self.assertEqual(parse_module_levels("app.poller=warning, lambda_handler=DEBUG,"),
+                         {"app.poller": "WARNING", "lambda_handler": "DEBUG"})
+        with patch.object(logger_init.get_settings(), "LOG_LEVELS", "app=WARNING,app.poller=DEBUG"):
+            self.assertEqual(level_for("app.poller"), "DEBUG")
+            self.assertEqual(level_for("app.status_manager"), "WARNING")
+            self.assertEqual(level_for("application"), "INFO")
+            self.assertEqual(get_logger("app.poller").level, logging.DEBUG)
+        get_logger("app.poller")
+
+    def test_info_records_are_sampled_per_booking(self):
+        sampling_filter = SamplingFilter(rate=0.5)
+        info = logging.LogRecord("app", logging.INFO, __file__, 1, "poll", None, None)
+        warning = logging.LogRecord("app", logging.WARNING, __file__, 1, "retry", None, None)
+        self.assertTrue(sampling_filter.filter(info))
+        booking_ids = ["booking-%s" % index for index in range(200)]
+        sampled = {booking_id for booking_id in booking_ids if is_booking_sampled(booking_id, 0.5)}
+        self.assertTrue(0 < len(sampled) < len(booking_ids))
+        for booking_id in booking_ids[:20]:
+            with booking_log_context(booking_id):
+                self.assertEqual([sampling_filter.filter(info) for _ in range(3)], [booking_id in sampled] * 3)
+                self.assertTrue(sampling_filter.filter(warning))
+                self.assertTrue(SamplingFilter(rate=1).filter(info))
+                self.assertFalse(SamplingFilter(rate=0).filter(info))
+
+    def test_log_context_goes_along_to_pool_threads(self):
+        with ThreadPoolExecutor(max_workers=1) as executor, booking_log_context("A-1"):
+            self.assertEqual(submit_with_log_context(executor, logger_init._booking_id.get).result(), "A-1")
+
+    def test_runtime_handler_is_kept_behind_the_queue(self):
+        root_logger = logging.getLogger()
+        root_handlers = list(root_logger.handlers)
+        runtime_handler = logging.NullHandler()
+        for handler in root_handlers:
+            root_logger.removeHandler(handler)
+        root_logger.addHandler(runtime_handler)
+        try:
+            with patch.object(logger_init, "_listener", None), patch.object(logger_init, "_log_queue", None), \
+                    patch.object(logger_init.atexit, "register"):
+                logger_init.configure_logging()
+                listener = logger_init._listener
+                listener.stop()
+            self.assertEqual(listener.handlers, (runtime_handler,))
+            self.assertTrue(all(isinstance(handler, QueueHandler) for handler in root_logger.handlers))
+        finally:
+            for handler in list(root_logger.handlers):
+                root_logger.removeHandler(handler)
+            for handler in root_handlers:
+                root_logger.addHandler(handler)
+
+    def test_flush_waits_for_queued_records(self):
+        logger.info("Record written before the flush returns")
+        flush_logs()
+        self.assertEqual(logger_init._log_queue.unfinished_tasks, 0)
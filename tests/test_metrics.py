@@ -0,0 +1,96 @@
+import datetime
+import io
+import json
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+import lambda_handler
+from app import metrics
+from app.metrics import InMemorySink, EmfSink, NoOpSink, stage_timer, STATUS_CALL, DB_READ, TIME_CALCULATION, \
+    DECISION, DB_WRITE, SOCKET_PUSH
+from app.status_manager import StatusManager
+from data_store.data_structure import ChargingStatus
+from logger_init import get_logger
+from tests.helpers import SessionTestCase
+
+logger = get_logger(__name__)
+
+
+class TestStageMetrics(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.start_session(datetime.timedelta(minutes=2), current_status=ChargingStatus.STARTED.value,
+                           expanded_vehicle_data={"power_capacity": "30"})
+        self.sink = InMemorySink()
+        patchers = [
+            patch.object(metrics, "_metrics_sink", self.sink),
+            patch("app.status_manager.call_api", return_value={}),
+            patch.object(StatusManager, "get_current_booking_session_data", lambda *args: self.test_data),
+            patch.object(StatusManager, "set_current_booking_session_data", lambda *args: None)
+        ]
+        self.start_patchers(*patchers)
+
+    def test_every_stage_is_timed_per_vendor_and_station(self):
+        StatusManager(self.test_data).check_current_session_data_and_push(MagicMock())
+        for stage in (STATUS_CALL, DB_READ, TIME_CALCULATION, DECISION, DB_WRITE, SOCKET_PUSH):
+            durations = self.sink.durations(stage, vendor_id="electrolite", station_id="100")
+            self.assertEqual(len(durations), 1, stage)
+            self.assertGreaterEqual(durations[0], 0)
+        self.assertEqual(self.sink.durations(STATUS_CALL, vendor_id="another vendor"), [])
+
+    def test_percentiles_per_vendor(self):
+        for duration in range(1, 101):
+            self.sink.record(STATUS_CALL, duration, {"vendor_id": "slow", "station_id": "1"})
+        self.sink.record(STATUS_CALL, 1, {"vendor_id": "fast", "station_id": "1"})
+        self.assertEqual(self.sink.percentile(STATUS_CALL, 0.99, vendor_id="slow"), 99)
+        self.assertEqual(self.sink.percentile(STATUS_CALL, 0.99, vendor_id="fast"), 1)
+
+    def test_lambda_handler_flushes_the_sink(self):
+        with patch.object(self.sink, "flush") as flush, patch("lambda_handler.get_socket_client"):
+            lambda_handler.lambda_handler(self.test_data, None)
+        flush.assert_called_once()
+
+
+class TestMetricSinks(TestCase):
+    def test_emf_lines(self):
+        stream = io.StringIO()
+        sink = EmfSink("ChargingSessionMonitor", stream)
+        dimensions = {"vendor_id": "electrolite", "station_id": "100"}
+        sink.record(STATUS_CALL, 120.5, dimensions)
+        sink.record(STATUS_CALL, 80, dimensions)
+        sink.record(DB_READ, 12, dimensions)
+        sink.flush()
+        line = json.loads(stream.getvalue())
+        self.assertEqual(line["_aws"]["CloudWatchMetrics"], [{
+            "Namespace": "ChargingSessionMonitor", "Dimensions": [["station_id", "vendor_id"]],
+            "Metrics": [{"Name": STATUS_CALL, "Unit": "Milliseconds"}, {"Name": DB_READ, "Unit": "Milliseconds"}]}])
+        self.assertEqual(line[STATUS_CALL], [120.5, 80])
+        self.assertEqual(line["vendor_id"], "electrolite")
+        sink.flush()
+        self.assertEqual(len(stream.getvalue().splitlines()), 1)
+
+    def test_emf_lines_hold_at_most_100_values_per_metric(self):
+        stream = io.StringIO()
+        sink = EmfSink("ChargingSessionMonitor", stream)
+        dimensions = {"vendor_id": "electrolite", "station_id": "100"}
+        for duration in range(250):
+            sink.record(STATUS_CALL, duration, dimensions)
+        sink.record(DB_READ, 12, dimensions)
+        sink.flush()
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([len(line[STATUS_CALL]) for line in lines], [100, 100, 50])
+        self.assertEqual([line[STATUS_CALL][0] for line in lines], [0, 100, 200])
+        self.assertEqual([DB_READ in line for line in lines], [True, False, False])
+        self.assertEqual([[metric["Name"] for metric in line["_aws"]["CloudWatchMetrics"][0]["Metrics"]]
+                          for line in lines], [[STATUS_CALL, DB_READ], [STATUS_CALL], [STATUS_CALL]])
+
+    def test_disabled_metrics_do_not_time_anything(self):
+        sink = NoOpSink()
+        with patch.object(metrics, "_metrics_sink", sink), patch.object(sink, "record") as record:
+            self.assertIs(stage_timer(STATUS_CALL, {}), stage_timer(DB_READ, {}))
+            with stage_timer(STATUS_CALL, {}):
+                pass
+        record.assert_not_called()
+
+    def test_sink_is_chosen_by_setting(self):
+        with patch.object(metrics, "_metrics_sink", None), patch.object(metrics.settings, "METRICS_SINK", "emf"):
+            self.assertIsInstance(metrics.get_metrics_sink(), EmfSink)
@@ -0,0 +1,105 @@
+import datetime
+from unittest.mock import patch, MagicMock
+import lambda_handler
+from app import next_check
+from app.next_check import next_check_delay
+from app.status_manager import StatusManager
+from app.time_calculations import PrepareTimeDataForCurrentState
+from data_store.data_schemas import CollectiveDataForCurrentState
+from data_store.data_structure import ChargingStatus
+from logger_init import get_logger
+from tests.helpers import SessionTestCase
+
+logger = get_logger(__name__)
+
+NOW = datetime.datetime(2023, 1, 1, 10, 0, 0)
+
+
+class TestNextCheckDelay(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        patchers = [patch.object(next_check.settings, "NEXT_CHECK_MIN_SECONDS", 10),
+                    patch.object(next_check.settings, "NEXT_CHECK_MAX_SECONDS", 300),
+                    patch.object(next_check.settings, "NEXT_CHECK_BOOKED_MAX_SECONDS", 300),
+                    patch.object(next_check.settings, "NEXT_CHECK_DEFAULT_SECONDS", 30),
+                    patch.object(next_check.settings, "NEXT_CHECK_REMAINING_SHARE", 0.5),
+                    patch.object(next_check.settings, "INITIAL_TIMEOUT_MINUTES", datetime.timedelta(minutes=5))]
+        self.start_patchers(*patchers)
+
+    def delay(self, current_status, started_ago=None, booked_ago=datetime.timedelta(minutes=1),
+              target_duration_timestamp=None, target_energy_kw=None, current_energy_consumed=0):
+        session_data = dict(self.test_data, current_status=current_status,
+                            current_energy_consumed=current_energy_consumed,
+                            booking_time=str(NOW - booked_ago),
+                            start_time=str(NOW - started_ago) if started_ago is not None else None)
+        collective_data = CollectiveDataForCurrentState(
+            booking_id=session_data["booking_id"], station_id=session_data["station_id"],
+            vendor_id=session_data["vendor_id"], charger_point_id=session_data["charger_point_id"],
+            connector_point_id=session_data["connector_point_id"],
+            target_duration_timestamp=target_duration_timestamp, target_energy_kw=target_energy_kw,
+            start_time=session_data["start_time"], session_data=session_data)
+        time_related_data = PrepareTimeDataForCurrentState.construct(collective_data_for_current_state=collective_data)
+        time_related_data.calculate_time_related_data(NOW)
+        return next_check_delay(current_status, collective_data, time_related_data)
+
+    def test_final_status_is_not_checked_again(self):
+        self.assertIsNone(self.delay(ChargingStatus.COMPLETED.value, datetime.timedelta(minutes=10),
+                                     target_duration_timestamp="00:10:00"))
+
+    def test_time_based_session_follows_the_time_left(self):
+        self.assertEqual(self.delay(ChargingStatus.IN_PROGRESS.value, datetime.timedelta(minutes=10),
+                                    target_duration_timestamp="00:50:00"), 300)
+        self.assertEqual(self.delay(ChargingStatus.IN_PROGRESS.value, datetime.timedelta(minutes=8),
+                                    target_duration_timestamp="00:10:00"), 60)
+        self.assertEqual(self.delay(ChargingStatus.IN_PROGRESS.value, datetime.timedelta(seconds=590),
+                                    target_duration_timestamp="00:10:00"), 10)
+
+    def test_booked_session_follows_the_booking_timeout(self):
+        self.assertEqual(self.delay(ChargingStatus.BOOKED.value), 120)
+        self.assertEqual(self.delay(ChargingStatus.BOOKED.value, booked_ago=datetime.timedelta(minutes=6)), 10)
+
+    def test_booked_session_is_checked_often_enough_to_notice_its_start(self):
+        with patch.object(next_check.settings, "NEXT_CHECK_BOOKED_MAX_SECONDS", 30):
+            self.assertEqual(self.delay(ChargingStatus.BOOKED.value), 30)
+            self.assertEqual(self.delay(ChargingStatus.BOOKED.value, booked_ago=datetime.timedelta(minutes=6)), 10)
+
+    def test_energy_based_session_follows_the_average_rate(self):
+        # 10 consumed in 10 minutes, 30 more take 30 minutes
+        self.assertEqual(self.delay(ChargingStatus.IN_PROGRESS.value, datetime.timedelta(minutes=10),
+                                    target_energy_kw=40, current_energy_consumed=10), 300)
+        self.assertEqual(self.delay(ChargingStatus.IN_PROGRESS.value, datetime.timedelta(minutes=10),
+                                    target_energy_kw=11, current_energy_consumed=10), 30)
+
+    def test_unknown_rate_uses_the_default_delay(self):
+        self.assertEqual(self.delay(ChargingStatus.IN_PROGRESS.value, datetime.timedelta(minutes=1),
+                                    target_energy_kw=40), 30)
+
+
+class TestLambdaHandlerNextCheckDelay(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.start_session(datetime.timedelta(minutes=2), current_status=ChargingStatus.STARTED.value,
+                           expanded_vehicle_data={"power_capacity": "30"})
+        patchers = [patch("app.status_manager.call_api", return_value={}),
+                    patch.object(StatusManager, "get_current_booking_session_data", lambda *args: self.test_data),
+                    patch.object(StatusManager, "set_current_booking_session_data", lambda *args: None),
+                    patch("lambda_handler.get_socket_client", return_value=MagicMock())]
+        self.start_patchers(*patchers)
+
+    def test_status_alone_by_default(self):
+        with patch.object(lambda_handler.settings, "RETURN_NEXT_CHECK_DELAY", False):
+            self.assertEqual(lambda_handler.lambda_handler(self.test_data, None), ChargingStatus.IN_PROGRESS.value)
+
+    def test_status_with_next_check_delay(self):
+        with patch.object(lambda_handler.settings, "RETURN_NEXT_CHECK_DELAY", True):
+            response = lambda_handler.lambda_handler(self.test_data, None)
+        self.assertEqual(response["current_status"], ChargingStatus.IN_PROGRESS.value)
+        # 8 of the 10 minutes are left
+        self.assertAlmostEqual(response["next_check_delay_seconds"], next_check.delay_for_remaining(8 * 60), delta=1)
+
+    def test_failed_check_has_no_delay(self):
+        del self.test_data["expanded_vehicle_data"]
+        with patch.object(lambda_handler.settings, "RETURN_NEXT_CHECK_DELAY", True):
+            response = lambda_handler.lambda_handler(self.test_data, None)
+        self.assertEqual(response, {"current_status": ChargingStatus.TERMINATED.value,
+                                    "next_check_delay_seconds": None})
@@ -0,0 +1,112 @@
+import datetime
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+from app import metrics, rate_limit, resilience, status_batch
+from app.metrics import InMemorySink, RATE_LIMIT_WAIT
+from app.rate_limit import TokenBucket, acquire_vendor_token, get_rate_limiter, parse_vendor_limits, STATUS_DEFERRED
+from app.status_batch import refresh_statuses
+from app.status_manager import StatusManager
+from data_store.data_structure import ChargingStatus
+from logger_init import get_logger
+from tests.helpers import SessionTestCase
+
+logger = get_logger(__name__)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket(TestCase):
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=2, burst=3, clock=self.clock)
+        self.assertEqual([bucket.reserve(0) for _ in range(4)], [0, 0, 0, None])
+        self.clock.now += 0.5
+        self.assertEqual(bucket.reserve(0), 0)
+        self.assertIsNone(bucket.reserve(0))
+
+    def test_waiting_callers_reserve_tokens_in_turn(self):
+        bucket = TokenBucket(rate=2, burst=1, clock=self.clock)
+        self.assertEqual(bucket.reserve(1), 0)
+        self.assertEqual(bucket.reserve(1), 0.5)
+        self.assertEqual(bucket.reserve(1), 1.0)
+        # Nobody queues for longer than they are willing to wait
+        self.assertIsNone(bucket.reserve(1))
+
+    def test_tokens_do_not_pile_up_beyond_burst(self):
+        bucket = TokenBucket(rate=10, burst=2, clock=self.clock)
+        self.clock.now += 60
+        self.assertEqual([bucket.reserve(0) for _ in range(3)], [0, 0, None])
+
+    def test_parse_vendor_limits(self):
+        with patch.object(rate_limit.settings, "VENDOR_RATE_LIMIT_BURST", 10):
+            self.assertEqual(parse_vendor_limits("electrolite=5:20, statiq=0.5"),
+                             {"electrolite": (5.0, 20), "statiq": (0.5, 10)})
+
+
+class TestVendorRateLimit(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.start_session(datetime.timedelta(minutes=2), current_status=ChargingStatus.STARTED.value,
+                           expanded_vehicle_data={"power_capacity": "30"})
+        self.sink = InMemorySink()
+        self.http_session = MagicMock()
+        self.http_session.post.return_value = MagicMock(status_code=200, json=lambda: {})
+        patchers = [patch.object(rate_limit, "_rate_limiters", {}),
+                    patch.object(rate_limit.settings, "VENDOR_RATE_LIMIT_PER_SECOND", 0),
+                    patch.object(rate_limit.settings, "VENDOR_RATE_LIMITS", "electrolite=1:2"),
+                    patch.object(rate_limit.settings, "VENDOR_RATE_LIMIT_MAX_WAIT_SECONDS", 0.2),
+                    patch.object(metrics, "_metrics_sink", self.sink),
+                    patch.object(rate_limit.settings, "VENDOR_RATE_LIMIT_CONTAINERS", 1),
+                    patch("app.api_caller.get_http_session", return_value=self.http_session),
+                    patch.object(StatusManager, "get_current_booking_session_data", lambda *args: self.test_data),
+                    patch.object(StatusManager, "set_current_booking_session_data", lambda *args: None)]
+        self.start_patchers(*patchers)
+
+    def test_vendor_without_limit_is_not_limited(self):
+        self.assertIsNone(get_rate_limiter("statiq"))
+        self.assertTrue(all(acquire_vendor_token("statiq") for _ in range(100)))
+        self.assertEqual(self.sink.durations(RATE_LIMIT_WAIT), [])
+
+    def test_saturated_vendor_is_deferred_and_waits_are_measured(self):
+        self.assertEqual([acquire_vendor_token("electrolite") for _ in range(3)], [True, True, False])
+        durations = self.sink.durations(RATE_LIMIT_WAIT, vendor_id="electrolite")
+        self.assertEqual(len(durations), 3)
+        self.assertTrue(all(duration < 100 for duration in durations))
+
+    def test_check_continues_with_last_known_data_when_deferred(self):
+        reports = [StatusManager(self.test_data).check_current_session_data_and_push(MagicMock())
+                   for _ in range(3)]
+        self.assertEqual(self.http_session.post.call_count, 2)
+        self.assertEqual([report.status_deferred for report in reports], [False, False, True])
+        self.assertEqual(reports[2].current_status, ChargingStatus.IN_PROGRESS.value)
+
+    def test_every_retry_takes_a_token(self):
+        self.http_session.post.return_value = MagicMock(status_code=429)
+        with patch.object(resilience.settings, "RETRY_MAX_ATTEMPTS", 5), \
+                patch.object(resilience.settings, "RETRY_BASE_DELAY_SECONDS", 0), \
+                patch.object(resilience, "_circuit_breakers", {}):
+            report = StatusManager(self.test_data).check_current_session_data_and_push(MagicMock())
+        self.assertEqual(self.http_session.post.call_count, 2)
+        self.assertTrue(report.status_deferred)
+
+    def test_deferral_of_refresh_statuses_is_reported(self):
+        with patch.object(status_batch.settings, "STATUS_BATCH_VENDORS", ""):
+            responses = refresh_statuses([dict(self.test_data, booking_id=f"booking-{index}") for index in range(3)])
+        self.assertEqual(list(responses.values()), [{}, {}, STATUS_DEFERRED])
+        report = StatusManager(self.test_data, status_response=STATUS_DEFERRED) \
+            .check_current_session_data_and_push(MagicMock())
+        self.assertTrue(report.status_deferred)
+
+    def test_limit_is_shared_by_the_containers(self):
+        with patch.object(rate_limit.settings, "VENDOR_RATE_LIMITS", "electrolite=10:20"), \
+                patch.object(rate_limit.settings, "VENDOR_RATE_LIMIT_CONTAINERS", 4):
+            rate_limiter = get_rate_limiter("electrolite")
+        self.assertEqual((rate_limiter.rate, rate_limiter.burst), (2.5, 5))
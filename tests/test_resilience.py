@@ -0,0 +1,174 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+from botocore.exceptions import ClientError
+from app.api_caller import call_api
+import lambda_handler
+from app.resilience import RetryPolicy, CircuitBreaker, get_circuit_breaker, circuit_breaker_states, settings, \
+    vendor_circuit, CLOSED, OPEN, HALF_OPEN
+from app.status_manager import StatusManager, SocketCommunicator
+from exceptions.exception import DbFetchException
+from logger_init import get_logger
+from tests.helpers import SessionTestCase
+
+logger = get_logger(__name__)
+
+# Other test modules replace this on the class without restoring it, the original is kept here
+get_current_booking_session_data = StatusManager.get_current_booking_session_data
+
+
+class FaultInjectingHandler(BaseHTTPRequestHandler):
+    """Answers with the next fault of the server: error, bad_request, drop or slow. Answers normally without one"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.server.lock:
+            self.server.requests += 1
+            fault = self.server.faults.pop(0) if self.server.faults else None
+        if fault == "drop":
+            self.close_connection = True
+            return
+        if fault == "slow":
+            time.sleep(1)
+        status = {"error": 503, "bad_request": 400}.get(fault, 200)
+        body = json.dumps(self.server.answer).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestRetryAndCircuitBreaker(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FaultInjectingHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.requests = 0
+        self.server.faults = []
+        self.server.answer = self.test_data
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/db"
+        self.status_manager = StatusManager.__new__(StatusManager)
+        self.status_manager.deadline = None
+
+    def read_session_table(self):
+        return get_current_booking_session_data(self.status_manager, self.url, self.test_data["booking_id"],
+                                                self.test_data["vendor_id"])
+
+    def test_transient_errors_are_retried(self):
+        self.server.faults = ["error", "drop"]
+        self.assertEqual(self.read_session_table(), self.test_data)
+        self.assertEqual(self.server.requests, 3)
+
+    def test_status_call_continues_when_retries_are_used_up(self):
+        self.server.faults = ["error"] * 3
+        self.assertEqual(call_api(self.url, body={}), {})
+        self.assertEqual(self.server.requests, 3)
+
+    def test_client_errors_are_not_retried(self):
+        self.server.faults = ["bad_request"]
+        self.server.answer = {"message": "bad request"}
+        self.assertEqual(call_api(self.url, body={}), {"message": "bad request"})
+        self.assertEqual(self.server.requests, 1)
+
+    def test_hedged_read_cuts_the_slow_request(self):
+        self.server.faults = ["slow"]
+        started = time.monotonic()
+        with patch.object(settings, "HEDGE_READS", True), patch.object(settings, "HEDGE_DELAY_SECONDS", 0.1):
+            self.assertEqual(self.read_session_table(), self.test_data)
+        self.assertLess(time.monotonic() - started, 0.6)
+        self.assertEqual(self.server.requests, 2)
+
+    def test_open_circuit_fails_fast(self):
+        self.server.faults = ["error"] * 6
+        with self.assertRaises(DbFetchException):
+            self.read_session_table()
+        with self.assertRaises(DbFetchException):
+            self.read_session_table()
+        self.assertEqual(circuit_breaker_states()[self.url]["state"], OPEN)
+        requests_before = self.server.requests
+        with self.assertRaises(DbFetchException):
+            self.read_session_table()
+        self.assertEqual(self.server.requests, requests_before)
+
+    def test_open_db_circuit_keeps_the_session_status(self):
+        circuit_breaker = get_circuit_breaker(self.url)
+        for _ in range(circuit_breaker.failure_threshold):
+            circuit_breaker.record_failure()
+        self.addCleanup(circuit_breaker.record_success)
+        self.test_data.update(current_status="IN_PROGRESS", expanded_vehicle_data={"power_capacity": "30"})
+        with patch.object(StatusManager, "get_current_booking_session_data", get_current_booking_session_data), \
+                patch.object(lambda_handler.settings, "DB_API", self.url), \
+                patch("app.status_manager.call_api", return_value={}):
+            self.assertEqual(lambda_handler.lambda_handler(self.test_data, None), "IN_PROGRESS")
+            result = lambda_handler.monitor_batch_item(self.test_data, MagicMock())
+        self.assertEqual(result.current_status, "IN_PROGRESS")
+        self.assertEqual(result.next_check_delay_seconds, settings.NEXT_CHECK_DEFAULT_SECONDS)
+        self.assertEqual(self.server.requests, 0)
+
+    def test_status_circuit_is_kept_per_vendor(self):
+        self.server.faults = ["error"] * settings.CIRCUIT_FAILURE_THRESHOLD
+        for _ in range(2):
+            call_api(self.url, body={}, circuit=vendor_circuit(self.url, "failing-vendor"))
+        self.assertEqual(circuit_breaker_states()[vendor_circuit(self.url, "failing-vendor")]["state"], OPEN)
+        self.assertEqual(call_api(self.url, body={}, circuit=vendor_circuit(self.url, "other-vendor")),
+                         self.test_data)
+
+    def test_circuit_closes_after_a_successful_trial(self):
+        circuit_breaker = get_circuit_breaker(self.url)
+        circuit_breaker.reset_timeout = 0.1
+        for _ in range(circuit_breaker.failure_threshold):
+            circuit_breaker.record_failure()
+        self.assertEqual(circuit_breaker.state, OPEN)
+        time.sleep(0.15)
+        self.assertEqual(self.read_session_table(), self.test_data)
+        self.assertEqual(circuit_breaker.state, CLOSED)
+
+
+class TestCircuitBreakerStates(TestCase):
+    def test_only_one_trial_request_when_half_open(self):
+        circuit_breaker = CircuitBreaker("endpoint", failure_threshold=1, reset_timeout=0)
+        circuit_breaker.record_failure()
+        self.assertTrue(circuit_breaker.allow_request())
+        self.assertEqual(circuit_breaker.state, HALF_OPEN)
+        self.assertFalse(circuit_breaker.allow_request())
+        circuit_breaker.record_failure()
+        self.assertEqual(circuit_breaker.state, OPEN)
+
+    def test_backoff_is_jittered_and_bounded(self):
+        policy = RetryPolicy(attempts=10, base_delay=0.1, max_delay=0.5)
+        delays = [policy.backoff(attempt) for attempt in range(1, 10) for _ in range(20)]
+        self.assertTrue(all(0 <= delay <= 0.5 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+
+class TestSocketRetries(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.test_data["current_status"] = "IN_PROGRESS"
+        self.socket_client = MagicMock()
+
+    def test_throttled_post_is_retried(self):
+        self.socket_client.post_to_connection.side_effect = [
+            ClientError({"Error": {"Code": "LimitExceededException"}}, "PostToConnection"), None]
+        report = SocketCommunicator(self.socket_client, self.test_data).send_message_to_socket()
+        self.assertEqual(report.delivered, [self.test_data["socket_connection_id"]])
+        self.assertEqual(self.socket_client.post_to_connection.call_count, 2)
+
+    def test_gone_connection_is_not_retried(self):
+        self.socket_client.post_to_connection.side_effect = ClientError({"Error": {"Code": "GoneException"}},
+                                                                        "PostToConnection")
+        report = SocketCommunicator(self.socket_client, self.test_data).send_message_to_socket()
+        self.assertEqual(report.gone, [self.test_data["socket_connection_id"]])
+        self.assertEqual(self.socket_client.post_to_connection.call_count, 1)
@@ -0,0 +1,161 @@
+import threading
+import time
+import simplejson
+from app.scheduler import SessionScheduler, add_events_from
+from data_store.data_schemas import BatchSessionResult
+from data_store.data_structure import ChargingStatus
+from logger_init import get_logger
+from tests.helpers import SessionTestCase
+
+logger = get_logger(__name__)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSessionScheduler(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.clock = FakeClock()
+        self.polled = []
+        self.statuses = {}
+        self.lock = threading.Lock()
+
+    def event(self, booking_id):
+        return dict(self.test_data, booking_id=booking_id)
+
+    def poll(self, event):
+        with self.lock:
+            self.polled.append(event["booking_id"])
+            statuses = self.statuses.get(event["booking_id"], [])
+            status = statuses.pop(0) if statuses else ChargingStatus.IN_PROGRESS.value
+        if isinstance(status, Exception):
+            return BatchSessionResult(booking_id=event["booking_id"], vendor_id=event["vendor_id"],
+                                      current_status=ChargingStatus.TERMINATED.value, error=repr(status))
+        return BatchSessionResult(booking_id=event["booking_id"], vendor_id=event["vendor_id"], current_status=status)
+
+    def scheduler(self, **kwargs):
+        scheduler = SessionScheduler(poll=self.poll, poll_interval=30, clock=self.clock, **kwargs)
+        self.addCleanup(scheduler.shutdown)
+        return scheduler
+
+    def run_due(self, scheduler):
+        submitted = scheduler.run_due()
+        while scheduler._in_flight:
+            time.sleep(0.01)
+        return submitted
+
+    def test_sessions_run_in_due_order(self):
+        scheduler = self.scheduler(max_workers=1)
+        scheduler.add(self.event("late"), delay=20)
+        scheduler.add(self.event("early"), delay=5)
+        scheduler.add(self.event("now"))
+        self.assertEqual(self.run_due(scheduler), 1)
+        self.clock.now += 10
+        self.run_due(scheduler)
+        self.clock.now += 10
+        self.run_due(scheduler)
+        self.assertEqual(self.polled, ["now", "early", "late"])
+
+    def test_session_is_polled_again_after_the_interval(self):
+        scheduler = self.scheduler()
+        scheduler.add(self.event("a"))
+        self.run_due(scheduler)
+        self.clock.now += 29
+        self.assertEqual(self.run_due(scheduler), 0)
+        self.clock.now += 1
+        self.assertEqual(self.run_due(scheduler), 1)
+
+    def test_next_check_delay_of_the_result_is_used(self):
+        def poll(event):
+            self.polled.append(event["booking_id"])
+            return BatchSessionResult(booking_id=event["booking_id"], vendor_id=event["vendor_id"],
+                                      current_status=ChargingStatus.IN_PROGRESS.value, next_check_delay_seconds=120)
+
+        scheduler = SessionScheduler(poll=poll, poll_interval=30, clock=self.clock)
+        self.addCleanup(scheduler.shutdown)
+        scheduler.add(self.event("a"))
+        self.run_due(scheduler)
+        self.clock.now += 119
+        self.assertEqual(self.run_due(scheduler), 0)
+        self.clock.now += 1
+        self.assertEqual(self.run_due(scheduler), 1)
+
+    def test_final_status_drops_the_session(self):
+        self.statuses["a"] = [ChargingStatus.IN_PROGRESS.value, ChargingStatus.COMPLETED.value]
+        scheduler = self.scheduler()
+        scheduler.add(self.event("a"))
+        self.run_due(scheduler)
+        self.clock.now += 30
+        self.run_due(scheduler)
+        self.assertEqual(len(scheduler), 0)
+        self.assertEqual(scheduler.stats.finished, {ChargingStatus.COMPLETED.value: 1})
+        self.clock.now += 30
+        self.assertEqual(self.run_due(scheduler), 0)
+
+    def test_repeated_failures_drop_the_session(self):
+        self.statuses["a"] = [RuntimeError("db down")] * 3
+        scheduler = self.scheduler()
+        scheduler.add(self.event("a"))
+        for _ in range(3):
+            self.assertEqual(len(scheduler), 1)
+            self.run_due(scheduler)
+            self.clock.now += 30
+        self.assertEqual(len(scheduler), 0)
+        self.assertEqual(scheduler.stats.failures, 3)
+
+    def test_workers_are_bounded(self):
+        running, most_running = [0], [0]
+        release = threading.Event()
+
+        def slow_poll(event):
+            with self.lock:
+                running[0] += 1
+                most_running[0] = max(most_running[0], running[0])
+            release.wait(1)
+            with self.lock:
+                running[0] -= 1
+            return self.poll(event)
+
+        scheduler = SessionScheduler(poll=slow_poll, poll_interval=30, max_workers=2, clock=self.clock)
+        self.addCleanup(scheduler.shutdown)
+        for index in range(5):
+            scheduler.add(self.event(str(index)))
+        self.assertEqual(scheduler.run_due(), 2)
+        self.assertEqual(scheduler.run_due(), 0)
+        release.set()
+        while scheduler._in_flight:
+            time.sleep(0.01)
+        self.assertEqual(scheduler.run_due(), 2)
+        self.assertLessEqual(most_running[0], 2)
+
+    def test_run_forever_until_stopped(self):
+        self.statuses["a"] = [ChargingStatus.COMPLETED.value]
+        scheduler = SessionScheduler(poll=self.poll, poll_interval=0.01)
+        self.addCleanup(scheduler.shutdown)
+        stop = threading.Event()
+        thread = threading.Thread(target=scheduler.run_forever, args=(stop, 0.05))
+        thread.start()
+        scheduler.add(self.event("a"))
+        scheduler.add(self.event("b"))
+        deadline = time.monotonic() + 2
+        while len(scheduler) and time.monotonic() < deadline:
+            if self.polled.count("b") >= 3:
+                scheduler.remove("b", self.test_data["vendor_id"])
+            time.sleep(0.01)
+        stop.set()
+        thread.join(1)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(scheduler), 0)
+
+    def test_events_arriving_while_running_are_added(self):
+        scheduler = self.scheduler()
+        events = ["", simplejson.dumps(self.event("a")), "not json", simplejson.dumps({"booking_id": "no vendor"}),
+                  simplejson.dumps(self.event("b"))]
+        add_events_from(scheduler, iter(events))
+        self.assertEqual(sorted(booking_id for booking_id, _ in scheduler.sessions), ["a", "b"])
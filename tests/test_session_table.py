@@ -0,0 +1,160 @@
+import copy
+import datetime
+from unittest.mock import patch, MagicMock
+import lambda_handler
+from app import resilience
+from app.bulk_status_manager import monitor_sessions_bulk
+from tools.load_harness import StubServices
+from app.session_table import HttpSessionTableClient, InMemorySessionTableClient, coalesce_updates
+from data_store.data_schemas import DataToUpdateInSessionTable
+from data_store.data_structure import ChargingStatus
+from exceptions.exception import DbFetchException
+from logger_init import get_logger
+from tests.helpers import SessionTestCase
+
+logger = get_logger(__name__)
+
+
+def session_update(booking_id, **data_to_update):
+    return DataToUpdateInSessionTable(update_table=True, table_name="ChargingSessionRecords",
+                                      primary_key={"booking_id": booking_id}, sort_key={"vendor_id": "electrolite"},
+                                      data_to_update=data_to_update)
+
+
+class TestSessionTableClient(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.items = [dict(self.test_data, booking_id=f"booking-{index}") for index in range(60)]
+        self.keys = [(item["booking_id"], item["vendor_id"]) for item in self.items]
+        patcher = patch.object(resilience.settings, "RETRY_BASE_DELAY_SECONDS", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_in_batches(self):
+        client = InMemorySessionTableClient(self.items, batch_size=25)
+        items, unprocessed = client.batch_read(self.keys + [("missing", "electrolite")])
+        self.assertEqual(set(items), set(self.keys))
+        self.assertEqual(unprocessed, [])
+        self.assertEqual(client.read_requests, 3)
+
+    def test_unprocessed_keys_are_read_again(self):
+        client = InMemorySessionTableClient(self.items, max_items_per_request=10, batch_size=25, max_rounds=3)
+        items, unprocessed = client.batch_read(self.keys[:25])
+        self.assertEqual((len(items), unprocessed), (25, []))
+        self.assertEqual(client.read_requests, 3)
+
+    def test_keys_still_unprocessed_after_the_last_round_are_returned_apart(self):
+        client = InMemorySessionTableClient(self.items, max_items_per_request=10, batch_size=25, max_rounds=2)
+        items, unprocessed = client.batch_read(self.keys[:25])
+        self.assertEqual(set(items), set(self.keys[:20]))
+        self.assertEqual(unprocessed, self.keys[20:25])
+
+    def test_writes_in_batches_and_returns_the_failed_updates(self):
+        client = InMemorySessionTableClient(self.items, max_items_per_request=20, batch_size=25, max_rounds=1)
+        failed = client.batch_write([session_update(booking_id, current_status="IN_PROGRESS")
+                                     for booking_id, _ in self.keys[:30]])
+        self.assertEqual(client.write_requests, 2)
+        self.assertEqual([update.primary_key["booking_id"] for update in failed],
+                         [booking_id for booking_id, _ in self.keys[20:25]])
+        self.assertEqual(client.items[self.keys[0]]["current_status"], "IN_PROGRESS")
+        self.assertEqual(client.items[self.keys[20]]["current_status"], self.test_data["current_status"])
+
+    def test_updates_of_one_session_are_coalesced(self):
+        coalesced = coalesce_updates([session_update("a", current_status="STARTED", current_energy_consumed=1),
+                                      session_update("b", current_status="BOOKED"),
+                                      session_update("a", current_status="IN_PROGRESS")])
+        self.assertEqual([update.data_to_update for update in coalesced],
+                         [{"current_status": "IN_PROGRESS", "current_energy_consumed": 1},
+                          {"current_status": "BOOKED"}])
+
+    def test_http_client_against_the_stub_db(self):
+        stubs = StubServices().start()
+        self.addCleanup(stubs.stop)
+        for item in self.items:
+            stubs.store.put(item)
+        client = HttpSessionTableClient(stubs.url("/db"), batch_size=25, bulk_io=True)
+        self.assertEqual(len(client.batch_read(self.keys)[0]), 60)
+        self.assertEqual(client.batch_write([session_update("booking-1", current_status="IN_PROGRESS")]), [])
+        self.assertEqual(stubs.store.read("booking-1", "electrolite")["current_status"], "IN_PROGRESS")
+        self.assertEqual(stubs.stats["/db"].requests, 4)
+
+    def test_http_client_without_bulk_io_writes_one_session_per_request(self):
+        stubs = StubServices().start()
+        self.addCleanup(stubs.stop)
+        for item in self.items:
+            stubs.store.put(item)
+        client = HttpSessionTableClient(stubs.url("/db"), bulk_io=False)
+        updates = [session_update(f"booking-{index}", current_status="IN_PROGRESS") for index in range(3)]
+        self.assertEqual(client.batch_write(updates), [])
+        self.assertEqual(stubs.store.read("booking-2", "electrolite")["current_status"], "IN_PROGRESS")
+        self.assertEqual(stubs.stats["/db"].requests, 3)
+
+    def test_batch_answer_without_unprocessed_entries_fails_the_batch(self):
+        client = HttpSessionTableClient("http://db", bulk_io=True)
+        updates = [session_update("booking-1", current_status="IN_PROGRESS")]
+        with patch.object(client, "post", return_value={"message": "updated"}):
+            self.assertEqual(client.batch_write(updates), updates)
+            with self.assertRaises(DbFetchException):
+                client.batch_read(self.keys[:1])
+
+
+class TestMonitorSessionsBulk(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.start_session(datetime.timedelta(minutes=2), expanded_vehicle_data={"power_capacity": "30"})
+        self.sessions = []
+        for index in range(30):
+            session = copy.deepcopy(self.test_data)
+            session.update(booking_id=f"booking-{index}", current_status=ChargingStatus.STARTED.value)
+            self.sessions.append(session)
+        self.client = InMemorySessionTableClient(self.sessions, batch_size=25)
+        self.socket_client = MagicMock()
+        patcher = patch("app.status_manager.call_api", return_value={})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_table_is_read_and_written_in_batches(self):
+        results = monitor_sessions_bulk(self.sessions, self.socket_client, client=self.client)
+        self.assertEqual([result.booking_id for result in results],
+                         [session["booking_id"] for session in self.sessions])
+        self.assertTrue(all(result.current_status == ChargingStatus.IN_PROGRESS.value for result in results))
+        self.assertTrue(all(result.error is None and result.db_error is None for result in results))
+        self.assertEqual(self.client.read_requests, 2)
+        self.assertEqual(self.client.write_requests, 2)
+        self.assertEqual(self.client.items[("booking-0", "electrolite")]["current_status"],
+                         ChargingStatus.IN_PROGRESS.value)
+        self.assertEqual(self.socket_client.post_to_connection.call_count, 30)
+
+    def test_missing_session_and_failed_write_are_reported_per_session(self):
+        del self.client.items[("booking-1", "electrolite")]
+        original_write_chunk = self.client.write_chunk
+        self.client.write_chunk = lambda updates: original_write_chunk(updates) + \
+            [update for update in updates if update.primary_key["booking_id"] == "booking-2"]
+        results = monitor_sessions_bulk(self.sessions[:3], self.socket_client, client=self.client)
+        self.assertIsNone(results[0].error)
+        self.assertEqual(results[1].error, "Not able to fetch data from db")
+        self.assertEqual(results[1].current_status, ChargingStatus.TERMINATED.value)
+        self.assertEqual(results[2].db_error, "Not able to update data to db")
+
+    def test_throttled_read_keeps_the_session_status(self):
+        self.client.max_items_per_request = 1
+        self.client.max_rounds = 1
+        results = monitor_sessions_bulk(self.sessions[:3], self.socket_client, client=self.client)
+        self.assertEqual([result.current_status for result in results],
+                         [ChargingStatus.IN_PROGRESS.value, ChargingStatus.STARTED.value, ChargingStatus.STARTED.value])
+        self.assertIsNone(results[0].error)
+        self.assertTrue(all(result.error and result.next_check_delay_seconds for result in results[1:]))
+
+    def test_failed_batch_read_keeps_the_session_status(self):
+        with patch.object(self.client, "batch_read", side_effect=DbFetchException(code=500, message="db down")):
+            results = monitor_sessions_bulk(self.sessions[:2], self.socket_client, client=self.client)
+        self.assertEqual([result.current_status for result in results], [ChargingStatus.STARTED.value] * 2)
+        self.assertTrue(all(result.error and result.next_check_delay_seconds for result in results))
+
+    def test_batch_lambda_handler_in_bulk_mode(self):
+        with patch.object(lambda_handler.settings, "DB_BULK_IO", True), \
+                patch("app.bulk_status_manager.get_session_table_client", return_value=self.client), \
+                patch("lambda_handler.get_socket_client", return_value=self.socket_client):
+            results = lambda_handler.batch_lambda_handler({"sessions": self.sessions}, None)
+        self.assertEqual(len(results), 30)
+        self.assertEqual(self.client.read_requests, 2)
@@ -0,0 +1,44 @@
+import datetime
+from unittest.mock import patch, MagicMock
+from app.status_manager import StatusManager, SocketCommunicator
+from data_store.data_schemas import DataForLiveUpdate, DataToUpdateInSessionTable, LiveUpdateRecord
+from data_store.data_structure import ChargingStatus
+from logger_init import get_logger
+from tests.helpers import SessionTestCase
+
+logger = get_logger(__name__)
+
+
+class TestSinglePassPayloads(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.start_session(datetime.timedelta(minutes=2), current_status=ChargingStatus.STARTED.value,
+                           current_energy_consumed=12, expanded_vehicle_data={"power_capacity": "30"})
+        patchers = [
+            patch("app.status_manager.call_api", return_value={}),
+            patch.object(StatusManager, "get_current_booking_session_data", lambda *args: self.test_data)
+        ]
+        self.start_patchers(*patchers)
+
+    def test_live_update_record_matches_model(self):
+        record = LiveUpdateRecord.from_session_data(self.test_data)
+        model = DataForLiveUpdate.parse_obj(self.test_data)
+        self.assertEqual(record.dict(), model.dict())
+        self.assertEqual(record.json(), model.json())
+        self.assertFalse(hasattr(record, "__dict__"))
+
+    def test_db_and_socket_payloads_match_validated_models(self):
+        status_manager = StatusManager(self.test_data)
+        payload = status_manager.poller.check_current_charging_status()
+        validated_payload = DataToUpdateInSessionTable.parse_obj(payload.dict())
+        self.assertEqual(payload.dict(), validated_payload.dict())
+        self.assertEqual(payload.data_to_update["charging_states"], DataForLiveUpdate.parse_obj(self.test_data).dict())
+        socket_comm = SocketCommunicator(MagicMock(), status_manager.session_data, status_manager.live_update)
+        self.assertEqual(socket_comm.parsed_data_to_send_on_socket, DataForLiveUpdate.parse_obj(self.test_data).json())
+
+    def test_session_record_is_validated_once_per_poll(self):
+        with patch.object(DataForLiveUpdate, "parse_obj", side_effect=DataForLiveUpdate.parse_obj) as parse_obj:
+            status_manager = StatusManager(self.test_data)
+            status_manager.poller.check_current_charging_status()
+            SocketCommunicator(MagicMock(), status_manager.session_data, status_manager.live_update)
+        self.assertEqual(parse_obj.call_count, 1)
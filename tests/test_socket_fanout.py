@@ -0,0 +1,107 @@
+import threading
+import time
+from unittest.mock import patch, MagicMock
+import app
+from app.deadline import Deadline
+from app.status_manager import SocketCommunicator
+from botocore.exceptions import ClientError
+from exceptions.exception import SocketException
+from logger_init import get_logger
+from tests.helpers import SessionTestCase
+
+logger = get_logger(__name__)
+
+
+class GoneException(Exception):
+    pass
+
+
+class FakeSocketClient:
+    def __init__(self, gone=(), failing=()):
+        self.gone = set(gone)
+        self.failing = set(failing)
+        self.posted = []
+        self.threads = set()
+
+    def post_to_connection(self, ConnectionId, Data):
+        self.threads.add(threading.current_thread().name)
+        time.sleep(0.05)
+        if ConnectionId in self.gone:
+            raise GoneException()
+        if ConnectionId in self.failing:
+            raise ClientError({"Error": {"Code": "InternalServerError"}}, "PostToConnection")
+        self.posted.append((ConnectionId, Data))
+
+
+class TestSocketFanOut(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.test_data["current_status"] = "IN_PROGRESS"
+
+    def test_single_connection_id_is_still_supported(self):
+        client = FakeSocketClient()
+        report = SocketCommunicator(client, self.test_data).send_message_to_socket()
+        self.assertEqual(report.delivered, [self.test_data["socket_connection_id"]])
+        self.assertEqual(len(client.posted), 1)
+
+    def test_message_is_fanned_out_to_every_connection(self):
+        self.test_data["socket_connection_id"] = ["app", "web", "app"]
+        self.test_data["socket_connection_ids"] = ["kiosk"]
+        client = FakeSocketClient()
+        report = SocketCommunicator(client, self.test_data).send_message_to_socket()
+        self.assertEqual(sorted(report.delivered), ["app", "kiosk", "web"])
+        self.assertGreater(len(client.threads), 1)
+
+    def test_gone_connections_are_reported_for_pruning(self):
+        self.test_data["socket_connection_id"] = ["app", "web"]
+        client = FakeSocketClient(gone=["web"])
+        report = SocketCommunicator(client, self.test_data).send_message_to_socket()
+        self.assertEqual(report.delivered, ["app"])
+        self.assertEqual(report.gone, ["web"])
+
+    def test_gone_client_error_is_detected(self):
+        client = FakeSocketClient()
+        client.post_to_connection = lambda **kwargs: (_ for _ in ()).throw(
+            ClientError({"Error": {"Code": "GoneException"}}, "PostToConnection"))
+        report = SocketCommunicator(client, self.test_data).send_message_to_socket()
+        self.assertEqual(report.gone, [self.test_data["socket_connection_id"]])
+
+    def test_raises_when_no_connection_received_the_message(self):
+        self.test_data["socket_connection_id"] = ["app", "web"]
+        client = FakeSocketClient(gone=["web"], failing=["app"])
+        with self.assertRaises(SocketException) as raised:
+            SocketCommunicator(client, self.test_data).send_message_to_socket()
+        self.assertEqual(raised.exception.detail_error.gone, ["web"])
+
+    def test_missing_connection_id(self):
+        del self.test_data["socket_connection_id"]
+        with self.assertRaises(SocketException):
+            SocketCommunicator(FakeSocketClient(), self.test_data)
+
+    def test_socket_client_is_created_once(self):
+        with patch("app._socket_clients", {}), patch("boto3.client", side_effect=lambda *args, **kwargs: object()):
+            self.assertIs(app.get_socket_client(), app.get_socket_client())
+            self.assertIs(app.get_socket_client(0.6), app.get_socket_client(0.55))
+            self.assertIsNot(app.get_socket_client(0.6), app.get_socket_client())
+
+    def test_socket_timeout_follows_the_deadline(self):
+        self.assertEqual(app.socket_timeout_step(None), app.settings.SOCKET_PUSH_TIMEOUT_SECONDS)
+        self.assertEqual(app.socket_timeout_step(0.6), 0.5)
+        self.assertEqual(app.socket_timeout_step(0.01), app.settings.SOCKET_TIMEOUT_STEP_SECONDS)
+        self.assertEqual(app.socket_timeout_step(60), app.settings.SOCKET_PUSH_TIMEOUT_SECONDS)
+
+    def test_post_uses_the_client_of_the_socket_stage_timeout(self):
+        clients = {}
+
+        def make_client(*args, **kwargs):
+            client = MagicMock()
+            config = kwargs["config"]
+            self.assertEqual(config.retries, {"total_max_attempts": 1})
+            clients[round(config.connect_timeout + config.read_timeout, 6)] = client
+            return client
+
+        with patch("app._socket_clients", {}), patch("boto3.client", side_effect=make_client):
+            deadline = Deadline(remaining_ms=3500, reserve_ms=500)
+            SocketCommunicator(app.get_socket_client(), self.test_data, deadline=deadline).send_message_to_socket()
+        self.assertEqual(clients[0.5].post_to_connection.call_count, 1)
+        self.assertEqual(clients[app.settings.SOCKET_PUSH_TIMEOUT_SECONDS].post_to_connection.call_count, 0)
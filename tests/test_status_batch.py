@@ -0,0 +1,83 @@
+import copy
+from unittest.mock import patch, MagicMock
+import lambda_handler
+from app import metrics, status_batch
+from app.metrics import InMemorySink, STATUS_CALL
+from tools.load_harness import StubServices, STATUS_BATCH_PATH, STATUS_PATH
+from app.status_batch import refresh_statuses
+from app.status_manager import StatusManager
+from data_store.data_structure import ChargingStatus
+from logger_init import get_logger
+from tests.helpers import SessionTestCase
+
+logger = get_logger(__name__)
+
+ORIGINAL_GET_SESSION_DATA = StatusManager.get_current_booking_session_data
+ORIGINAL_SET_SESSION_DATA = StatusManager.set_current_booking_session_data
+
+
+class TestRefreshStatuses(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.test_data["expanded_vehicle_data"] = {"power_capacity": "30"}
+        self.stubs = StubServices(start_after_polls=0).start()
+        self.addCleanup(self.stubs.stop)
+        self.events = []
+        for vendor_id, count in (("electrolite", 30), ("statiq", 3)):
+            for index in range(count):
+                event = dict(copy.deepcopy(self.test_data), booking_id=f"{vendor_id}-{index}", vendor_id=vendor_id,
+                             current_status=ChargingStatus.BOOKED.value)
+                self.events.append(event)
+                self.stubs.store.put(event)
+        serving = self.stubs.serving_settings()
+        serving.__enter__()
+        self.addCleanup(serving.__exit__, None, None, None)
+        patchers = [patch.object(status_batch.settings, "STATUS_BATCH_VENDORS", "electrolite"),
+                    patch.object(status_batch.settings, "STATUS_BATCH_SIZE", 25)]
+        self.start_patchers(*patchers)
+
+    def test_bookings_of_a_batch_vendor_share_one_call(self):
+        responses = refresh_statuses(self.events)
+        self.assertEqual(len(responses), 33)
+        self.assertEqual(responses[("electrolite-0", "electrolite")], {"current_status": ChargingStatus.STARTED.value})
+        self.assertEqual(responses[("statiq-2", "statiq")], {"current_status": ChargingStatus.STARTED.value})
+        self.assertEqual(self.stubs.stats[STATUS_BATCH_PATH].requests, 2)
+        self.assertEqual(self.stubs.stats[STATUS_PATH].requests, 3)
+
+    def test_bookings_left_out_of_the_answer_are_called_one_by_one(self):
+        with patch.object(status_batch, "call_status_batch_api",
+                          lambda vendor_id, events, deadline: {"electrolite-0": {"current_status": "IN_PROGRESS"}}):
+            responses = refresh_statuses(self.events[:3])
+        self.assertEqual(responses[("electrolite-0", "electrolite")], {"current_status": "IN_PROGRESS"})
+        self.assertEqual(responses[("electrolite-1", "electrolite")], {"current_status": ChargingStatus.STARTED.value})
+        self.assertEqual(self.stubs.stats[STATUS_PATH].requests, 2)
+
+    def test_failed_batch_is_not_called_per_booking(self):
+        self.stubs.behaviours[STATUS_PATH].error_rate = 1.0
+        with patch.object(status_batch.settings, "RETRY_MAX_ATTEMPTS", 1):
+            responses = refresh_statuses(self.events[:3])
+        self.assertEqual(responses, {(event["booking_id"], "electrolite"): {} for event in self.events[:3]})
+        self.assertEqual(self.stubs.stats[STATUS_PATH].requests, 0)
+
+    def test_per_session_calls_without_batch_vendors(self):
+        with patch.object(status_batch.settings, "STATUS_BATCH_VENDORS", ""):
+            refresh_statuses(self.events[:3])
+        self.assertEqual(self.stubs.stats[STATUS_BATCH_PATH].requests, 0)
+        self.assertEqual(self.stubs.stats[STATUS_PATH].requests, 3)
+
+    def test_per_booking_calls_are_timed(self):
+        sink = InMemorySink()
+        with patch.object(metrics, "_metrics_sink", sink), \
+                patch.object(status_batch.settings, "STATUS_BATCH_VENDORS", ""):
+            refresh_statuses(self.events[:3])
+        self.assertEqual(len(sink.durations(STATUS_CALL, vendor_id="electrolite")), 3)
+
+    def test_batch_lambda_handler_refreshes_by_vendor(self):
+        with patch.object(StatusManager, "get_current_booking_session_data", ORIGINAL_GET_SESSION_DATA), \
+                patch.object(StatusManager, "set_current_booking_session_data", ORIGINAL_SET_SESSION_DATA), \
+                patch("lambda_handler.get_socket_client", return_value=MagicMock()):
+            results = lambda_handler.batch_lambda_handler(self.events[:30], None)
+        self.assertTrue(all(result["error"] is None for result in results))
+        self.assertEqual({result["current_status"] for result in results}, {ChargingStatus.IN_PROGRESS.value})
+        self.assertEqual(self.stubs.stats[STATUS_BATCH_PATH].requests, 2)
+        self.assertEqual(self.stubs.stats[STATUS_PATH].requests, 0)
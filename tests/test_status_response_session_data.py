@@ -0,0 +1,57 @@
+import copy
+import datetime
+from unittest.mock import patch, MagicMock
+from app import status_manager as status_manager_module
+from app.status_manager import StatusManager
+from data_store.data_structure import ChargingStatus
+from logger_init import get_logger
+from tests.helpers import SessionTestCase
+
+logger = get_logger(__name__)
+
+
+class TestStatusResponseAsSessionData(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.start_session(datetime.timedelta(minutes=2), current_status=ChargingStatus.STARTED.value,
+                           expanded_vehicle_data={"power_capacity": "30"})
+        self.db_read = MagicMock(return_value=copy.deepcopy(self.test_data))
+        patchers = [
+            patch.object(status_manager_module.settings, "USE_STATUS_RESPONSE_AS_SESSION_DATA", True),
+            patch.object(StatusManager, "get_current_booking_session_data", self.db_read)
+        ]
+        self.start_patchers(*patchers)
+
+    def test_complete_status_response_skips_db_read(self):
+        status_response = copy.deepcopy(self.test_data)
+        status_response["current_energy_consumed"] = 7
+        with patch("app.status_manager.call_api", return_value=status_response):
+            status_manager = StatusManager(self.test_data)
+        self.db_read.assert_not_called()
+        self.assertEqual(status_manager.session_data["current_energy_consumed"], 7)
+
+    def test_incomplete_status_response_falls_back_to_db(self):
+        status_response = copy.deepcopy(self.test_data)
+        del status_response["user_stopped"]
+        with patch("app.status_manager.call_api", return_value=status_response):
+            status_manager = StatusManager(self.test_data)
+        self.db_read.assert_called_once()
+        self.assertIs(status_manager.session_data, self.db_read.return_value)
+
+    def test_empty_status_response_falls_back_to_db(self):
+        with patch("app.status_manager.call_api", return_value={}):
+            StatusManager(self.test_data)
+        self.db_read.assert_called_once()
+
+    def test_status_response_of_other_booking_falls_back_to_db(self):
+        status_response = copy.deepcopy(self.test_data)
+        status_response["booking_id"] = "another-booking"
+        with patch("app.status_manager.call_api", return_value=status_response):
+            StatusManager(self.test_data)
+        self.db_read.assert_called_once()
+
+    def test_mode_disabled_always_reads_db(self):
+        with patch.object(status_manager_module.settings, "USE_STATUS_RESPONSE_AS_SESSION_DATA", False), \
+                patch("app.status_manager.call_api", return_value=copy.deepcopy(self.test_data)):
+            StatusManager(self.test_data)
+        self.db_read.assert_called_once()
@@ -0,0 +1,133 @@
+import datetime
+import time
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+import lambda_handler
+from app.session_table import InMemorySessionTableClient
+from app.status_manager import StatusManager
+from app import write_behind
+from app.write_behind import WriteBehindBuffer, flush_write_behind
+from data_store.data_schemas import BatchSessionResult
+from data_store.data_schemas import DataToUpdateInSessionTable
+from data_store.data_structure import ChargingStatus
+from logger_init import get_logger
+from tests.helpers import SessionTestCase, time_ago
+
+logger = get_logger(__name__)
+
+
+def session_update(booking_id, **data_to_update):
+    return DataToUpdateInSessionTable(update_table=True, table_name="ChargingSessionRecords",
+                                      primary_key={"booking_id": booking_id}, sort_key={"vendor_id": "electrolite"},
+                                      data_to_update=data_to_update)
+
+
+class TestWriteBehindBuffer(TestCase):
+    def setUp(self) -> None:
+        self.client = InMemorySessionTableClient(max_rounds=1)
+
+    def written(self, booking_id):
+        return self.client.items.get((booking_id, "electrolite"))
+
+    def test_updates_of_a_booking_are_merged(self):
+        buffer = WriteBehindBuffer(self.client, max_pending=10, max_delay=60)
+        buffer.submit(session_update("a", current_status="IN_PROGRESS", current_energy_consumed=1))
+        buffer.submit(session_update("a", current_energy_consumed=2, current_charging_timer="00:01:00"))
+        self.assertEqual(self.client.write_requests, 0)
+        self.assertEqual(buffer.flush(), [])
+        self.assertEqual(self.client.write_requests, 1)
+        self.assertEqual(self.written("a"), {"booking_id": "a", "vendor_id": "electrolite",
+                                             "current_status": "IN_PROGRESS", "current_energy_consumed": 2,
+                                             "current_charging_timer": "00:01:00"})
+        self.assertEqual((buffer.stats.submitted, buffer.stats.coalesced, buffer.stats.written), (2, 1, 1))
+
+    def test_flushes_at_max_pending(self):
+        buffer = WriteBehindBuffer(self.client, max_pending=3, max_delay=60)
+        for booking_id in ("a", "b", "a", "c"):
+            buffer.submit(session_update(booking_id, current_status="IN_PROGRESS"))
+        self.assertEqual(self.client.write_requests, 1)
+        self.assertEqual(len(buffer), 0)
+
+    def test_flushes_after_max_delay(self):
+        buffer = WriteBehindBuffer(self.client, max_pending=10, max_delay=0.05)
+        buffer.submit(session_update("a", current_status="IN_PROGRESS"))
+        deadline = time.monotonic() + 2
+        while self.written("a") is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.written("a")["current_status"], "IN_PROGRESS")
+
+    def test_terminal_status_flushes_at_once(self):
+        for status in (ChargingStatus.COMPLETED, ChargingStatus.START_FAILED, ChargingStatus.TERMINATED):
+            buffer = WriteBehindBuffer(self.client, max_pending=10, max_delay=60)
+            buffer.submit(session_update("a", current_energy_consumed=5))
+            self.assertTrue(buffer.submit(session_update("b", current_status=status.value)))
+            self.assertEqual(self.written("b")["current_status"], status.value)
+            self.assertEqual(self.written("a")["current_energy_consumed"], 5)
+
+    def test_failed_updates_stay_pending_under_newer_values(self):
+        buffer = WriteBehindBuffer(self.client, max_pending=10, max_delay=60)
+        original_write_chunk = self.client.write_chunk
+        self.client.write_chunk = lambda updates: updates
+        self.assertFalse(buffer.submit(session_update("a", current_status=ChargingStatus.COMPLETED.value,
+                                                      current_energy_consumed=5)))
+        buffer.submit(session_update("a", current_energy_consumed=6))
+        self.client.write_chunk = original_write_chunk
+        self.assertEqual(buffer.flush(), [])
+        self.assertEqual(self.written("a")["current_status"], ChargingStatus.COMPLETED.value)
+        self.assertEqual(self.written("a")["current_energy_consumed"], 6)
+        self.assertEqual(buffer.stats.failed, 1)
+
+
+class TestStatusManagerWriteBehind(SessionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.start_session(datetime.timedelta(minutes=2), current_status=ChargingStatus.STARTED.value,
+                           expanded_vehicle_data={"power_capacity": "30"})
+        self.client = InMemorySessionTableClient(max_rounds=1)
+        self.buffer = WriteBehindBuffer(self.client, max_pending=10, max_delay=60)
+        self.set_current_booking_session_data = MagicMock()
+        patchers = [patch("app.status_manager.call_api", return_value={}),
+                    patch.object(StatusManager, "get_current_booking_session_data", lambda *args: self.test_data),
+                    patch.object(StatusManager, "set_current_booking_session_data",
+                                 self.set_current_booking_session_data),
+                    patch("app.status_manager.get_write_behind_buffer", return_value=self.buffer)]
+        self.start_patchers(*patchers)
+
+    def test_write_goes_through_the_buffer(self):
+        report = StatusManager(self.test_data, write_behind=True).check_current_session_data_and_push(MagicMock())
+        self.assertIsNone(report.db_error)
+        self.set_current_booking_session_data.assert_not_called()
+        self.assertEqual(len(self.buffer), 1)
+        self.buffer.flush()
+        self.assertEqual(self.client.items[(self.test_data["booking_id"], "electrolite")]["current_status"],
+                         ChargingStatus.IN_PROGRESS.value)
+
+    def test_failed_terminal_write_is_reported(self):
+        self.test_data.update(start_time=time_ago(datetime.timedelta(minutes=20)),
+                              current_status=ChargingStatus.IN_PROGRESS.value)
+        self.client.write_chunk = lambda updates: updates
+        report = StatusManager(self.test_data, write_behind=True).check_current_session_data_and_push(MagicMock())
+        self.assertEqual(report.current_status, ChargingStatus.COMPLETED.value)
+        self.assertEqual(report.db_error, "Not able to update data to db")
+
+    def test_single_check_writes_at_once(self):
+        report = StatusManager(self.test_data).check_current_session_data_and_push(MagicMock())
+        self.assertIsNone(report.db_error)
+        self.set_current_booking_session_data.assert_called_once()
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_failed_flush_is_reported_on_the_batch_result(self):
+        self.client.write_chunk = lambda updates: updates
+
+        def monitor_batch_item(event, *args):
+            self.buffer.submit(session_update(event["booking_id"], current_energy_consumed=1))
+            return BatchSessionResult(booking_id=event["booking_id"], vendor_id="electrolite",
+                                      current_status=ChargingStatus.IN_PROGRESS.value)
+
+        with patch.object(write_behind, "_write_behind_buffer", self.buffer), \
+                patch("lambda_handler.monitor_batch_item", monitor_batch_item), \
+                patch("lambda_handler.get_socket_client"):
+            results = lambda_handler.batch_lambda_handler([dict(self.test_data, booking_id="a")], None)
+            self.assertEqual(results[0]["db_error"], "Not able to update data to db")
+            # Still pending for the next flush of the process
+            self.assertEqual([update.primary_key["booking_id"] for update in flush_write_behind()], ["a"])
@@ -0,0 +1,233 @@
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict, field
+from typing import Callable, Dict, List, Optional
+from app.decision_making_functions import check_booking_timeout, check_start_failure, \
+    check_successful_start, check_termination, check_unknown_error, check_user_interruption, \
+    check_time_based_status, check_energy_based_status, get_decision_table
+from app.final_data_maker import FinalDataToReturnForDB
+from app.status_manager import SocketCommunicator
+from app.time_calculations import PrepareTimeDataForCurrentState
+from data_store.data_schemas import CollectiveDataForCurrentState
+from data_store.data_structure import ChargingStatus
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SESSION_DATA_PATH = os.path.join(PROJECT_ROOT, "tests", "test_data", "session_data.json")
+PROJECT_PACKAGES = ("app", "data_store", "lambda_handler")
+# Fixed clock so that every run computes the same durations
+START_TIME = "2022-12-31 09:05:00"
+CURRENT_TIME = datetime.datetime.fromisoformat(START_TIME) + datetime.timedelta(minutes=5)
+# A benchmark is reported as a regression when it got slower than the baseline by more than this factor
+DEFAULT_REGRESSION_THRESHOLD = 1.25
+
+
+@dataclass
+class BenchmarkFixture:
+    collective_data_for_current_state: CollectiveDataForCurrentState
+    time_related_data: PrepareTimeDataForCurrentState
+    final_data_decider: FinalDataToReturnForDB
+
+
+def load_session_data(path=SESSION_DATA_PATH) -> Dict:
+    with open(path, "r") as fh:
+        return json.load(fh)
+
+
+def build_fixture(session_data: Dict, current_status: str, start_time: Optional[str] = START_TIME,
+                  target_energy_kw: int = 0) -> BenchmarkFixture:
+    """Same objects StatusManager.prepare_current_state builds for a session record, on the fixed clock"""
+    session_data = dict(session_data, current_status=current_status, start_time=start_time,
+                        booking_time=START_TIME, current_energy_consumed=12, target_energy_kw=target_energy_kw,
+                        expanded_vehicle_data={"power_capacity": "30"})
+    collective_data_for_current_state = CollectiveDataForCurrentState(
+        booking_id=session_data["booking_id"],
+        station_id=session_data["station_id"],
+        vendor_id=session_data["vendor_id"],
+        charger_point_id=session_data["charger_point_id"],
+        connector_point_id=session_data["connector_point_id"],
+        target_duration_timestamp=None if target_energy_kw else session_data["target_duration_timestamp"],
+        target_energy_kw=target_energy_kw,
+        start_time=start_time,
+        session_data=session_data)
+    time_related_data = PrepareTimeDataForCurrentState.construct(
+        collective_data_for_current_state=collective_data_for_current_state)
+    time_related_data.calculate_time_related_data(CURRENT_TIME)
+    return BenchmarkFixture(collective_data_for_current_state, time_related_data,
+                            FinalDataToReturnForDB(collective_data_for_current_state, time_related_data))
+
+
+def default_benchmarks(session_data: Optional[Dict] = None) -> Dict[str, Callable]:
+    """Every benchmark by name. A name must keep measuring the same thing so results stay comparable"""
+    session_data = session_data or load_session_data()
+    booked = build_fixture(session_data, ChargingStatus.BOOKED.value, start_time=None)
+    started = build_fixture(session_data, ChargingStatus.STARTED.value)
+    in_progress = build_fixture(session_data, ChargingStatus.IN_PROGRESS.value)
+    energy_based = build_fixture(session_data, ChargingStatus.IN_PROGRESS.value, target_energy_kw=25)
+    user_stopped = build_fixture(dict(session_data, user_stopped=True), ChargingStatus.COMPLETED.value)
+    decision_table = get_decision_table()
+
+    def rule(check, fixture):
+        return lambda: check(fixture.collective_data_for_current_state, fixture.time_related_data)
+
+    def time_related_data(fixture):
+        def calculate():
+            PrepareTimeDataForCurrentState.construct(
+                collective_data_for_current_state=fixture.collective_data_for_current_state
+            ).calculate_time_related_data(CURRENT_TIME)
+        return calculate
+
+    def decide(fixture):
+        return lambda: decision_table.decide(fixture.collective_data_for_current_state, fixture.time_related_data)
+
+    return {
+        "check_booking_timeout": rule(check_booking_timeout, booked),
+        "check_start_failure": rule(check_start_failure, booked),
+        "check_successful_start": rule(check_successful_start, started),
+        "check_termination": rule(check_termination, in_progress),
+        "check_unknown_error": rule(check_unknown_error, in_progress),
+        "check_user_interruption": rule(check_user_interruption, user_stopped),
+        "check_time_based_status": rule(check_time_based_status, in_progress),
+        "check_energy_based_status": rule(check_energy_based_status, energy_based),
+        "decision_table.decide": decide(in_progress),
+        "decision_table.decide.booking": decide(booked),
+        "decision_table.decide.energy": decide(energy_based),
+        "calculate_time_related_data.booking": time_related_data(booked),
+        "calculate_time_related_data.time": time_related_data(in_progress),
+        "map_final_data": lambda: in_progress.final_data_decider.map_final_data(ChargingStatus.IN_PROGRESS.value),
+        "parse_data_for_live_update": lambda: SocketCommunicator.parse_data_for_live_update(
+            in_progress.collective_data_for_current_state.session_data),
+    }
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    number: int
+    repeat: int
+    best_us: float
+    median_us: float
+
+
+@dataclass
+class BenchmarkReport:
+    results: Dict[str, BenchmarkResult]
+    meta: Dict = field(default_factory=dict)
+
+    def save(self, path):
+        with open(path, "w") as fh:
+            json.dump({"meta": self.meta, "results": {name: asdict(result) for name, result in self.results.items()}},
+                      fh, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, path) -> "BenchmarkReport":
+        with open(path, "r") as fh:
+            data = json.load(fh)
+        return cls(results={name: BenchmarkResult(**result) for name, result in data["results"].items()},
+                   meta=data.get("meta", {}))
+
+
+@dataclass
+class BenchmarkComparison:
+    name: str
+    baseline_us: float
+    current_us: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current_us / self.baseline_us if self.baseline_us else float("inf")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextmanager
+def project_log_level(log_level):
+    """Sets the loggers of the project to `log_level` for the duration of the block"""
+    project_loggers = [logger for name, logger in logging.root.manager.loggerDict.items()
+                       if isinstance(logger, logging.Logger) and name.split(".")[0] in PROJECT_PACKAGES]
+    previous_levels = [logger.level for logger in project_loggers]
+    for logger in project_loggers:
+        logger.setLevel(log_level)
+    try:
+        yield
+    finally:
+        for logger, level in zip(project_loggers, previous_levels):
+            logger.setLevel(level)
+
+
+def measure(benchmark: Callable, number: int, repeat: int) -> List[float]:
+    """Microseconds per call of every repeat"""
+    timer = timeit.Timer(benchmark)
+    return [total / number * 1e6 for total in timer.repeat(repeat=repeat, number=number)]
+
+
+def run_benchmarks(names: Optional[List[str]] = None, number=2000, repeat=7,
+                   log_level=logging.WARNING) -> BenchmarkReport:
+    """
+    Runs the benchmarks with the loggers of the project at `log_level`. The default keeps the info logs out
+    of the numbers, the level is saved with the results because it changes them a lot.
+    """
+    with project_log_level(log_level):
+        benchmarks = default_benchmarks()
+        results = {}
+        for name in names or benchmarks:
+            timings = measure(benchmarks[name], number, repeat)
+            results[name] = BenchmarkResult(name=name, number=number, repeat=repeat, best_us=min(timings),
+                                            median_us=statistics.median(timings))
+    meta = {"commit": git_commit(), "python": platform.python_version(), "machine": platform.machine(),
+            "log_level": logging.getLevelName(log_level), "created": datetime.datetime.utcnow().isoformat()}
+    return BenchmarkReport(results=results, meta=meta)
+
+
+def compare_reports(baseline: BenchmarkReport, current: BenchmarkReport) -> List[BenchmarkComparison]:
+    """Best time per call of every benchmark present in both reports, the best time is the least noisy"""
+    return [BenchmarkComparison(name=name, baseline_us=baseline.results[name].best_us,
+                                current_us=result.best_us)
+            for name, result in current.results.items() if name in baseline.results]
+
+
+def regressions(comparisons: List[BenchmarkComparison],
+                threshold=DEFAULT_REGRESSION_THRESHOLD) -> List[BenchmarkComparison]:
+    return [comparison for comparison in comparisons if comparison.ratio > threshold]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro benchmarks of the decision and serialization core")
+    parser.add_argument("--output", help="Save the results as json, for example benchmarks/<commit>.json")
+    parser.add_argument("--compare", help="Results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD)
+    parser.add_argument("--number", type=int, default=2000, help="Calls per repeat")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("names", nargs="*", help="Benchmarks to run, all by default")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.names or None, number=args.number, repeat=args.repeat,
+                            log_level=logging.getLevelName(args.log_level.upper()))
+    for result in report.results.values():
+        print(f"{result.name:40} best {result.best_us:9.2f} us  median {result.median_us:9.2f} us")
+    if args.output:
+        report.save(args.output)
+    if args.compare:
+        comparisons = compare_reports(BenchmarkReport.load(args.compare), report)
+        for comparison in comparisons:
+            print(f"{comparison.name:40} {comparison.baseline_us:9.2f} us -> {comparison.current_us:9.2f} us "
+                  f"({comparison.ratio:.2f}x)")
+        slower = regressions(comparisons, args.threshold)
+        if slower:
+            print(f"Slower than {args.threshold}x the baseline: {[comparison.name for comparison in slower]}")
+            sys.exit(1)
@@ -0,0 +1,331 @@
+import argparse
+import datetime
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+import app
+from tools.benchmark_suite import load_session_data, project_log_level
+from config import get_settings
+from data_store.data_structure import ChargingStatus, FINAL_STATUSES
+from lambda_handler import lambda_handler
+from logger_init import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+DB_PATH = "/db"
+STATUS_PATH = "/status"
+STATUS_BATCH_PATH = "/status_batch"
+SOCKET_PATH = "/socket"
+
+
+@dataclass
+class StubBehaviour:
+    """Latency added to every request of a stub service and the share of requests answered with a 503"""
+    latency_ms: float = 0
+    error_rate: float = 0.0
+
+
+@dataclass
+class StubStats:
+    requests: int = 0
+    injected_errors: int = 0
+
+
+class SessionStore:
+    """In memory ChargingSessionRecords table keyed by booking id and vendor id"""
+    def __init__(self):
+        self.items: Dict[Tuple[str, str], Dict] = {}
+        self.status_polls: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def put(self, item: Dict):
+        with self._lock:
+            self.items[(item["booking_id"], item["vendor_id"])] = dict(item)
+
+    def read(self, booking_id, vendor_id) -> Optional[Dict]:
+        with self._lock:
+            item = self.items.get((booking_id, vendor_id))
+            return dict(item) if item is not None else None
+
+    def update(self, booking_id, vendor_id, data_to_update: Dict):
+        with self._lock:
+            self.items[(booking_id, vendor_id)].update(data_to_update)
+
+    def advance_vendor_state(self, booking_id, vendor_id, start_after_polls: int, energy_per_poll: int) -> Dict:
+        """
+        What the vendor integration behind STATUS_URL does to the session record: a booked session is started
+        by the user after `start_after_polls` status calls and a running session consumes energy
+        """
+        key = (booking_id, vendor_id)
+        with self._lock:
+            item = self.items[key]
+            self.status_polls[key] += 1
+            if item["current_status"] == ChargingStatus.BOOKED.value and self.status_polls[key] > start_after_polls:
+                item["current_status"] = ChargingStatus.STARTED.value
+                item["start_time"] = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+            elif item["current_status"] in (ChargingStatus.STARTED.value, ChargingStatus.IN_PROGRESS.value):
+                item["current_energy_consumed"] += energy_per_poll
+            return {"current_status": item["current_status"]}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        url = urlparse(self.path)
+        stubs: StubServices = self.server.stubs
+        service = next((path for path in (DB_PATH, STATUS_BATCH_PATH, STATUS_PATH, SOCKET_PATH)
+                        if url.path.startswith(path)), None)
+        if service is None:
+            return self.answer(404, {"message": f"No stub for {url.path}"})
+        behaviour, stats = stubs.behaviours[service], stubs.stats[service]
+        with stubs.lock:
+            stats.requests += 1
+            # Drawn under the lock so that the n-th request of a service always gets the n-th draw
+            inject_error = bool(behaviour.error_rate) and stubs.randoms[service].random() < behaviour.error_rate
+        if behaviour.latency_ms:
+            time.sleep(behaviour.latency_ms / 1000)
+        if inject_error:
+            with stubs.lock:
+                stats.injected_errors += 1
+            return self.answer(503, {"message": "Injected error"})
+        if service == DB_PATH:
+            answer = stubs.handle_db(json.loads(body))
+            if answer is None:
+                return self.answer(400, {"message": "Unknown db request"})
+            self.answer(200, answer)
+        elif service == STATUS_BATCH_PATH:
+            vendor_id = parse_qs(url.query)["vendor_id"][0]
+            self.answer(200, {"statuses": {
+                booking["booking_id"]: stubs.store.advance_vendor_state(booking["booking_id"], vendor_id,
+                                                                        stubs.start_after_polls,
+                                                                        stubs.energy_per_poll)
+                for booking in json.loads(body)["bookings"]}})
+        elif service == STATUS_PATH:
+            query = parse_qs(url.query)
+            self.answer(200, stubs.store.advance_vendor_state(query["booking_id"][0], query["vendor_id"][0],
+                                                             stubs.start_after_polls, stubs.energy_per_poll))
+        else:
+            self.answer(200, None)
+
+    def answer(self, status, payload):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServices:
+    """
+    Local stand-ins for DB_API (read_table, update_table and their batch versions), STATUS_URL, STATUS_BATCH_URL
+    and the post_to_connection endpoint of the websocket api, served by one local http server under /db, /status,
+    /status_batch and /socket. The batch status endpoint shares the behaviour of the status endpoint.
+    The injected errors of every service come from a random.Random seeded with `seed`, so a run can be repeated
+    """
+    def __init__(self, db: StubBehaviour = None, status: StubBehaviour = None, socket: StubBehaviour = None,
+                 start_after_polls=1, energy_per_poll=1, seed=0):
+        self.store = SessionStore()
+        self.behaviours = {DB_PATH: db or StubBehaviour(), STATUS_PATH: status or StubBehaviour(),
+                           SOCKET_PATH: socket or StubBehaviour()}
+        self.behaviours[STATUS_BATCH_PATH] = self.behaviours[STATUS_PATH]
+        self.stats = {path: StubStats() for path in self.behaviours}
+        self.randoms = {path: random.Random(f"{seed}{path}") for path in self.behaviours}
+        self.start_after_polls = start_after_polls
+        self.energy_per_poll = energy_per_poll
+        self.lock = threading.Lock()
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def handle_db(self, request: Dict) -> Optional[Dict]:
+        """None for a request which is none of the known ones, it is answered with 400 instead of guessed"""
+        if request.get("batch_read_table"):
+            items = (self.store.read(key["booking_id"], key["vendor_id"]) for key in request["keys"])
+            return {"items": [item for item in items if item is not None], "unprocessed_keys": []}
+        if request.get("batch_update_table"):
+            for update in request["updates"]:
+                self.store.update(update["primary_key"]["booking_id"], update["sort_key"]["vendor_id"],
+                                  update["data_to_update"])
+            return {"unprocessed_updates": []}
+        if request.get("read_table"):
+            return self.store.read(request["primary_key_value"], request["sort_key_value"]) or {}
+        if request.get("update_table"):
+            self.store.update(request["primary_key"]["booking_id"], request["sort_key"]["vendor_id"],
+                              request["data_to_update"])
+            return {"message": "updated"}
+        return None
+
+    def start(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.daemon_threads = True
+        self.server.stubs = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def url(self, path) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+    @contextmanager
+    def serving_settings(self):
+        """Points the settings and the socket client of this process at the stubs for the duration of the block"""
+        overrides = {"DB_API": self.url(DB_PATH), "STATUS_URL": self.url(STATUS_PATH),
+                     "STATUS_BATCH_URL": self.url(STATUS_BATCH_PATH),
+                     "WEB_SOCKET_API": self.url(SOCKET_PATH)}
+        previous = {name: getattr(settings, name) for name in overrides}
+        # botocore signs every request, the stub does not check the signature
+        for name, value in (("AWS_DEFAULT_REGION", settings.DB_REGION), ("AWS_ACCESS_KEY_ID", "load-test"),
+                            ("AWS_SECRET_ACCESS_KEY", "load-test")):
+            os.environ.setdefault(name, value)
+        for name, value in overrides.items():
+            setattr(settings, name, value)
+        app._socket_clients.clear()
+        try:
+            yield
+        finally:
+            for name, value in previous.items():
+                setattr(settings, name, value)
+            app._socket_clients.clear()
+
+
+class LoadTestContext:
+    """Lambda context with the remaining time of an invocation of `timeout_ms`"""
+    def __init__(self, timeout_ms: int):
+        self.deadline = time.monotonic() + timeout_ms / 1000
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int((self.deadline - time.monotonic()) * 1000))
+
+
+@dataclass
+class SessionRun:
+    booking_id: str
+    statuses: List[str] = field(default_factory=list)
+    latencies_ms: List[float] = field(default_factory=list)
+
+    @property
+    def path(self) -> List[str]:
+        """Statuses in the order the session went through them, without repeats"""
+        return [status for index, status in enumerate(self.statuses)
+                if index == 0 or status != self.statuses[index - 1]]
+
+
+def percentile(sorted_values: List[float], share: float) -> float:
+    """Nearest rank percentile of already sorted values"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(share * len(sorted_values))) - 1))]
+
+
+@dataclass
+class LoadTestReport:
+    runs: List[SessionRun]
+    duration_s: float
+    stub_stats: Dict[str, StubStats]
+
+    @property
+    def invocations(self) -> int:
+        return sum(len(run.latencies_ms) for run in self.runs)
+
+    @property
+    def throughput(self) -> float:
+        """Handler invocations per second"""
+        return self.invocations / self.duration_s if self.duration_s else 0.0
+
+    def latency_percentiles(self) -> Dict[str, float]:
+        latencies = sorted(latency for run in self.runs for latency in run.latencies_ms)
+        return {"p50": percentile(latencies, 0.5), "p90": percentile(latencies, 0.9),
+                "p99": percentile(latencies, 0.99), "max": latencies[-1] if latencies else 0.0}
+
+    def final_statuses(self) -> Counter:
+        return Counter(run.statuses[-1] if run.statuses else None for run in self.runs)
+
+    def summary(self) -> Dict:
+        return {"sessions": len(self.runs), "invocations": self.invocations, "duration_s": round(self.duration_s, 3),
+                "throughput_per_s": round(self.throughput, 1),
+                "latency_ms": {name: round(value, 2) for name, value in self.latency_percentiles().items()},
+                "final_statuses": dict(self.final_statuses()),
+                "stubs": {path.strip("/"): vars(stats) for path, stats in self.stub_stats.items()}}
+
+
+def new_session_record(template: Dict, index: int, target_duration_timestamp: str) -> Dict:
+    return dict(template, booking_id=f"load-test-{index}", current_status=ChargingStatus.BOOKED.value,
+                booking_time=datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"), start_time=None,
+                user_stopped=False, current_energy_consumed=0, target_duration_timestamp=target_duration_timestamp,
+                target_energy_kw=0, socket_connection_id=f"connection-{index}",
+                expanded_vehicle_data={"power_capacity": "30"})
+
+
+def simulate_session(stubs: StubServices, record: Dict, poll_interval: float, max_polls: int,
+                     invocation_timeout_ms: int) -> SessionRun:
+    """Polls one session through lambda_handler like the state machine does until it reaches a final status"""
+    stubs.store.put(record)
+    run = SessionRun(booking_id=record["booking_id"])
+    for _ in range(max_polls):
+        started = time.perf_counter()
+        status = lambda_handler(record, LoadTestContext(invocation_timeout_ms))
+        run.latencies_ms.append((time.perf_counter() - started) * 1000)
+        run.statuses.append(getattr(status, "value", status))
+        if run.statuses[-1] in FINAL_STATUSES:
+            break
+        time.sleep(poll_interval)
+    return run
+
+
+def run_load_test(stubs: StubServices, sessions=10, target_duration_timestamp="00:00:03", poll_interval=0.5,
+                  max_polls=100, invocation_timeout_ms=30000) -> LoadTestReport:
+    """Runs `sessions` charging sessions at the same time from BOOKED to a final status against the stubs"""
+    template = load_session_data()
+    records = [new_session_record(template, index, target_duration_timestamp) for index in range(sessions)]
+    with stubs.serving_settings():
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=sessions, thread_name_prefix="load-test") as executor:
+            runs = list(executor.map(lambda record: simulate_session(stubs, record, poll_interval, max_polls,
+                                                                     invocation_timeout_ms), records))
+        duration_s = time.monotonic() - started
+    return LoadTestReport(runs=runs, duration_s=duration_s, stub_stats=stubs.stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test of lambda_handler against local stub services")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--target-duration", default="00:00:05", help="Charging time of every session, HH:MM:SS")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="Seconds between two polls of a session")
+    parser.add_argument("--max-polls", type=int, default=100)
+    for service in ("db", "status", "socket"):
+        parser.add_argument(f"--{service}-latency-ms", type=float, default=0)
+        parser.add_argument(f"--{service}-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the injected errors")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    stub_services = StubServices(
+        db=StubBehaviour(args.db_latency_ms, args.db_error_rate),
+        status=StubBehaviour(args.status_latency_ms, args.status_error_rate),
+        socket=StubBehaviour(args.socket_latency_ms, args.socket_error_rate), seed=args.seed).start()
+    try:
+        with project_log_level(logging.getLevelName(args.log_level.upper())):
+            load_test_report = run_load_test(stub_services, sessions=args.sessions,
+                                             target_duration_timestamp=args.target_duration,
+                                             poll_interval=args.poll_interval, max_polls=args.max_polls)
+    finally:
+        stub_services.stop()
+    print(json.dumps(load_test_report.summary(), indent=2))